@@ -5,6 +5,7 @@ import re
 import pandas as pd
 import streamlit as st
 from tcg_utils import *
+from tcg_jobs import JobService, DONE, FAILED
 import time
 
 # Custom CSS for professional styling
@@ -305,14 +306,36 @@ def create_animated_header():
     </div>
     """, unsafe_allow_html=True)
 
-def create_metrics_section(brick_rate, attacker_rate, key_card_rate):
+@st.cache_resource
+def get_job_service():
+    """One background job service per server process, shared by every session."""
+    return JobService()
+
+def follow_job(service, job_id, progress_bar, status_text):
+    """Polls a job until it finishes, showing progress and the running brick rate."""
+    while True:
+        status = service.poll(job_id)
+        if status.state in (DONE, FAILED):
+            return status
+        if status.trials_total:
+            progress_bar.progress(min(99, 60 + 40 * status.trials_done // status.trials_total))
+        if status.trials_done:
+            status_text.text(f"🎲 Simulated {status.trials_done:,} of {status.trials_total:,} games "
+                             f"(brick rate so far {status.result.brick_rate*100:.1f}%)...")
+        time.sleep(0.25)
+
+def create_metrics_section(result):
+    brick_rate = result.brick_rate * 100
+    attacker_rate = result.attacker_rate * 100
+    key_card_rate = result.key_card_rate * 100
+    low, high = result.brick_rate_interval()
     col_a, col_b, col_c = st.columns(3)
     
     with col_a:
         st.metric(
             "🧱 Brick Rate", 
             f"{brick_rate:.1f}%",
-            help="Percentage of games that resulted in unplayable hands"
+            help=f"Percentage of games that resulted in unplayable hands (95% CI {low*100:.1f}% - {high*100:.1f}%)"
         )
     
     with col_b:
@@ -351,7 +374,12 @@ def display_main_attackers(main_attackers, evolution_methods):
     else:
         st.warning("⚠️ No main attackers identified!")
 
-def create_results_summary(total_bricks, attacker_bricks, key_card_bricks, total_trials, brick_rate, attacker_rate, key_card_rate):
+def create_results_summary(result):
+    total_bricks, attacker_bricks, key_card_bricks, total_trials, _ = result
+    brick_rate = result.brick_rate * 100
+    attacker_rate = result.attacker_rate * 100
+    key_card_rate = result.key_card_rate * 100
+    low, high = result.brick_rate_interval()
     summary_status = "status-good" if brick_rate < 15 else "status-warning" if brick_rate < 30 else "status-error"
     
     st.markdown(f"""
@@ -359,7 +387,7 @@ def create_results_summary(total_bricks, attacker_bricks, key_card_bricks, total
         <h4 style="color: #1e293b; margin-bottom: 1rem;">📈 Simulation Analysis</h4>
         <p style="font-size: 1.1rem; color: #475569; line-height: 1.6;">
             <strong>Summary of {total_trials:,} trials:</strong><br>
-            • <span class="{summary_status}">{total_bricks:,} games resulted in strict bricks ({brick_rate:.2f}%)</span><br>
+            • <span class="{summary_status}">{total_bricks:,} games resulted in strict bricks ({brick_rate:.2f}%, 95% CI {low*100:.2f}% - {high*100:.2f}%)</span><br>
             • <strong>{attacker_bricks:,}</strong> games had insufficient main attackers ({attacker_rate:.2f}%)<br>
             • <strong>{key_card_bricks:,}</strong> of those were due to key cards not being drawn ({key_card_rate:.2f}% of all games)
         </p>
@@ -381,7 +409,7 @@ def main():
     create_animated_header()
     
     # Load card data
-    data = load_card_data("ALL_SETS.csv")
+    data = load_card_data()
 
     # Simulation settings in main area for mobile/desktop accessibility
     st.markdown("### ⚙️ Simulation Settings")
@@ -488,13 +516,40 @@ def main():
             progress_bar.progress(60)
             time.sleep(0.5)
             
-            total_bricks, attacker_bricks, key_card_bricks, total_trials, example_logs = simulate_brick_rate_with_examples(
-                parsed_deck, 
-                main_attackers, 
-                trials=trials, 
-                show_examples=show_examples, 
-                maxturns=max_turns
-            )
+            # The simulation runs in the background job service; a request for a deck that is
+            # already being analysed (e.g. from another session) joins that job. The trials of the
+            # session's last analysis are kept, so a one-card edit with the same settings only
+            # re-simulates the games the swapped card can change
+            service = get_job_service()
+            last_analysis = st.session_state.get('last_analysis')
+            job_id = None
+            if last_analysis and last_analysis['trials'] == trials and last_analysis['max_turns'] == max_turns:
+                try:
+                    job_id = service.submit_edit(
+                        last_analysis['job_id'],
+                        parsed_deck,
+                        main_attackers,
+                        show_examples=show_examples
+                    )
+                except KeyError:
+                    pass
+            if job_id is None:
+                job_id = service.submit(
+                    parsed_deck,
+                    main_attackers,
+                    trials=trials,
+                    show_examples=show_examples,
+                    maxturns=max_turns,
+                    keep_trials=True
+                )
+            status = follow_job(service, job_id, progress_bar, status_text)
+            if status.state == FAILED:
+                progress_bar.empty()
+                status_text.empty()
+                st.error(f"Simulation failed: {status.error}")
+                return
+            result = status.result
+            st.session_state['last_analysis'] = {'job_id': job_id, 'trials': trials, 'max_turns': max_turns}
             
             progress_bar.progress(100)
             status_text.text("✅ Analysis complete!")
@@ -503,6 +558,9 @@ def main():
             status_text.empty()
             
             st.success(f"✅ Successfully analyzed {len(parsed_deck)} cards!")
+            if status.resimulated is not None:
+                st.caption(f"♻️ One-card edit: re-simulated {status.resimulated:,} of {result.trials:,} games, "
+                           f"the rest are reused from the previous analysis.")
         
         st.markdown("---")
         st.markdown("### 📊 Quick Tips")
@@ -526,22 +584,26 @@ def main():
                 display_main_attackers(main_attackers, evolution_methods)
         
         # Results metrics
-        if 'total_bricks' in locals():
+        if 'result' in locals():
             st.markdown("---")
             st.markdown("## 📈 Simulation Results")
             
-            # Calculate rates
-            brick_rate = (total_bricks / total_trials) * 100
-            attacker_rate = (attacker_bricks / total_trials) * 100
-            key_card_rate = (key_card_bricks / total_trials) * 100
-            
             # Display metrics
-            create_metrics_section(brick_rate, attacker_rate, key_card_rate)
+            create_metrics_section(result)
             
             # Results summary
-            create_results_summary(total_bricks, attacker_bricks, key_card_bricks, total_trials, brick_rate, attacker_rate, key_card_rate)
+            create_results_summary(result)
+
+            # Development curve
+            st.markdown("#### ⚔️ Main Attackers in Play by Turn")
+            st.line_chart(pd.DataFrame(
+                {'Average attackers in play': result.mean_attackers_by_turn()},
+                index=pd.Index(range(1, result.max_turns + 1), name='Turn')
+            ))
             
             # Example bricked games
+            # A shared job may have rendered more examples than this session asked for
+            example_logs = result.example_logs[:show_examples]
             if example_logs and show_examples > 0:
                 st.markdown("---")
                 st.markdown("## 🔍 Example Analysis")
@@ -550,9 +612,9 @@ def main():
                 for i, example in enumerate(example_logs, 1):
                     with st.expander(f"🧱 Bricked Game Example #{i}", expanded=False):
                         st.code('\n'.join(example), language='text')
-            elif 'total_bricks' in locals() and total_bricks == 0:
+            elif result.bricks == 0:
                 st.balloons()
-                st.success(f"🎉 Exceptional! No bricked games found in this simulation! of {total_trials}")
+                st.success(f"🎉 Exceptional! No bricked games found in this simulation! of {result.trials}")
             elif show_examples == 0:
                 st.info("💡 Set 'Example Hands to Show' > 0 to see detailed examples of bricked games.")
 
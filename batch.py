@@ -0,0 +1,65 @@
+import argparse
+import os
+import re
+from tcg_utils import *
+from tcg_bank import PermutationBank, simulate_with_bank
+
+# =============================================================================
+# Batch Deck Analysis
+# =============================================================================
+
+def read_decklists(filename):
+    """Splits a file of decklists separated by lines of dashes (like decks.txt) into deck texts."""
+    with open(filename, encoding='utf-8') as f:
+        blocks = re.split(r'^\s*-{3,}\s*$', f.read(), flags=re.MULTILINE)
+    return [block.strip() for block in blocks if block.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate brick rates for every deck in a file.")
+    parser.add_argument('decks', help="File with decklists separated by lines of dashes")
+    parser.add_argument('--trials', type=int, default=10000)
+    parser.add_argument('--turns', type=int, default=5)
+    parser.add_argument('--store', default="results.db", help="Result store to reuse and extend")
+    parser.add_argument('--no-store', action='store_true', help="Always simulate from scratch")
+    parser.add_argument('--bank', help="Permutation bank (.npy) shared by all decks, created with --trials "
+                                       "trials if missing; decks are compared on common random numbers")
+    args = parser.parse_args()
+
+    if not load_card_data():
+        print("Failed to load card data.")
+        return
+
+    bank = None
+    if args.bank:
+        if os.path.exists(args.bank):
+            bank = PermutationBank.load(args.bank)
+        else:
+            bank = PermutationBank.generate(args.trials)
+            bank.save(args.bank)
+    store = None if args.no_store or bank is not None else ResultStore(args.store)
+    for i, deck_text in enumerate(read_decklists(args.decks), 1):
+        try:
+            parsed_deck = parse_decklist(deck_text)
+        except ValueError as e:
+            print(f"Deck #{i}: skipped ({str(e).splitlines()[-1]})")
+            continue
+        main_attackers, _ = get_main_attackers_and_evolution_methods(parsed_deck)
+        if bank is not None:
+            result = simulate_with_bank(parsed_deck, main_attackers, bank, maxturns=args.turns)
+        elif store is not None:
+            result = simulate_with_store(store, parsed_deck, main_attackers, trials=args.trials,
+                                         show_examples=0, maxturns=args.turns)
+        else:
+            result = simulate_brick_rate_with_examples(parsed_deck, main_attackers, trials=args.trials,
+                                                       show_examples=0, maxturns=args.turns)
+        low, high = result.brick_rate_interval()
+        attackers = ", ".join(sorted(main_attackers))
+        print(f"Deck #{i} [{attackers}]: brick rate {result.brick_rate*100:.2f}% "
+              f"(95% CI {low*100:.2f}-{high*100:.2f}%, {result.trials:,} trials)")
+    if store is not None:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,513 @@
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+import numpy as np
+from tcg_utils import *
+from tcg_stats import CardStatsCollector
+from tcg_trace import stack_traces
+from tcg_carddb import CardStore, read_set_export
+from tcg_bank import PermutationBank, paired_difference, simulate_with_bank
+from tcg_incremental import TrialRecords
+from tcg_sampling import simulate_importance, simulate_stratified, simulate_with_control_variates
+
+# =============================================================================
+# Benchmark Decks
+# =============================================================================
+
+BENCH_DECKS = {
+    'charizard': """2 Charmander A1 33
+1 Charizard A1 35
+1 Charizard ex A1 36
+2 Moltres ex A1 47
+1 Farfetch'd A1 198
+2 Professor's Research P-A 7
+1 Sabrina A1 225
+1 Leaf A1a 68
+1 Dawn A2 154
+2 Poké Ball P-A 5
+2 Rare Candy A3 144
+1 Potion P-A 1
+1 X Speed P-A 2
+1 Red Card P-A 6
+1 Giant Cape A2 147""",
+    'solgaleo': """2 Cosmog A3 85
+1 Cosmoem A3 86
+2 Solgaleo ex A3 122
+2 Morelull A3 16
+2 Shiinotic A3a 27
+2 Professor's Research P-A 7
+1 Lillie A3 155
+1 Red A2b 71
+1 Cyrus A2 150
+1 Mars A2 155
+1 Sabrina A1 225
+2 Rare Candy A3 144
+2 Poké Ball P-A 5""",
+    'suicune': """2 Froakie A1 87
+2 Greninja A1 89
+2 Suicune ex A4a 20
+1 Arceus ex A2a 71
+1 Mantyke A4a 23
+2 Cyrus A2 150
+2 Professor's Research P-A 7
+1 Irida A2a 72
+1 Leaf A1a 68
+1 Mars A2 155
+2 Rare Candy A3 144
+2 Poké Ball P-A 5
+1 Giant Cape A2 147""",
+    'sylveon': """2 Eevee A4 134
+2 Espeon ex A4 83
+2 Sylveon ex A3b 34
+1 Sylveon A3b 33
+1 Espeon A3b 28
+2 Eevee ex A3b 56
+2 Professor's Research P-A 7
+1 Sabrina A1 225
+1 Cyrus A2 150
+1 Mars A2 155
+1 Guzma A3 151
+2 Poké Ball P-A 5
+1 Eevee Bag A3b 66
+1 Giant Cape A2 147""",
+}
+
+
+def load_bench_decks():
+    """Parses every benchmark deck and precomputes its main attackers."""
+    if not ALL_CARD_DATA and not load_card_data():
+        raise SystemExit("Failed to load card data.")
+    decks = {}
+    for name, deck_text in BENCH_DECKS.items():
+        parsed_deck = parse_decklist(deck_text)
+        main_attackers, _ = get_main_attackers_and_evolution_methods(parsed_deck)
+        decks[name] = (parsed_deck, main_attackers)
+    return decks
+
+
+def time_trials(run_trial, trials, repeats=5, seed=0):
+    """Returns the best-of-`repeats` average wall time of `run_trial` in microseconds."""
+    best = float('inf')
+    for _ in range(repeats):
+        random.seed(seed)
+        start = time.perf_counter()
+        for _ in range(trials):
+            run_trial()
+        best = min(best, time.perf_counter() - start)
+    return best / trials * 1e6
+
+
+# =============================================================================
+# Benchmarks
+# =============================================================================
+
+def bench_card_stats(trials=2000, max_turns=7):
+    """Measures the overhead of CardStatsCollector on trial throughput (target: < 10%)."""
+    print(f"--- CardStatsCollector overhead ({trials} trials, {max_turns} turns) ---")
+    for name, (parsed_deck, main_attackers) in load_bench_decks().items():
+        collector = CardStatsCollector(parsed_deck, max_turns)
+        plain = time_trials(lambda: simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns), trials)
+        collected = time_trials(lambda: simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns, stats=collector), trials)
+        overhead = (collected - plain) / plain * 100
+        status = "OK" if overhead < 10 else "OVER BUDGET"
+        print(f"   - {name}: {plain:.1f} us/trial -> {collected:.1f} us/trial ({overhead:+.1f}%) {status}")
+
+
+def bench_examples(trials=2000, max_turns=7, show_examples=5):
+    """Compares logging every trial against the seeded runner that replays only the sampled examples."""
+    print(f"--- Example logging cost ({trials} trials, {show_examples} examples) ---")
+    for name, (parsed_deck, main_attackers) in load_bench_decks().items():
+        logged = time_trials(lambda: simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns, log_details=True), trials)
+        replayed = time_trials(lambda: simulate_brick_rate_with_examples(
+            parsed_deck, main_attackers, trials=trials, show_examples=show_examples, maxturns=max_turns, seed=0),
+            1, repeats=3) / trials
+        print(f"   - {name}: log every trial {logged:.1f} us/trial -> seeded + replay {replayed:.1f} us/trial")
+
+
+def bench_effects(trials=2000, max_turns=7):
+    """Compares binding every card effect (the old name checks) against binding only the deck's own effects."""
+    print(f"--- Card effect binding ({trials} trials, {max_turns} turns) ---")
+    for name, (parsed_deck, main_attackers) in load_bench_decks().items():
+        effects = compile_deck_effects(parsed_deck)
+        every = time_trials(lambda: simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns, effects=DEFAULT_EFFECTS), trials)
+        bound = time_trials(lambda: simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns, effects=effects), trials)
+        print(f"   - {name} {effects}: all effects {every:.1f} us/trial -> "
+              f"deck effects {bound:.1f} us/trial ({(bound - every) / every * 100:+.1f}%)")
+
+
+def bench_trace(trials=2000, max_turns=7):
+    """Compares writing text logs against recording compact event traces, and the trace size per game."""
+    print(f"--- Text logs vs. event traces ({trials} trials, {max_turns} turns) ---")
+    for name, (parsed_deck, main_attackers) in load_bench_decks().items():
+        effects = compile_deck_effects(parsed_deck)
+        trace = GameTrace(parsed_deck)
+        plain = time_trials(lambda: simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns, effects=effects), trials)
+        logged = time_trials(lambda: simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns, log_details=True, effects=effects), trials)
+        traced = time_trials(lambda: simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns, effects=effects, trace=trace), trials)
+        kept = []
+        for i in range(trials):
+            simulate_one_trial_with_logging(parsed_deck, main_attackers, max_turns=max_turns,
+                                            rng=random.Random(i), effects=effects, trace=trace)
+            kept.append(trace.copy())
+        size = stack_traces(kept).nbytes
+        print(f"   - {name}: plain {plain:.1f} us/trial, text log {logged:.1f} us/trial, trace {traced:.1f} us/trial; "
+              f"{trials} traces = {size / 1024:.0f} KiB ({size / trials:.0f} bytes/game)")
+
+
+def bench_archive(trials=5000, max_turns=7, copies=200):
+    """Measures the cost of archiving every game and the time of a conditional query over the archive."""
+    print(f"--- Game archive ({trials} trials, query over {trials * copies:,} games) ---")
+    directory = tempfile.mkdtemp()
+    for name, (parsed_deck, main_attackers) in load_bench_decks().items():
+        path = os.path.join(directory, f"{name}.games")
+        plain = time_trials(lambda: simulate_brick_rate_with_examples(
+            parsed_deck, main_attackers, trials=trials, show_examples=0, maxturns=max_turns, seed=0), 1, repeats=3)
+
+        def run_archived():
+            for leftover in (path, f"{path}.json"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            simulate_brick_rate_with_examples(parsed_deck, main_attackers, trials=trials, show_examples=0,
+                                              maxturns=max_turns, seed=0, archive_path=path)
+
+        archived = time_trials(run_archived, 1, repeats=3)
+        archive = GameArchive(path)
+        big_path = os.path.join(directory, f"{name}_big.games")
+        np.concatenate([archive.records] * copies).tofile(big_path)
+        shutil.copy(f"{path}.json", f"{big_path}.json")
+        big = GameArchive(big_path)
+        card = big.card_names[0]
+        start = time.perf_counter()
+        rate, games = big.brick_rate(big.seen_by(card, 0))
+        query_ms = (time.perf_counter() - start) * 1000
+        print(f"   - {name}: {plain / trials:.1f} -> {archived / trials:.1f} us/trial with archive; "
+              f"brick rate with {card} in opener over {len(big):,} games: {rate*100:.2f}% in {query_ms:.0f} ms")
+        del big, archive
+    shutil.rmtree(directory)
+
+
+def _startup_profile(code):
+    """Runs `code` in a fresh interpreter; returns (import ms per -X importtime, peak RSS in MB)."""
+    probe = f"{code}; import resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+    done = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], capture_output=True, text=True,
+                          check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    import_us = 0
+    for line in done.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"; nested imports are indented
+        if line.startswith('import time:') and not line.endswith('imported package'):
+            _, cumulative, package = line.split('|')
+            if not package.startswith('  '):
+                import_us += int(cumulative)
+    return import_us / 1000, int(done.stdout.split()[-1]) / 1024
+
+
+def bench_startup(repeats=3):
+    """Import time and resident memory of a worker process, with and without pandas loaded."""
+    print("--- Worker startup (import tcg_utils + load_card_data) ---")
+    setups = {
+        'tcg_utils (csv loader)': "import tcg_utils; tcg_utils.load_card_data()",
+        'tcg_utils + pandas': "import pandas; import tcg_utils; tcg_utils.load_card_data()",
+    }
+    for label, code in setups.items():
+        import_ms, rss_mb = min(_startup_profile(code) for _ in range(repeats))
+        print(f"   - {label}: imports {import_ms:.0f} ms, peak RSS {rss_mb:.0f} MB")
+
+
+def _traced_size(build):
+    """Bytes still allocated by the object `build()` returns."""
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def bench_card_store(filename="ALL_SETS.csv", lookups=100000):
+    """Memory of the card table as one dict per card vs. the columnar CardStore, and lookup cost."""
+    print(f"--- Card table memory ({filename}) ---")
+
+    def dict_table():
+        return {(r['card_name'], r['set_code'], r['card_number']): dict(r, effects=card_effects(r['card_name']))
+                for r in read_set_export(filename)}
+
+    def store_table():
+        return CardStore(read_set_export(filename))
+
+    tables = {'dict per card': dict_table, 'CardStore': store_table}
+    keys = list(dict_table())
+    for label, build in tables.items():
+        size = _traced_size(build)
+        table = build()
+        start = time.perf_counter()
+        for i in range(lookups):
+            table[keys[i % len(keys)]]['pokemon_stage']
+        lookup_ns = (time.perf_counter() - start) / lookups * 1e9
+        print(f"   - {label}: {size / 1024:.0f} KiB for {len(table)} cards ({size / len(table):.0f} B/card), "
+              f"lookup + field {lookup_ns:.0f} ns")
+
+
+def bench_card_image(repeats=3):
+    """Worker-side cost of loading the card data: parsing the CSV vs. attaching the shared card image."""
+    print("--- Worker card data: parse vs. attach the memory-mapped image ---")
+    image_path = share_card_data()
+    probe = ("import time, tracemalloc, tcg_utils; tracemalloc.start(); start = time.perf_counter(); "
+             "tcg_utils.load_card_data({!r}); elapsed = time.perf_counter() - start; "
+             "tcg_utils.get_card_info('charizard a1 35'); "
+             "print(elapsed * 1000, tracemalloc.get_traced_memory()[0])")
+    for label, source in (('parse ALL_SETS.csv', "ALL_SETS.csv"), ('attach card image', image_path)):
+        runs = []
+        for _ in range(repeats):
+            done = subprocess.run([sys.executable, '-c', probe.format(source)], capture_output=True, text=True,
+                                  check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            load_ms, heap = done.stdout.split()
+            runs.append((float(load_ms), int(heap)))
+        load_ms, heap = min(runs)
+        print(f"   - {label}: {load_ms:.1f} ms, {heap / 1024:.0f} KiB private heap per worker")
+    print(f"   - image: {os.path.getsize(image_path) / 1024:.0f} KiB mapped, shared by all workers")
+
+
+def _random_decklists(count, seed=0):
+    """Random 20-card decklists of 2-3 evolution lines from the card pool, half of them with Rare Candy."""
+    rng = random.Random(seed)
+    keys = sorted(key for key in ALL_CARD_DATA if ALL_CARD_DATA[key]['card_type'] == 'pokemon')
+    key_by_name = {}
+    for key in keys:
+        key_by_name.setdefault(key[0], key)
+    filler = ('poké ball', 'p-a', '5')
+    decklists = []
+    for _ in range(count):
+        lines = []
+        for key in rng.sample(keys, rng.randint(2, 3)):
+            while key is not None:
+                lines.append(key)
+                key = key_by_name.get(ALL_CARD_DATA[key]['evolve_from'])
+        if rng.random() < 0.5:
+            lines.append(('rare candy', 'a3', '144'))
+        lines.extend([filler] * (10 - len(lines)))
+        decklists.append("\n".join(f"2 {name} {set_code} {number}" for name, set_code, number in lines))
+    return decklists
+
+
+def bench_classify(decks=2000, repeats=3):
+    """Throughput of main attacker classification (get_main_attackers_and_evolution_methods)."""
+    print(f"--- Main attacker classification ({decks} random decks) ---")
+    if not ALL_CARD_DATA and not load_card_data():
+        raise SystemExit("Failed to load card data.")
+    start = time.perf_counter()
+    graph = evolution_graph()
+    print(f"   - {graph} built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    parsed_decks = [parse_decklist(text) for text in _random_decklists(decks)]
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for parsed_deck in parsed_decks:
+            get_main_attackers_and_evolution_methods(parsed_deck)
+        best = min(best, time.perf_counter() - start)
+    print(f"   - {decks / best:,.0f} decks/s ({best / decks * 1e6:.1f} us/deck)")
+
+
+def bench_stratified(trials=5000, max_turns=7):
+    """Stratified sampling by opener vs. plain Monte Carlo: interval width for the same number of trials."""
+    print(f"--- Stratified vs. plain Monte Carlo ({trials} trials, {max_turns} turns) ---")
+    for name, (parsed_deck, main_attackers) in load_bench_decks().items():
+        start = time.perf_counter()
+        plain = simulate_brick_rate_with_examples(parsed_deck, main_attackers, trials=trials, show_examples=0,
+                                                  maxturns=max_turns, seed=0)
+        plain_time = time.perf_counter() - start
+        plain_error = math.sqrt(plain.brick_rate * (1 - plain.brick_rate) / trials)
+        print(f"   - {name}: plain {plain.brick_rate:.2%} +/- {1.96 * plain_error:.2%} ({plain_time:.1f} s)")
+        for cards in (5, 10):
+            start = time.perf_counter()
+            estimate = simulate_stratified(parsed_deck, main_attackers, trials=trials, maxturns=max_turns, seed=0,
+                                           cards=cards)
+            elapsed = time.perf_counter() - start
+            # Plain Monte Carlo trials needed for the same standard error at this brick rate
+            rate = estimate.brick_rate
+            equivalent = rate * (1 - rate) / estimate.std_error ** 2 if estimate.std_error else float('inf')
+            print(f"     stratified by first {cards:2d} cards ({len(estimate.strata)} strata): {rate:.2%} "
+                  f"+/- {1.96 * estimate.std_error:.2%} ({elapsed:.1f} s), worth {equivalent:,.0f} plain trials "
+                  f"({equivalent / trials:.2f}x)")
+
+
+def bench_control_variates(trials=5000, max_turns=7):
+    """Raw vs. control-variate brick-rate intervals over the same trials."""
+    print(f"--- Control variates ({trials} trials, {max_turns} turns) ---")
+    for name, (parsed_deck, main_attackers) in load_bench_decks().items():
+        plain_time = time_trials(lambda: simulate_brick_rate_with_examples(
+            parsed_deck, main_attackers, trials=trials, show_examples=0, maxturns=max_turns, seed=0), 1, repeats=1)
+        controlled_time = time_trials(lambda: simulate_with_control_variates(
+            parsed_deck, main_attackers, trials=trials, show_examples=0, maxturns=max_turns, seed=0), 1, repeats=1)
+        _, estimate = simulate_with_control_variates(parsed_deck, main_attackers, trials=trials, show_examples=0,
+                                                     maxturns=max_turns, seed=0)
+        print(f"   - {name}: raw {estimate.raw_rate:.2%} [{estimate.raw_ci_low:.2%}, {estimate.raw_ci_high:.2%}] -> "
+              f"controlled {estimate.brick_rate:.2%} [{estimate.ci_low:.2%}, {estimate.ci_high:.2%}], "
+              f"variance / {estimate.variance_reduction:.2f} ({len(estimate.coefficients)} controls, "
+              f"{(controlled_time - plain_time) / plain_time:+.1%} run time)")
+
+
+def bench_importance(trials=5000, max_turns=7, tilts=(0.85, 0.75, 0.6)):
+    """Importance sampling vs. plain Monte Carlo: plain trials worth of each tilted run."""
+    print(f"--- Importance sampling ({trials} trials, {max_turns} turns) ---")
+    for name, (parsed_deck, main_attackers) in load_bench_decks().items():
+        plain = simulate_brick_rate_with_examples(parsed_deck, main_attackers, trials=trials, show_examples=0,
+                                                  maxturns=max_turns, seed=0)
+        plain_error = math.sqrt(plain.brick_rate * (1 - plain.brick_rate) / trials)
+        print(f"   - {name}: plain {plain.brick_rate:.2%} +/- {1.96 * plain_error:.2%} ({plain.bricks} bricks)")
+        for tilt in tilts:
+            estimate = simulate_importance(parsed_deck, main_attackers, trials=trials, maxturns=max_turns, seed=0,
+                                           tilt=tilt)
+            rate = estimate.brick_rate
+            equivalent = rate * (1 - rate) / estimate.std_error ** 2 if estimate.std_error else float('inf')
+            print(f"     tilt {tilt:.2f}: {rate:.2%} +/- {1.96 * estimate.std_error:.2%} ({estimate.bricks} bricks, "
+                  f"mean weight {estimate.mean_weight:.3f}, ESS {estimate.ess:,.0f}, brick ESS "
+                  f"{estimate.brick_ess:,.0f}), worth {equivalent:,.0f} plain trials ({equivalent / trials:.2f}x)")
+
+
+def _one_card_edit(parsed_deck):
+    """The deck with its last card replaced by another copy of its first Professor's Research or Poké Ball."""
+    extra = next(c for c in parsed_deck if is_professors_research(c) or is_pokeball(c))
+    return parsed_deck[:-1] + [dict(extra)]
+
+
+def bench_bank(trials=3000, max_turns=7):
+    """Seeded shuffles vs. a shared permutation bank: trial cost and the interval of a one-card edit's effect."""
+    print(f"--- Permutation bank ({trials} trials, {max_turns} turns) ---")
+    bank = PermutationBank.generate(trials, seed=0)
+    path = os.path.join(tempfile.mkdtemp(), "bank.npy")
+    bank.save(path)
+    bank = PermutationBank.load(path)
+    print(f"   - {bank}")
+    for name, (parsed_deck, main_attackers) in load_bench_decks().items():
+        edited = _one_card_edit(parsed_deck)
+        seeded = time_trials(lambda: simulate_brick_rate_with_examples(
+            parsed_deck, main_attackers, trials=trials, show_examples=0, maxturns=max_turns, seed=0), 1, repeats=1)
+        banked = time_trials(lambda: simulate_with_bank(parsed_deck, main_attackers, bank, max_turns), 1, repeats=1)
+        # Independent runs: the difference carries the noise of both
+        a = simulate_brick_rate_with_examples(parsed_deck, main_attackers, trials=trials, show_examples=0,
+                                              maxturns=max_turns, seed=1)
+        b = simulate_brick_rate_with_examples(edited, main_attackers, trials=trials, show_examples=0,
+                                              maxturns=max_turns, seed=2)
+        independent = 1.96 * math.sqrt((a.brick_rate * (1 - a.brick_rate) + b.brick_rate * (1 - b.brick_rate)) / trials)
+        # Common random numbers: both decks play the same bank trials
+        outcomes_a, outcomes_b = [], []
+        simulate_with_bank(parsed_deck, main_attackers, bank, max_turns, outcomes=outcomes_a)
+        simulate_with_bank(edited, main_attackers, bank, max_turns, outcomes=outcomes_b)
+        diff, low, high = paired_difference(outcomes_b, outcomes_a)
+        print(f"   - {name}: {seeded / trials:.0f} -> {banked / trials:.0f} us/trial; one-card edit "
+              f"{b.brick_rate - a.brick_rate:+.2%} +/- {independent:.2%} independent, "
+              f"{diff:+.2%} +/- {(high - low) / 2:.2%} on the bank ({(independent / ((high - low) / 2)) ** 2:.1f}x)")
+    shutil.rmtree(os.path.dirname(path))
+
+
+def bench_incremental(trials=2000, max_turns=5):
+    """A full re-run vs. re-simulating only the trials a one-card edit can change (results must match exactly)."""
+    print(f"--- Incremental re-simulation ({trials} trials, {max_turns} turns) ---")
+    for name, (parsed_deck, main_attackers) in load_bench_decks().items():
+        edited = _one_card_edit(parsed_deck)
+        full = time_trials(lambda: simulate_brick_rate_with_examples(
+            parsed_deck, main_attackers, trials=trials, show_examples=0, maxturns=max_turns, seed=0), 1, repeats=1)
+        recorded = time_trials(lambda: TrialRecords.simulate(parsed_deck, main_attackers, trials, max_turns, seed=0),
+                               1, repeats=1)
+        records = TrialRecords.simulate(parsed_deck, main_attackers, trials, max_turns, seed=0)
+        start = time.perf_counter()
+        edit, resimulated = records.edit(edited, main_attackers)
+        incremental = (time.perf_counter() - start) * 1e6
+        fresh = TrialRecords.simulate(edit.full_deck, main_attackers, trials, max_turns, seed=0)
+        exact = np.array_equal(edit.records, fresh.records)
+        print(f"   - {name}: full run {full / 1000:.0f} ms, with records {recorded / 1000:.0f} ms "
+              f"({recorded / full - 1:+.0%}); edit re-simulates {resimulated}/{trials} trials in "
+              f"{incremental / 1000:.0f} ms ({full / incremental:.2f}x), {'exact' if exact else 'MISMATCH'}")
+
+
+# Trace events of the action loop's actions that did something, by position in the loop
+_LOOP_ACTIONS = {RESEARCH: 0, IONO: 0, SUPPORTER: 0, PLACE: 1, POKEBALL: 2, EVOLVE_END: 3, SWITCH: 4}
+
+
+def _full_pass_count(trace):
+    """
+    Passes each turn's action loop would make if every pass tried every action, from a game's trace:
+    actions taken in one pass run in loop order, so each run of them in increasing order is one pass,
+    plus the final pass where nothing happens. Returns the total over the game's turns.
+    """
+    passes = 0
+    previous = None
+    for turn, action, card, src, dst in trace.records().tolist():
+        if action == TURN_START:
+            passes += 1
+            previous = None
+        elif action in _LOOP_ACTIONS and turn > 0:
+            position = _LOOP_ACTIONS[action]
+            if action == PLACE and previous == position:
+                continue  # one call places several basics
+            if previous is None or position <= previous:
+                passes += 1
+            previous = position
+    return passes
+
+
+def bench_action_loop(trials=2000, max_turns=7):
+    """Action attempts per turn: the worklist loop vs. full passes over every action (same games)."""
+    print(f"--- Action loop ({trials} trials, {max_turns} turns) ---")
+    for name, (parsed_deck, main_attackers) in load_bench_decks().items():
+        effects = compile_deck_effects(parsed_deck)
+        counts = Counter()
+        per_trial = time_trials(lambda: simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns, effects=effects, action_counts=counts), trials, repeats=1)
+        trace = GameTrace(parsed_deck)
+        full_passes = 0
+        random.seed(0)
+        for _ in range(trials):
+            simulate_one_trial_with_logging(parsed_deck, main_attackers, max_turns=max_turns, effects=effects,
+                                            trace=trace)
+            full_passes += _full_pass_count(trace)
+        full_attempts = full_passes * (4 + len(effects.actions))
+        print(f"   - {name}: {full_attempts / counts['turns']:.2f} -> {counts['attempts'] / counts['turns']:.2f} "
+              f"action attempts/turn ({1 - counts['attempts'] / full_attempts:.0%} fewer), {per_trial:.0f} us/trial")
+
+
+BENCHMARKS = {
+    'card_stats': bench_card_stats,
+    'examples': bench_examples,
+    'effects': bench_effects,
+    'trace': bench_trace,
+    'archive': bench_archive,
+    'startup': bench_startup,
+    'card_store': bench_card_store,
+    'card_image': bench_card_image,
+    'classify': bench_classify,
+    'stratified': bench_stratified,
+    'control_variates': bench_control_variates,
+    'importance': bench_importance,
+    'bank': bench_bank,
+    'incremental': bench_incremental,
+    'action_loop': bench_action_loop,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            continue
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+from tcg_carddb import build_card_db, check_trainer_names, read_card_db, read_set_export
+
+# =============================================================================
+# Card Database Checks: categories of named trainers, build-time name checks
+# =============================================================================
+
+# card name -> (category, pokemon_stage) the build must give it
+EXPECTED_CATEGORIES = {
+    'pokémon center lady': ('supporter', ''),
+    'ilima': ('supporter', ''),
+    'traveling merchant': ('supporter', ''),
+    "professor's research": ('supporter', ''),
+    'old amber': ('fossil', 'basic'),
+    'helix fossil': ('fossil', 'basic'),
+    'dome fossil': ('fossil', 'basic'),
+    'poké ball': ('item', ''),
+    'giant cape': ('item', ''),
+}
+
+
+def check_categories(records):
+    """Returns a list of cards whose category or stage differs from EXPECTED_CATEGORIES."""
+    failures = []
+    found = set()
+    for record in records:
+        expected = EXPECTED_CATEGORIES.get(record['card_name'])
+        if expected is None:
+            continue
+        found.add(record['card_name'])
+        if (record['category'], record['pokemon_stage']) != expected:
+            failures.append(f"{record['card_name']} ({record['set_code']} {record['card_number']}): "
+                            f"{record['category']}/{record['pokemon_stage']}, expected {expected[0]}/{expected[1]}")
+    failures.extend(f"{name}: not in the card data" for name in sorted(set(EXPECTED_CATEGORIES) - found))
+    return failures
+
+
+def check_name_validation(records):
+    """Returns a list of failures if check_trainer_names rejects the card data or misses a name with no card."""
+    failures = []
+    try:
+        check_trainer_names(records)
+    except ValueError as e:
+        failures.append(f"card data rejected: {e}")
+    # Without Ilima's cards the 'ilima' entry matches nothing, as a misspelled entry would
+    try:
+        check_trainer_names([r for r in records if r['card_name'] != 'ilima'])
+        failures.append("a SUPPORTER_NAMES entry without cards was accepted")
+    except ValueError:
+        pass
+    return failures
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else "ALL_SETS.csv"
+    with tempfile.TemporaryDirectory() as tmp:
+        build_card_db([source], os.path.join(tmp, "cards.json"))
+        records = read_card_db(os.path.join(tmp, "cards.json"))
+    failures = check_categories(records) + check_name_validation(read_set_export(source))
+    for line in failures:
+        print(f"   - {line}")
+    print(f"card database: {'FAILED' if failures else 'OK'} ({len(records)} cards)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
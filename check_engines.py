@@ -0,0 +1,182 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+from tcg_utils import *
+from test1 import CardData, DeckParser, GameSimulator, MainAttackerAnalyzer
+from tcg_jobs import JobService
+from bench import BENCH_DECKS
+
+# =============================================================================
+# Engine Checks: golden fingerprints, test1 façade vs. tcg_utils, traces vs. text logs, example replays
+# =============================================================================
+
+# Fingerprints of seeded games of the BENCH_DECKS, recorded from a known-good engine. Both APIs run
+# on the one engine, so this (not comparing them) is what catches a change to the games themselves.
+# After an intended rule change, bump SIMULATOR_VERSION and re-record with --update-golden.
+GOLDEN_PATH = "engine_golden.json"
+GOLDEN_TRIALS, GOLDEN_SEED, GOLDEN_TURNS = 300, 0, 7
+
+
+def engine_fingerprint(deck_text, trials=GOLDEN_TRIALS, seed=GOLDEN_SEED, max_turns=GOLDEN_TURNS):
+    """Main attackers, bricks and a digest of every seeded trial's flags and log for one deck."""
+    parsed_deck = parse_decklist(deck_text)
+    main_attackers, _ = get_main_attackers_and_evolution_methods(parsed_deck)
+    main_attackers = sorted(main_attackers)
+    digest = hashlib.sha256(repr(main_attackers).encode('utf-8'))
+    bricks = 0
+    for i in range(trials):
+        outcome = simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns, log_details=True, rng=random.Random(trial_seed(seed, i))
+        )
+        digest.update(repr(outcome).encode('utf-8'))
+        bricks += bool(outcome[0])
+    return {'simulator_version': SIMULATOR_VERSION, 'trials': trials, 'seed': seed, 'max_turns': max_turns,
+            'main_attackers': main_attackers, 'bricks': bricks, 'digest': digest.hexdigest()}
+
+
+def compare_golden(deck_text, golden):
+    """Replays a deck's golden run and returns a list of divergences from it."""
+    if golden is None:
+        return ["no golden fingerprint (record one with --update-golden)"]
+    current = engine_fingerprint(deck_text, golden['trials'], golden['seed'], golden['max_turns'])
+    return [f"golden {key}: {golden[key]} vs {current[key]}"
+            for key in ('simulator_version', 'main_attackers', 'bricks', 'digest') if current[key] != golden[key]]
+
+
+def compare_facade(deck_text, trials=500, seed=0, max_turns=7):
+    """
+    Runs the same seeded trials through the functional API (tcg_utils) and the class API (test1)
+    and returns a list of divergences (empty when both agree on every trial). test1 is a façade
+    over the tcg_utils engine, so this checks its parsing, classification and argument passing.
+    """
+    divergences = []
+    card_data = CardData()
+    parsed_deck = parse_decklist(deck_text)
+    class_deck = DeckParser(card_data).parse_decklist(deck_text)
+    main_attackers, methods = get_main_attackers_and_evolution_methods(parsed_deck)
+    class_attackers, class_methods = MainAttackerAnalyzer.get_main_attackers_and_evolution_methods(
+        class_deck, card_data
+    )
+    if sorted(main_attackers) != sorted(class_attackers) or methods != class_methods:
+        divergences.append(f"main attackers: {sorted(main_attackers)} vs {sorted(class_attackers)}")
+
+    simulator = GameSimulator(card_data)
+    for i in range(trials):
+        s = trial_seed(seed, i)
+        functional = simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns, log_details=True, rng=random.Random(s)
+        )
+        oop = simulator.simulate_one_trial_with_logging(
+            class_deck, class_attackers, max_turns=max_turns, log_details=True, rng=random.Random(s)
+        )
+        if functional != oop:
+            divergences.append(f"trial {i}: brick flags {functional[:3]} vs {oop[:3]}")
+            break
+
+    functional_run = simulate_brick_rate_with_examples(
+        parsed_deck, main_attackers, trials=trials, show_examples=3, maxturns=max_turns, seed=seed
+    )
+    oop_run = simulator.simulate_brick_rate_with_examples(
+        class_deck, class_attackers, trials=trials, show_examples=3, maxturns=max_turns, seed=seed
+    )
+    if functional_run.to_dict() != oop_run.to_dict() or functional_run.example_logs != oop_run.example_logs:
+        divergences.append(f"runner: {functional_run.bricks} vs {oop_run.bricks} bricks")
+    return divergences
+
+
+def compare_trace_rendering(deck_text, trials=500, seed=0, max_turns=7):
+    """Checks that logs rendered from event traces equal the logs written with log_details=True."""
+    divergences = []
+    parsed_deck = parse_decklist(deck_text)
+    main_attackers, _ = get_main_attackers_and_evolution_methods(parsed_deck)
+    trace = GameTrace(parsed_deck)
+    for i in range(trials):
+        s = trial_seed(seed, i)
+        _, _, _, log = simulate_one_trial_with_logging(
+            parsed_deck, main_attackers, max_turns=max_turns, log_details=True, rng=random.Random(s)
+        )
+        simulate_one_trial_with_logging(parsed_deck, main_attackers, max_turns=max_turns, rng=random.Random(s),
+                                        trace=trace)
+        rendered = render_trace(trace, main_attackers)
+        if rendered != log:
+            line = next((a for a, b in zip(log, rendered) if a != b), "length differs")
+            divergences.append(f"trial {i}: trace rendering differs at {line!r}")
+            break
+    return divergences
+
+
+def compare_example_replays(deck_text, trials=500, max_turns=7):
+    """
+    Checks that the example logs of stored results are bricked games, through simulate_with_store and
+    the JobService, when the deck is read back with its decklist lines in reverse order.
+    """
+    divergences = []
+    lines = [line for line in deck_text.strip().splitlines() if line.strip()]
+    parsed_deck = parse_decklist(deck_text)
+    reordered_deck = parse_decklist("\n".join(reversed(lines)))
+    main_attackers, _ = get_main_attackers_and_evolution_methods(parsed_deck)
+    with tempfile.TemporaryDirectory() as directory:
+        store_path = os.path.join(directory, "results.db")
+        store = ResultStore(store_path)
+        try:
+            simulate_with_store(store, parsed_deck, main_attackers, trials=trials, show_examples=10, maxturns=max_turns)
+            stored = simulate_with_store(store, reordered_deck, main_attackers, trials=trials, show_examples=10,
+                                         maxturns=max_turns)
+        finally:
+            store.close()
+        service = JobService(workers=1, store_path=store_path)
+        try:
+            status = service.wait(service.submit(reordered_deck, main_attackers, trials=trials, show_examples=10,
+                                                 maxturns=max_turns))
+        finally:
+            service.close()
+    if status.error is not None:
+        return [f"example replays: job failed with {status.error!r}"]
+    for source, logs in (("store", stored.example_logs), ("job", status.result.example_logs)):
+        not_bricked = sum('RESULT: BRICK' not in log for log in logs)
+        if not_bricked:
+            divergences.append(f"{source} examples: {not_bricked} of {len(logs)} replayed games did not brick")
+    return divergences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the simulation engine against its golden fingerprints.")
+    parser.add_argument('trials', type=int, nargs='?', default=500, help="Trials of the façade and trace checks")
+    parser.add_argument('--update-golden', action='store_true',
+                        help=f"Re-record {GOLDEN_PATH} from the current engine instead of checking it")
+    args = parser.parse_args()
+    if not load_card_data():
+        raise SystemExit("Failed to load card data.")
+    if args.update_golden:
+        goldens = {name: engine_fingerprint(deck_text) for name, deck_text in BENCH_DECKS.items()}
+        with open(GOLDEN_PATH, 'w', encoding='utf-8') as f:
+            json.dump(goldens, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Recorded golden fingerprints of {len(goldens)} decks in {GOLDEN_PATH}.")
+        return
+    try:
+        with open(GOLDEN_PATH, encoding='utf-8') as f:
+            goldens = json.load(f)
+    except FileNotFoundError:
+        goldens = {}
+    diverged = False
+    for name, deck_text in BENCH_DECKS.items():
+        divergences = (compare_golden(deck_text, goldens.get(name)) + compare_facade(deck_text, trials=args.trials)
+                       + compare_trace_rendering(deck_text, trials=args.trials)
+                       + compare_example_replays(deck_text, trials=args.trials))
+        if divergences:
+            diverged = True
+            print(f"{name}: DIVERGED")
+            for line in divergences:
+                print(f"   - {line}")
+        else:
+            print(f"{name}: OK ({args.trials} trials)")
+    sys.exit(1 if diverged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
-import pandas as pd
+import csv
+from collections import Counter
 
-data = pd.read_csv("ALL_SETS.csv")
+with open("ALL_SETS.csv", newline="", encoding="utf-8") as f:
+    reader = csv.DictReader(f)
+    fieldnames = reader.fieldnames
+    data = list(reader)
 
 supporter_names = [
     "erika","misty","blaine","koga","giovanni","brock","sabrina","lt. surge",
@@ -29,19 +33,26 @@ CARD_TYPE_MAPPING = {
     'Fighting': 'pokemon'
 }
 
-# Map Pokémon typings to "pokemon"
-data['card_type'] = data['card_type'].map(CARD_TYPE_MAPPING).fillna(data['card_type'])
+for row in data:
+    # Map Pokémon typings to "pokemon"
+    row['card_type'] = CARD_TYPE_MAPPING.get(row['card_type'], row['card_type'])
 
-# Mark supporters
-data.loc[data['card_name'].str.lower().isin(supporter_names), 'card_type'] = 'supporter'
+    # Mark supporters
+    if row['card_name'].lower() in supporter_names:
+        row['card_type'] = 'supporter'
 
-# Mark tools (leftover trainers that are not supporters)
-data.loc[data['card_type'] == 'trainer', 'card_type'] = 'tool'
+    # Mark tools (leftover trainers that are not supporters)
+    if row['card_type'] == 'trainer':
+        row['card_type'] = 'tool'
 
-#if card_name contains fossil make a type fossil and pokemon stage = basic
-data.loc[data['card_name'].str.contains('Fossil', case=False, na=False), 'card_type'] = 'fossil'
-data.loc[data['card_name'].str.contains('Fossil', case=False, na=False), 'pokemon_stage'] = 'Basic'
+    #if card_name contains fossil make a type fossil and pokemon stage = basic
+    if 'fossil' in row['card_name'].lower():
+        row['card_type'] = 'fossil'
+        row['pokemon_stage'] = 'Basic'
 
-print(data['card_type'].value_counts())
+print(Counter(row['card_type'] for row in data).most_common())
 
-data.to_csv("ALL_SETS_CLEANED.csv", index=False)
+with open("ALL_SETS_CLEANED.csv", "w", newline="", encoding="utf-8") as f:
+    writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(data)
@@ -0,0 +1,204 @@
+import json
+import os
+import numpy as np
+from tcg_store import deck_signature, write_json_atomic
+
+# =============================================================================
+# Game Archive
+# =============================================================================
+
+ARCHIVE_VERSION = 3
+
+# Bits of the 'flags' field
+BRICK, NO_ATTACKER, KEY_STUCK = 1, 2, 4
+
+
+def game_dtype(max_turns):
+    """
+    One fixed-width record per game:
+    - seed: the trial seed, so any game can be replayed (see replay_trials)
+    - flags: BRICK | NO_ATTACKER | KEY_STUCK
+    - attackers: main attackers in play at the end of turns 1..max_turns
+    - seen: bitmask of the deck's card names seen by the end of turns 0..max_turns (turn 0 = opening hand);
+      bit i is card_names[i] of the archive
+    - played: bitmask of the card names of which a copy left the hand (placed, evolved or used as a trainer)
+    """
+    return np.dtype([
+        ('seed', '<u8'),
+        ('flags', 'u1'),
+        ('attackers', 'u1', (max_turns,)),
+        ('seen', '<u4', (max_turns + 1,)),
+        ('played', '<u4'),
+    ])
+
+
+def _meta_path(path):
+    return f"{path}.json"
+
+
+class GameArchiveWriter:
+    """
+    Streams one summary record per simulated game to `path`, a flat file of game_dtype records
+    that GameArchive memory-maps. Card metadata goes to `path`.json. Appending to an existing
+    archive requires the same deck and max_turns (ValueError otherwise).
+
+    The writer doubles as a per-trial collector (begin_trial / end_turn / end_trial, like
+    CardStatsCollector) to record which cards were seen each turn; add() then writes the record.
+    """
+
+    def __init__(self, path, full_deck, max_turns, buffer_size=4096):
+        self.path = path
+        self.max_turns = max_turns
+        self.card_names = sorted(set(c['name'] for c in full_deck))
+        if len(self.card_names) > 32:
+            raise ValueError("Game archives support at most 32 distinct cards per deck.")
+        self.dtype = game_dtype(max_turns)
+        meta = {
+            'version': ARCHIVE_VERSION,
+            'deck': deck_signature(full_deck),
+            'card_names': self.card_names,
+            'max_turns': max_turns,
+        }
+        if os.path.exists(_meta_path(path)):
+            with open(_meta_path(path), encoding='utf-8') as f:
+                existing = json.load(f)
+            if existing != meta:
+                raise ValueError(f"Game archive {path} was written for a different deck or max_turns.")
+        else:
+            write_json_atomic(_meta_path(path), meta)
+        self._file = open(path, 'ab')
+        self._rows = []
+        self._buffer_size = buffer_size
+
+        bit = {name: 1 << i for i, name in enumerate(self.card_names)}
+        self._bits = [(id(c), bit[c['name']]) for c in full_deck]
+        self._seen = [0] * (max_turns + 1)
+        self._played = 0
+
+    def discard_from(self, run_seed, trial_index):
+        """
+        Drops trailing records of run `run_seed` with trial index >= `trial_index`, i.e. games written
+        after the checkpoint a run is being resumed from (they are simulated again).
+        """
+        self.flush()
+        size = os.path.getsize(self.path)
+        if size < self.dtype.itemsize:
+            return
+        seeds = np.memmap(self.path, dtype=self.dtype, mode='r')['seed']
+        keep = len(seeds)
+        while keep and int(seeds[keep - 1]) >> 32 == run_seed and int(seeds[keep - 1]) & 0xFFFFFFFF >= trial_index:
+            keep -= 1
+        del seeds
+        if keep * self.dtype.itemsize != size:
+            self._file.truncate(keep * self.dtype.itemsize)
+
+    def begin_trial(self):
+        self._seen[:] = [0] * (self.max_turns + 1)
+
+    def end_turn(self, turn, deck, bench, max_bench=3):
+        in_deck = set(map(id, deck))
+        # Cumulative: a card shuffled back into the deck (e.g. by Iono) stays seen
+        mask = self._seen[turn - 1] if turn > 0 else 0
+        for card_id, bit in self._bits:
+            if card_id not in in_deck:
+                mask |= bit
+        self._seen[turn] = mask
+
+    def end_trial(self, is_brick, hand, deck, pending=()):
+        not_played = set(map(id, hand))
+        not_played.update(map(id, deck), map(id, pending))
+        mask = 0
+        for card_id, bit in self._bits:
+            if card_id not in not_played:
+                mask |= bit
+        self._played = mask
+
+    def add(self, seed, is_brick, brick_no_attacker, brick_key_stuck, attackers_by_turn):
+        """Writes the record of the trial that just ended."""
+        if not 0 <= seed < 2 ** 64:
+            raise ValueError(f"Trial seed {seed} does not fit the archive's 64-bit seed column.")
+        flags = (BRICK if is_brick else 0) | (NO_ATTACKER if brick_no_attacker else 0) | \
+                (KEY_STUCK if brick_key_stuck else 0)
+        self._rows.append((seed, flags, tuple(attackers_by_turn), tuple(self._seen), self._played))
+        if len(self._rows) == self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            self._file.write(np.array(self._rows, dtype=self.dtype).tobytes())
+            self._rows = []
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class GameArchive:
+    """
+    Read-only view of an archive written by GameArchiveWriter. `records` is a NumPy memmap of
+    game_dtype records and the field properties are zero-copy views into it, e.g.
+
+        archive = GameArchive("run.games")
+        archive.brick_rate(archive.seen_by("rare candy", 0))     # brick rate when Rare Candy is in the opener
+    """
+
+    def __init__(self, path):
+        with open(_meta_path(path), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != ARCHIVE_VERSION:
+            raise ValueError(f"Game archive {path} has unsupported version {meta.get('version')}.")
+        self.path = path
+        self.card_names = meta['card_names']
+        self.max_turns = meta['max_turns']
+        self.dtype = game_dtype(self.max_turns)
+        if os.path.getsize(path) >= self.dtype.itemsize:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r')
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def seeds(self):
+        return self.records['seed']
+
+    @property
+    def flags(self):
+        return self.records['flags']
+
+    @property
+    def attackers(self):
+        return self.records['attackers']
+
+    @property
+    def seen(self):
+        return self.records['seen']
+
+    @property
+    def played(self):
+        return self.records['played']
+
+    @property
+    def is_brick(self):
+        return (self.flags & BRICK) != 0
+
+    def card_bit(self, card_name):
+        if card_name not in self.card_names:
+            raise KeyError(f"'{card_name}' is not in the archived deck. Cards: {', '.join(self.card_names)}")
+        return np.uint32(1 << self.card_names.index(card_name))
+
+    def seen_by(self, card_name, turn):
+        """Boolean mask of games in which `card_name` was seen by the end of `turn` (0 = opening hand)."""
+        return (self.seen[:, turn] & self.card_bit(card_name)) != 0
+
+    def played_mask(self, card_name):
+        """Boolean mask of games in which a copy of `card_name` was played."""
+        return (self.played & self.card_bit(card_name)) != 0
+
+    def brick_rate(self, mask=None):
+        """Brick rate over all games, or over the games selected by a boolean `mask`; returns (rate, games)."""
+        bricks = self.is_brick if mask is None else self.is_brick[mask]
+        games = len(bricks)
+        return (float(bricks.mean()) if games else 0.0), games
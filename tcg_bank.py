@@ -0,0 +1,157 @@
+import random
+import numpy as np
+from tcg_utils import *
+
+# =============================================================================
+# Permutation Bank
+# =============================================================================
+
+DECK_SLOTS = 20
+
+# In-game reshuffles (Iono, Shiinotic) and random picks per trial served from the bank; any further
+# ones fall back to random.Random(trial index)
+DEFAULT_RESHUFFLES = 15
+
+
+class PermutationBank:
+    """
+    Precomputed random numbers for batch scoring: `perms[i, k]` is a random permutation of the deck
+    slots 0..19 for trial i. Row 0 deals trial i's deck (slot j = the j-th card of the decklist), rows
+    1.. serve the trial's in-game shuffles and picks in order (see BankRng).
+
+    Every deck scored against the same bank plays trial i from the same numbers (common random
+    numbers), so differences between decks are not drowned in shuffle noise, and trials skip
+    building a seeded generator. The bank is a uint8 array saved as .npy and memory-mapped on load,
+    so worker processes share one copy:
+
+        bank = PermutationBank.generate(10000, seed=1)
+        bank.save("bank.npy")
+        bank = PermutationBank.load("bank.npy")
+    """
+
+    def __init__(self, perms):
+        if perms.ndim != 3 or perms.shape[2] != DECK_SLOTS:
+            raise ValueError(f"Permutation bank must have shape (trials, streams, {DECK_SLOTS}), got {perms.shape}.")
+        self.perms = perms
+        self.path = None
+
+    @classmethod
+    def generate(cls, trials, reshuffles=DEFAULT_RESHUFFLES, seed=None):
+        rng = np.random.default_rng(seed)
+        keys = rng.random((trials, reshuffles + 1, DECK_SLOTS))
+        return cls(np.argsort(keys, axis=2).astype(np.uint8))
+
+    @classmethod
+    def load(cls, path):
+        bank = cls(np.load(path, mmap_mode='r'))
+        bank.path = path
+        return bank
+
+    def save(self, path):
+        np.save(path, np.ascontiguousarray(self.perms, dtype=np.uint8))
+        self.path = path
+
+    def __len__(self):
+        return len(self.perms)
+
+    def rng(self, trial_index):
+        return BankRng(self.perms[trial_index], trial_index)
+
+    def __repr__(self):
+        trials, streams, _ = self.perms.shape
+        return f"PermutationBank({trials} trials, {streams - 1} reshuffles, {self.perms.nbytes / 1024:.0f} KiB)"
+
+
+class BankRng:
+    """
+    Stands in for the random.Random of one trial. shuffle() and randrange() take the next permutation
+    of the trial's stream; a permutation of the 20 slots restricted to the values below n is a uniform
+    permutation of n items, so shorter lists are shuffled by it too.
+    """
+
+    def __init__(self, rows, trial_index):
+        self._rows = rows
+        self._next = 1
+        self._trial_index = trial_index
+        self._fallback = None
+
+    def deal(self, full_deck):
+        """The trial's deck order: the decklist's cards permuted by the trial's first row."""
+        n = len(full_deck)
+        return [full_deck[j] for j in self._rows[0].tolist() if j < n]
+
+    def _permutation(self, n):
+        if self._next < len(self._rows) and n <= DECK_SLOTS:
+            row = self._rows[self._next].tolist()
+            self._next += 1
+            return [j for j in row if j < n] if n < DECK_SLOTS else row
+        if self._fallback is None:
+            self._fallback = random.Random(self._trial_index)
+        perm = list(range(n))
+        self._fallback.shuffle(perm)
+        return perm
+
+    def shuffle(self, x):
+        x[:] = [x[j] for j in self._permutation(len(x))]
+
+    def randrange(self, n):
+        return self._permutation(n)[0]
+
+
+# =============================================================================
+# Batch Scoring
+# =============================================================================
+
+def simulate_with_bank(full_deck, precomputed_attackers, bank, maxturns=7, first_trial=0, trials=None, stats=None,
+                       outcomes=None):
+    """
+    Simulates trials first_trial.. of `bank` (all of them by default) for one deck of up to 20 cards and
+    returns a SimulationResult (without examples). If `outcomes` is a list, each trial's brick flag is
+    appended to it, e.g. for paired_difference.
+    """
+    if len(full_deck) > DECK_SLOTS:
+        raise ValueError(f"Permutation banks deal decks of at most {DECK_SLOTS} cards.")
+    if trials is None:
+        trials = len(bank) - first_trial
+    effects = compile_deck_effects(full_deck)
+    result = SimulationResult(maxturns, max_examples=0)
+    for i in range(first_trial, first_trial + trials):
+        rng = bank.rng(i)
+        attackers_by_turn = []
+        is_brick, brick_attacker, brick_key, _ = simulate_one_trial_with_logging(
+            full_deck, precomputed_attackers, max_turns=maxturns, stats=stats, attackers_by_turn=attackers_by_turn,
+            rng=rng, effects=effects, deck_order=rng.deal(full_deck)
+        )
+        result.add_trial(is_brick, brick_attacker, brick_key, attackers_by_turn=attackers_by_turn)
+        if outcomes is not None:
+            outcomes.append(is_brick)
+    return result
+
+
+def score_decks(decks, bank, maxturns=7):
+    """
+    Scores every deck against the same bank. `decks` maps a name to a parsed deck (or a
+    (parsed deck, main attackers) pair); returns {name: SimulationResult}.
+    """
+    results = {}
+    for name, deck in decks.items():
+        if isinstance(deck, tuple):
+            parsed_deck, main_attackers = deck
+        else:
+            parsed_deck = deck
+            main_attackers, _ = get_main_attackers_and_evolution_methods(parsed_deck)
+        results[name] = simulate_with_bank(parsed_deck, main_attackers, bank, maxturns)
+    return results
+
+
+def paired_difference(bricks_a, bricks_b, z=1.96):
+    """
+    Brick-rate difference a - b of two decks scored on the same trials, with a normal interval from
+    the per-trial differences (bricks_a / bricks_b are per-trial 0/1 sequences). Returns (diff, low, high).
+    """
+    a = np.asarray(bricks_a, dtype=float)
+    b = np.asarray(bricks_b, dtype=float)
+    d = a - b
+    diff = float(d.mean())
+    error = float(d.std(ddof=1) / np.sqrt(len(d))) if len(d) > 1 else 0.0
+    return diff, diff - z * error, diff + z * error
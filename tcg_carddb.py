@@ -0,0 +1,539 @@
+import argparse
+import csv
+import glob
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from array import array
+from collections.abc import Mapping
+import numpy as np
+from tcg_effects import card_effects
+from tcg_store import write_bytes_atomic, write_json_atomic
+
+# =============================================================================
+# Card Categories
+# =============================================================================
+
+CARD_DB_VERSION = 2
+
+# Map CSV types to internal types
+CARD_TYPE_MAPPING = {
+    'Metal': 'pokemon',
+    'Dragon': 'pokemon',
+    'Fire': 'pokemon',
+    'Trainer': 'trainer',
+    'Lightning': 'pokemon',
+    'Darkness': 'pokemon',
+    'Water': 'pokemon',
+    'Grass': 'pokemon',
+    'Psychic': 'pokemon',
+    'Colorless': 'pokemon',
+    'Fighting': 'pokemon'
+}
+
+SUPPORTER_NAMES = {
+    "erika", "misty", "blaine", "koga", "giovanni", "brock", "sabrina", "lt. surge",
+    "budding expeditioner", "blue", "leaf",
+    "cyrus", "team galactic grunt", "cynthia", "volkner", "dawn", "mars",
+    "irida", "celestic town elder", "barry", "adaman",
+    "iono", "pokémon center lady", "red", "team rocket grunt",
+    "acerola", "ilima", "kiawe", "guzma", "lana", "sophocles", "mallow", "lillie",
+    "gladion", "looker", "lusamine", "hau", "penny",
+    "will", "lyra", "silver", "fisher", "jasmine", "hiker",
+    "whitney", "traveling merchant", "morty",
+    "professor's research"
+}
+
+# Trainers that Pokémon evolve from; they are played as basic Pokémon
+FOSSIL_NAMES = {"helix fossil", "dome fossil", "old amber", "skull fossil", "armor fossil"}
+
+# Every other trainer is an item (Pokémon Tools included)
+CATEGORIES = ('pokemon', 'supporter', 'item', 'fossil')
+STAGES = ('basic', 'stage1', 'stage2', '')
+
+# Columns every set export must have (see export.js)
+REQUIRED_COLUMNS = ('set_code', 'card_name', 'card_number', 'card_type', 'pokemon_stage', 'ex')
+
+# export.js writes "N/A" for missing values; older exports leave the cell empty
+_MISSING = ('', 'n/a', 'nan')
+
+
+def _clean(value):
+    value = (value or '').strip().lower()
+    return '' if value in _MISSING else value
+
+
+def card_category(card_name, card_type):
+    """Supporter / fossil / item for trainers (by exact card name), 'pokemon' otherwise."""
+    if card_type != 'trainer':
+        return 'pokemon'
+    if card_name in SUPPORTER_NAMES:
+        return 'supporter'
+    return 'fossil' if card_name in FOSSIL_NAMES else 'item'
+
+
+def check_trainer_names(records):
+    """
+    Raises ValueError if a SUPPORTER_NAMES or FOSSIL_NAMES entry matches no trainer of `records`
+    (e.g. a misspelling), or if a Pokémon evolves from a trainer that is not in FOSSIL_NAMES.
+    """
+    trainers = {r['card_name'] for r in records if r['card_type'] == 'trainer'}
+    for names, kind in ((SUPPORTER_NAMES, 'SUPPORTER_NAMES'), (FOSSIL_NAMES, 'FOSSIL_NAMES')):
+        unknown = sorted(names - trainers)
+        if unknown:
+            raise ValueError(f"{kind} entries match no trainer card: {unknown}")
+    unlisted = sorted({r['evolve_from'] for r in records} & trainers - FOSSIL_NAMES)
+    if unlisted:
+        raise ValueError(f"Pokémon evolve from trainers missing from FOSSIL_NAMES: {unlisted}")
+
+
+def card_record(row):
+    """
+    One typed card record from a CSV row. Raises ValueError for rows that do not fit the schema.
+    The keys are those of ALL_CARD_DATA entries (minus the effects, which are looked up by name).
+    """
+    card_name = _clean(row['card_name'])
+    card_number = (row['card_number'] or '').strip()
+    if not card_name or not card_number:
+        raise ValueError(f"missing card name or number: {dict(row)}")
+    card_type = CARD_TYPE_MAPPING.get(row['card_type'].strip(), _clean(row['card_type']))
+    stage = _clean(row['pokemon_stage'])
+    if stage not in STAGES:
+        raise ValueError(f"unknown pokemon_stage '{row['pokemon_stage']}' for {card_name}")
+    ex = row['ex'].strip().lower()
+    if ex not in ('yes', 'no'):
+        raise ValueError(f"ex must be Yes or No, got '{row['ex']}' for {card_name}")
+    category = card_category(card_name, card_type)
+    if category == 'fossil':
+        # Fossils are played as basic Pokémon
+        stage = 'basic'
+    return {
+        'card_type': card_type,
+        'category': category,
+        'pokemon_stage': stage,
+        'ex': ex == 'yes',
+        'card_name': card_name,
+        'evolve_from': _clean(row.get('evolves_from')),
+        'rarity': _clean(row.get('rarity')),
+        'set_code': _clean(row.get('set_code')),
+        'card_number': card_number,
+    }
+
+
+# =============================================================================
+# Incremental Build
+# =============================================================================
+
+def read_set_export(path, content=None):
+    """Parses and validates one exported CSV; returns its card records. Errors name the file and line."""
+    if content is None:
+        with open(path, 'rb') as f:
+            content = f.read()
+    reader = csv.DictReader(io.StringIO(content.decode('utf-8'), newline=''))
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"{path}: missing columns {missing}")
+    records = []
+    for row in reader:
+        try:
+            records.append(card_record(row))
+        except ValueError as e:
+            raise ValueError(f"{path}, line {reader.line_num}: {e}") from None
+    return records
+
+
+def default_sources():
+    """The per-set exports in data/ (written by export.js), or ALL_SETS.csv if there are none."""
+    return sorted(glob.glob(os.path.join("data", "*.csv"))) or ["ALL_SETS.csv"]
+
+
+def build_card_db(sources=None, out_path="cards.json"):
+    """
+    Builds the card database at `out_path` from CSV exports (default: default_sources()).
+
+    The database keeps every source file's content hash next to its records, so a rebuild only
+    parses files whose content changed (or that are new); the others are copied from the previous
+    build. Card keys must be unique across all sources, and the supporter and fossil names must
+    match the cards (check_trainer_names). Returns a dict with the rebuilt and reused
+    source names.
+    """
+    sources = default_sources() if sources is None else list(sources)
+    previous = {}
+    if os.path.exists(out_path):
+        with open(out_path, encoding='utf-8') as f:
+            db = json.load(f)
+        if db.get('version') == CARD_DB_VERSION:
+            previous = db['sources']
+
+    built, rebuilt, reused = {}, [], []
+    for path in sources:
+        name = os.path.basename(path)
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        if name in previous and previous[name]['sha256'] == digest:
+            built[name] = previous[name]
+            reused.append(name)
+        else:
+            built[name] = {'sha256': digest, 'cards': read_set_export(path, content)}
+            rebuilt.append(name)
+
+    check_trainer_names([card for source in built.values() for card in source['cards']])
+    seen = {}
+    for name, source in built.items():
+        for card in source['cards']:
+            key = (card['card_name'], card['set_code'], card['card_number'])
+            if key in seen:
+                raise ValueError(f"Card {key} is in both {seen[key]} and {name}.")
+            seen[key] = name
+
+    if rebuilt or set(previous) != set(built):
+        write_json_atomic(out_path, {'version': CARD_DB_VERSION, 'built': time.time(), 'sources': built})
+    return {'rebuilt': rebuilt, 'reused': reused, 'cards': len(seen)}
+
+
+def read_card_db(path):
+    """All card records of a database written by build_card_db()."""
+    with open(path, encoding='utf-8') as f:
+        db = json.load(f)
+    if db.get('version') != CARD_DB_VERSION:
+        raise ValueError(f"Card database {path} has unsupported version {db.get('version')}; rebuild it.")
+    return [card for source in db['sources'].values() for card in source['cards']]
+
+
+# =============================================================================
+# Columnar Card Store
+# =============================================================================
+
+# Fields of a card entry, in order
+CARD_FIELDS = ('card_type', 'category', 'pokemon_stage', 'ex', 'card_name', 'evolve_from', 'rarity', 'set_code',
+               'card_number', 'effects')
+
+# Fields with few distinct values, stored as small integer codes into a per-field value table
+CODED_FIELDS = ('card_type', 'category', 'pokemon_stage', 'rarity', 'set_code', 'evolve_from')
+
+
+class CardRow(Mapping):
+    """Read-only dict-like view of one card of a CardStore."""
+
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, field):
+        return self._store.field(self._row, field)
+
+    def __iter__(self):
+        return iter(CARD_FIELDS)
+
+    def __len__(self):
+        return len(CARD_FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class CardStore(Mapping):
+    """
+    Card data in columns instead of one dict per card: categorical fields are stored as two-byte
+    codes (array('H')) into per-field value tables, names and numbers are interned strings, and the
+    effects are looked up from the name. Reads like the old {(name, set_code, number): dict} table;
+    lookups return CardRow views.
+
+    extend() adds or replaces cards (by key) in place, so the store can be (re)loaded while other
+    modules hold a reference to it. save_image() writes the store as a memory-mappable card image
+    and attach() switches a store over to one (read-only, see below).
+    """
+
+    def __init__(self, records=()):
+        self._index = {}          # (card_name, set_code, card_number) -> row
+        self._first_row = {}      # card_name -> first row with that name
+        self._ancestors = {}      # card_name -> ultimate basic ancestor (memo of ancestor())
+        self._names = []
+        self._numbers = []
+        self._ex = bytearray()
+        self._columns = {field: array('H') for field in CODED_FIELDS}
+        self._values = {field: [] for field in CODED_FIELDS}
+        self._codes = {field: {} for field in CODED_FIELDS}
+        self.image_path = None
+        self.version = 0          # bumped on every change, for caches built from the store
+        self.extend(records)
+
+    def _code(self, field, value):
+        codes = self._codes[field]
+        if value not in codes:
+            codes[value] = len(self._values[field])
+            self._values[field].append(sys.intern(value))
+        return codes[value]
+
+    def extend(self, records):
+        if self.image_path is not None:
+            raise ValueError(f"Card store is attached to the read-only image {self.image_path}.")
+        self._ancestors.clear()
+        self.version += 1
+        for record in records:
+            # Keys hold the interned strings too, not the record's copies
+            name, number = sys.intern(record['card_name']), sys.intern(record['card_number'])
+            key = (name, sys.intern(record['set_code']), number)
+            row = self._index.get(key)
+            if row is None:
+                row = len(self._names)
+                self._index[key] = row
+                self._first_row.setdefault(name, row)
+                self._names.append(name)
+                self._numbers.append(number)
+                self._ex.append(bool(record['ex']))
+                for field in CODED_FIELDS:
+                    self._columns[field].append(self._code(field, record[field]))
+            else:
+                self._ex[row] = bool(record['ex'])
+                for field in CODED_FIELDS:
+                    self._columns[field][row] = self._code(field, record[field])
+
+    def field(self, row, field):
+        if field in self._columns:
+            return self._values[field][self._columns[field][row]]
+        if field == 'card_name':
+            return self._names[row]
+        if field == 'card_number':
+            return self._numbers[row]
+        if field == 'ex':
+            return bool(self._ex[row])
+        if field == 'effects':
+            return card_effects(self._names[row])
+        raise KeyError(field)
+
+    def first_with_name(self, card_name):
+        """The first-loaded card named `card_name`, or None."""
+        row = self._first_row.get(card_name)
+        return None if row is None else CardRow(self, row)
+
+    def ancestor(self, card_name):
+        """
+        The ultimate basic ancestor of `card_name`: follows evolve_from through the first-loaded card
+        of each name until a card without one (or a name that is not in the store, or a cycle).
+        """
+        if card_name not in self._ancestors:
+            current = card_name
+            visited = set()
+            while current and current not in visited:
+                visited.add(current)
+                card = self.first_with_name(current)
+                if card is None:
+                    break
+                evolve_from = card['evolve_from'].strip()
+                if not evolve_from or evolve_from == 'nan':
+                    break
+                current = evolve_from.lower()
+            self._ancestors[card_name] = current
+        return self._ancestors[card_name]
+
+    def column(self, field):
+        """The values of one field for every row, in row order."""
+        return [self.field(row, field) for row in range(len(self._names))]
+
+    def clear(self):
+        version = self.version
+        self.__init__()
+        self.version = version + 1
+
+    def __getitem__(self, key):
+        return CardRow(self, self._index[key])
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        source = f", image {self.image_path}" if self.image_path else ""
+        return f"CardStore({len(self)} cards{source})"
+
+    # ----- memory-mapped images -----
+
+    def save_image(self, path=None):
+        """
+        Writes the store as a card image: one flat file of fixed-width rows (every string field as a
+        code into a string table), the key index sorted for binary search, the first row of every
+        name, plus a JSON sidecar with the string tables and each name's ancestor. Without `path`,
+        the image goes to the temp directory under a name derived from its content, so processes
+        that share the same card data share one file. Returns the path.
+        """
+        values = {field: list(self._values[field]) for field in CODED_FIELDS}
+        rows = np.zeros(len(self._names), dtype=IMAGE_ROW_DTYPE)
+        for field in CODED_FIELDS:
+            rows[field] = self._columns[field]
+        name_codes = {}
+        for field, strings in (('card_name', self._names), ('card_number', self._numbers)):
+            codes = name_codes if field == 'card_name' else {}
+            rows[field] = [codes.setdefault(value, len(codes)) for value in strings]
+            values[field] = list(codes)
+        rows['ex'] = np.frombuffer(bytes(self._ex), dtype=np.uint8)
+
+        packed = _pack_keys(rows['card_name'], rows['set_code'], rows['card_number'])
+        order = np.argsort(packed, kind='stable')
+        first_row = np.full(len(name_codes), -1, dtype='<i4')
+        for name, row in self._first_row.items():
+            first_row[name_codes[name]] = row
+        arrays = [rows, packed[order], order.astype('<u4'), first_row]
+        meta = {
+            'version': IMAGE_VERSION,
+            'cards': len(rows),
+            'names': len(name_codes),
+            'values': values,
+            'ancestors': [self.ancestor(name) for name in values['card_name']],
+        }
+        blob = b''.join(a.tobytes() for a in arrays)
+        if path is None:
+            digest = hashlib.sha256(blob + json.dumps(meta, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+            path = os.path.join(tempfile.gettempdir(), f"tcg_cards_{digest}{IMAGE_SUFFIX}")
+            if os.path.exists(path) and os.path.exists(_image_meta_path(path)):
+                return path
+        write_json_atomic(_image_meta_path(path), meta)
+        write_bytes_atomic(path, blob)
+        return path
+
+    def attach(self, path):
+        """
+        Switches this store to the card image at `path`. Rows and indexes are NumPy views of one
+        read-only memory map, so every process attached to the same image shares its pages and
+        attaching costs no parsing. An attached store cannot be extended.
+        """
+        with open(_image_meta_path(path), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != IMAGE_VERSION:
+            raise ValueError(f"Card image {path} has unsupported version {meta.get('version')}.")
+        cards, names = meta['cards'], meta['names']
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        offset = 0
+        arrays = []
+        for dtype, count in ((IMAGE_ROW_DTYPE, cards), (np.dtype('<u8'), cards), (np.dtype('<u4'), cards),
+                             (np.dtype('<i4'), names)):
+            arrays.append(np.ndarray((count,), dtype=dtype, buffer=data, offset=offset))
+            offset += dtype.itemsize * count
+        rows, keys, key_rows, first_row = arrays
+
+        self.clear()
+        values = {field: [sys.intern(v) for v in strings] for field, strings in meta['values'].items()}
+        self._values = {field: values[field] for field in CODED_FIELDS}
+        self._codes = {field: {v: i for i, v in enumerate(values[field])}
+                       for field in CODED_FIELDS + ('card_name', 'card_number')}
+        self._columns = {field: rows[field] for field in CODED_FIELDS}
+        self._ex = rows['ex']
+        self._names = _CodedColumn(values['card_name'], rows['card_name'])
+        self._numbers = _CodedColumn(values['card_number'], rows['card_number'])
+        self._index = _ImageIndex(self._codes, keys, key_rows, rows, self._names, self._numbers, values['set_code'])
+        self._first_row = _FirstRows(self._codes['card_name'], first_row)
+        self._ancestors = dict(zip(values['card_name'], meta['ancestors']))
+        self.image_path = path
+
+
+IMAGE_VERSION = 1
+IMAGE_SUFFIX = '.cards'
+IMAGE_ROW_DTYPE = np.dtype([(field, '<u2') for field in CODED_FIELDS + ('card_name', 'card_number')] + [('ex', 'u1')])
+
+
+def _image_meta_path(path):
+    return f"{path}.json"
+
+
+def _pack_keys(name_codes, set_codes, number_codes):
+    return (name_codes.astype('<u8') << 32) | (set_codes.astype('<u8') << 16) | number_codes.astype('<u8')
+
+
+class _CodedColumn:
+    """A column of string codes that indexes like the list of strings it encodes."""
+
+    __slots__ = ('values', 'codes')
+
+    def __init__(self, values, codes):
+        self.values = values
+        self.codes = codes
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class _ImageIndex:
+    """The key -> row index of an attached image: a binary search over the sorted packed keys."""
+
+    def __init__(self, codes, keys, key_rows, rows, names, numbers, set_values):
+        self._codes = codes
+        self._keys = keys
+        self._key_rows = key_rows
+        self._rows = rows
+        self._names = names
+        self._numbers = numbers
+        self._set_values = set_values
+
+    def get(self, key, default=None):
+        name, set_code, number = key
+        try:
+            packed = (self._codes['card_name'][name] << 32) | (self._codes['set_code'][set_code] << 16) | \
+                     self._codes['card_number'][number]
+        except KeyError:
+            return default
+        i = int(np.searchsorted(self._keys, packed))
+        if i < len(self._keys) and int(self._keys[i]) == packed:
+            return int(self._key_rows[i])
+        return default
+
+    def __getitem__(self, key):
+        row = self.get(key)
+        if row is None:
+            raise KeyError(key)
+        return row
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        set_codes = self._rows['set_code']
+        for row in range(len(self._rows)):
+            yield self._names[row], self._set_values[set_codes[row]], self._numbers[row]
+
+    def __len__(self):
+        return len(self._rows)
+
+
+class _FirstRows:
+    """card_name -> first row with that name, read from an attached image's per-name array."""
+
+    def __init__(self, name_codes, first_row):
+        self._name_codes = name_codes
+        self._first_row = first_row
+
+    def get(self, card_name, default=None):
+        code = self._name_codes.get(card_name)
+        if code is None or self._first_row[code] < 0:
+            return default
+        return int(self._first_row[code])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the card database from per-set CSV exports.")
+    parser.add_argument('sources', nargs='*', help="CSV exports (default: data/*.csv, else ALL_SETS.csv)")
+    parser.add_argument('--out', default="cards.json")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = build_card_db(args.sources or None, args.out)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{args.out}: {summary['cards']} cards; rebuilt {len(summary['rebuilt'])} source(s), "
+          f"reused {len(summary['reused'])} ({elapsed:.0f} ms)")
+    for name in summary['rebuilt']:
+        print(f"   - rebuilt {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+from collections import namedtuple
+
+# =============================================================================
+# Brick Criteria
+# =============================================================================
+
+# Board at the end of one turn. active/bench/hand are tuples of card dicts.
+BoardSnapshot = namedtuple('BoardSnapshot', ['turn', 'active', 'bench', 'hand'])
+
+
+def required_attackers_in_play(total_main_attackers_in_deck):
+    """How many main attackers must be developed for a game not to count as a brick."""
+    return 3 if total_main_attackers_in_deck > 3 else max(2, total_main_attackers_in_deck)
+
+
+class DeckContext:
+    """Per-deck facts the criteria need, computed once per deck instead of once per check."""
+
+    def __init__(self, full_deck, precomputed_attackers):
+        self.main_attackers = set(precomputed_attackers)
+        self.total_main_attackers = len(set(c['name'] for c in full_deck if c['name'] in self.main_attackers))
+
+    def attackers_in_play(self, snapshot):
+        return sum(1 for p in snapshot.active + snapshot.bench if p['name'] in self.main_attackers)
+
+
+def _snapshots_by(snapshots, turn):
+    return [s for s in snapshots if turn is None or s.turn <= turn]
+
+
+class BrickCriterion:
+    """A definition of a bricked game. Subclasses implement is_brick(snapshots, context)."""
+
+    name = 'criterion'
+
+    def is_brick(self, snapshots, context):
+        raise NotImplementedError
+
+
+class AttackersDeveloped(BrickCriterion):
+    """Brick if fewer than `n` main attackers are in play at the end of turn `by_turn` (default: last turn).
+    With n=None the deck-dependent default threshold is used."""
+
+    def __init__(self, n=None, by_turn=None, name=None):
+        self.n = n
+        self.by_turn = by_turn
+        self.name = name or f"attackers_{n or 'default'}" + (f"_by_turn_{by_turn}" if by_turn else '')
+
+    def is_brick(self, snapshots, context):
+        reached = _snapshots_by(snapshots, self.by_turn)
+        if not reached:
+            return True
+        required = self.n if self.n is not None else required_attackers_in_play(context.total_main_attackers)
+        return context.attackers_in_play(reached[-1]) < required
+
+
+class Stage2OnlineBy(BrickCriterion):
+    """Brick if no Stage 2 Pokémon is in play at the end of any turn up to `turn`."""
+
+    def __init__(self, turn, name=None):
+        self.turn = turn
+        self.name = name or f"stage2_by_turn_{turn}"
+
+    def is_brick(self, snapshots, context):
+        return not any(p.get('stage') == 'stage2'
+                       for s in _snapshots_by(snapshots, self.turn) for p in s.active + s.bench)
+
+
+class BeastActiveBy(BrickCriterion):
+    """Brick if no legendary beast ex is the active Pokémon at the end of any turn up to `turn`."""
+
+    beasts = ('raikou ex', 'entei ex', 'suicune ex')
+
+    def __init__(self, turn=2, name=None):
+        self.turn = turn
+        self.name = name or f"beast_active_by_turn_{turn}"
+
+    def is_brick(self, snapshots, context):
+        return not any(beast in p['name']
+                       for s in _snapshots_by(snapshots, self.turn) for p in s.active for beast in self.beasts)
+
+
+class PredicateCriterion(BrickCriterion):
+    """User-defined criterion: `predicate(snapshots, context)` returns True for a brick."""
+
+    def __init__(self, name, predicate):
+        self.name = name
+        self.predicate = predicate
+
+    def is_brick(self, snapshots, context):
+        return bool(self.predicate(snapshots, context))
+
+
+# The definition used for the headline brick rate
+DEFAULT_BRICK_CRITERION = AttackersDeveloped(name='default')
+
+# Registry of named criteria that can be requested by name
+BRICK_CRITERIA = {}
+
+
+def register_criterion(criterion):
+    """Adds a criterion to the registry under its name and returns it."""
+    BRICK_CRITERIA[criterion.name] = criterion
+    return criterion
+
+
+def resolve_criteria(criteria):
+    """Turns a list of criterion objects and/or registered names into criterion objects."""
+    resolved = []
+    for criterion in criteria or ():
+        if isinstance(criterion, str):
+            if criterion not in BRICK_CRITERIA:
+                raise ValueError(f"Unknown brick criterion '{criterion}'. Registered: {', '.join(BRICK_CRITERIA)}")
+            criterion = BRICK_CRITERIA[criterion]
+        resolved.append(criterion)
+    return resolved
+
+
+for _criterion in (DEFAULT_BRICK_CRITERION, AttackersDeveloped(2), AttackersDeveloped(3),
+                   Stage2OnlineBy(3), Stage2OnlineBy(4), BeastActiveBy(2)):
+    register_criterion(_criterion)
@@ -0,0 +1,58 @@
+# =============================================================================
+# Card Effects
+# =============================================================================
+
+# Card name -> ((trigger, effect), ...). Effects are looked up by name in the handler table the
+# simulator passes to DeckEffects, so this table stays plain data.
+#
+# Triggers:
+#   'supporter'    - played as a supporter instead of the generic "any other supporter" rule
+#   'evolve_first' - evolved before regular evolutions; the handler performs the whole evolution
+#   'on_evolve'    - runs right after the card evolves onto the board
+#   'turn_start'   - runs after the turn's normal draw while the card is in play
+#   'action'       - extra board action tried at the end of every action-loop pass
+#   'end_turn'     - runs at the end of every turn; returns cards held until next turn
+CARD_EFFECTS = {
+    'iono': (('supporter', 'iono'),),
+    'sylveon ex': (('evolve_first', 'sylveon_ex_evolve'),),
+    'shiinotic': (('on_evolve', 'shiinotic_search'), ('turn_start', 'shiinotic_ongoing')),
+    'raikou ex': (('action', 'beast_switch'), ('end_turn', 'beast_draw')),
+    'entei ex': (('action', 'beast_switch'), ('end_turn', 'beast_draw')),
+    'suicune ex': (('action', 'beast_switch'), ('end_turn', 'beast_draw')),
+}
+
+
+def card_effects(card_name):
+    """The (trigger, effect) pairs of a card, or an empty tuple for cards without special rules."""
+    return CARD_EFFECTS.get(card_name, ())
+
+
+class DeckEffects:
+    """
+    The effect handlers one deck actually uses, bound once per deck. Each trigger holds only the
+    handlers of cards in the deck, so decks without e.g. Shiinotic or beasts skip those checks entirely.
+    Shared effects (the three beasts) are bound once.
+    """
+
+    def __init__(self, cards, handlers):
+        self.supporters = {}      # card name -> handler(card, hand, deck, rng, trace) -> log message
+        self.evolve_first = {}    # card name -> handler(card, hand, active, bench, deck, evolved_this_turn, msgs, trace)
+        self.on_evolve = {}       # card name -> handler(evo_card, target, hand, deck, msgs, rng, trace)
+        self.turn_start = []      # handler(deck, hand, active, bench, rng, trace) -> log messages
+        self.actions = []         # handler(hand, active, bench, turn, trace) -> (taken, log message)
+        self.end_turn = []        # handler(deck, active) -> cards drawn for next turn
+        per_card = {'supporter': self.supporters, 'evolve_first': self.evolve_first, 'on_evolve': self.on_evolve}
+        shared = {'turn_start': self.turn_start, 'action': self.actions, 'end_turn': self.end_turn}
+        self.cards = set()
+        bound = set()
+        for card in cards:
+            for trigger, effect in card.get('effects', card_effects(card['name'])):
+                self.cards.add(card['name'])
+                if trigger in per_card:
+                    per_card[trigger][card['name']] = handlers[effect]
+                elif effect not in bound:
+                    shared[trigger].append(handlers[effect])
+                    bound.add(effect)
+
+    def __repr__(self):
+        return f"DeckEffects({sorted(self.cards)}, turn_start={len(self.turn_start)}, actions={len(self.actions)}, end_turn={len(self.end_turn)})"
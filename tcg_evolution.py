@@ -0,0 +1,100 @@
+# =============================================================================
+# Evolution Graph
+# =============================================================================
+
+# Cards that evolve from the key may also evolve from these (Eevee ex can evolve into anything that
+# evolves from Eevee)
+EVOLUTION_ALIASES = {
+    'eevee': ('eevee ex',),
+}
+
+
+def evolution_sources(evolve_from):
+    """Names a card that evolves from `evolve_from` can be played onto."""
+    return (evolve_from,) + EVOLUTION_ALIASES.get(evolve_from, ())
+
+
+class EvolutionGraph:
+    """
+    Evolution DAG of the whole card pool, by card name, built once from a CardStore.
+
+    - parents[name] / children[name]: the names it evolves from / into, over every printing of the
+      name, plus the EVOLUTION_ALIASES edges (so 'espeon ex' has parents {'eevee', 'eevee ex'})
+    - basic_ancestor(name): the ultimate basic of the name's evolves-from chain, as the simulator
+      resolves it (CardStore.ancestor); basic_ancestors(name): every basic reachable over all parents
+    - depth(name): number of evolutions above its basic (0 for a basic)
+
+    Names that are not in the pool are their own basic ancestor with depth 0.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.version = store.version
+        self.parents = {}
+        self.children = {}
+        for name, evolve_from in zip(store.column('card_name'), store.column('evolve_from')):
+            self.parents.setdefault(name, set())
+            self.children.setdefault(name, set())
+            if not evolve_from:
+                continue
+            for parent in evolution_sources(evolve_from):
+                self.parents[name].add(parent)
+                self.children.setdefault(parent, set()).add(name)
+                self.parents.setdefault(parent, set())
+        self._depth = {}
+        self._basics = {}
+
+    def basic_ancestor(self, name):
+        return self.store.ancestor(name)
+
+    def card_basic(self, card):
+        """The basic a deck card's evolution line starts from (itself for a basic)."""
+        evolve_from = card.get('evolve_from', '')
+        return self.store.ancestor(evolve_from.lower().strip()) if evolve_from else card['name']
+
+    def basic_ancestors(self, name):
+        if name not in self._basics:
+            parents = self.parents.get(name)
+            if not parents:
+                self._basics[name] = frozenset((name,))
+            else:
+                self._basics[name] = frozenset()  # cycle guard while this name is being resolved
+                self._basics[name] = frozenset().union(*(self.basic_ancestors(p) for p in parents))
+        return self._basics[name]
+
+    def depth(self, name):
+        if name not in self._depth:
+            self._depth[name] = 0  # cycle guard
+            chain_parent = self.store.first_with_name(name)
+            evolve_from = chain_parent['evolve_from'] if chain_parent is not None else ''
+            self._depth[name] = self.depth(evolve_from) + 1 if evolve_from else 0
+        return self._depth[name]
+
+    def can_evolve_from(self, name, target_name):
+        return target_name in self.parents.get(name, ())
+
+    def ancestors(self, name):
+        """Every name `name` evolves from, directly or not, over all parents."""
+        found = set()
+        stack = [name]
+        while stack:
+            for parent in self.parents.get(stack.pop(), ()):
+                if parent not in found:
+                    found.add(parent)
+                    stack.append(parent)
+        return found
+
+    def descendants(self, name):
+        """Every name that evolves, directly or not, from `name`."""
+        found = set()
+        stack = [name]
+        while stack:
+            for child in self.children.get(stack.pop(), ()):
+                if child not in found:
+                    found.add(child)
+                    stack.append(child)
+        return found
+
+    def __repr__(self):
+        edges = sum(len(p) for p in self.parents.values())
+        return f"EvolutionGraph({len(self.parents)} names, {edges} edges)"
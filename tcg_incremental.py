@@ -0,0 +1,255 @@
+import random
+from collections import Counter
+import numpy as np
+from tcg_utils import *
+from tcg_archive import BRICK, NO_ATTACKER, KEY_STUCK
+from tcg_trace import NO_ZONE
+
+# =============================================================================
+# Trial Records
+# =============================================================================
+
+# More bits of the 'flags' field (after tcg_archive's BRICK | NO_ATTACKER | KEY_STUCK): the game looked
+# through the deck for a basic (opener fix-up, Poké Ball) / for a Pokémon (Shiinotic)
+BASIC_SCAN, POKEMON_SCAN = 8, 16
+
+# Trace events of the searches
+_SCAN_FLAGS = {POKEBALL: BASIC_SCAN, SEARCH: POKEMON_SCAN, SEARCH_HAND_FULL: POKEMON_SCAN,
+               SEARCH_NO_DRAW: POKEMON_SCAN, ONGOING_DRAW: POKEMON_SCAN, ONGOING_NO_DRAW: POKEMON_SCAN}
+
+
+def trial_dtype(max_turns):
+    """
+    One record per trial of an analysis:
+    - trial: the trial index (its seed is trial_seed(run seed, trial))
+    - flags: BRICK | NO_ATTACKER | KEY_STUCK | BASIC_SCAN | POKEMON_SCAN
+    - touched: bitmask of the deck slots (indices into the decklist) that left the deck during the game
+    - attackers: main attackers in play at the end of turns 1..max_turns
+    """
+    return np.dtype([
+        ('trial', '<u4'),
+        ('flags', 'u1'),
+        ('touched', '<u4'),
+        ('attackers', 'u1', (max_turns,)),
+    ])
+
+
+def _is_searchable_pokemon(card):
+    # What Shiinotic's search takes from the deck
+    return card.get('type', '') == 'pokemon' and card.get('stage', '') in ['basic', 'stage1', 'stage2']
+
+
+def _key_names(full_deck):
+    # The deck's key cards: brick_key_stuck if one of them was never seen (see simulate_one_trial_with_logging)
+    return {c['name'] for c in full_deck
+            if c['name'] == 'professor\'s research' or (is_basic(c) and is_important(c))}
+
+
+def _shared_effects(effects):
+    # Deck-wide effect handlers; they run whatever is in play, so a swap that binds other ones changes every game
+    return effects.turn_start, effects.actions, effects.end_turn
+
+
+class TouchTracker:
+    """
+    Stands in for a GameTrace when only the trial record is wanted: instead of keeping the events it
+    ORs the deck slots that leave the deck into `touched` and the searches into `flags`, which costs a
+    fraction of a full trace. Rolled-back attempts moved no cards; flags they set are kept, which can
+    only make an edit re-simulate more trials than needed.
+    """
+
+    def __init__(self, full_deck):
+        self.bits = {id(card): 1 << i for i, card in enumerate(full_deck)}
+        self.touched = 0
+        self.flags = 0
+        self.turn = 0
+
+    def reset(self):
+        self.touched = 0
+        self.flags = 0
+        self.turn = 0
+
+    def record(self, action, card=None, src=NO_ZONE, dst=NO_ZONE):
+        if src == DECK and dst != DECK:
+            self.touched |= self.bits[id(card)]
+        if action in _SCAN_FLAGS:
+            self.flags |= _SCAN_FLAGS[action]
+
+    def record_all(self, action, cards, src, dst):
+        for card in cards:
+            self.record(action, card, src, dst)
+
+    def rollback(self, length):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+def _simulate_records(full_deck, precomputed_attackers, max_turns, seed, trial_indices, records, rows, effects):
+    """Plays the given trials and writes their records into records[rows]."""
+    tracker = TouchTracker(full_deck)
+    played = []
+    for i in trial_indices:
+        rng = random.Random(trial_seed(seed, i))
+        # The shuffle simulate_one_trial_with_logging would deal, to see whether the opener gets a basic swapped in
+        deck_order = full_deck[:]
+        rng.shuffle(deck_order)
+        attackers_by_turn = []
+        is_brick, brick_attacker, brick_key, _ = simulate_one_trial_with_logging(
+            full_deck, precomputed_attackers, max_turns=max_turns, attackers_by_turn=attackers_by_turn, rng=rng,
+            effects=effects, trace=tracker, deck_order=deck_order
+        )
+        flags = tracker.flags | (BRICK if is_brick else 0) | (NO_ATTACKER if brick_attacker else 0) | \
+                (KEY_STUCK if brick_key else 0)
+        if not any(is_basic(c) for c in deck_order[:5]):
+            flags |= BASIC_SCAN
+        played.append((i, flags, tracker.touched, attackers_by_turn))
+    if played:
+        records[rows] = np.array(played, dtype=records.dtype)
+
+
+def _card_key(card):
+    # Which card it is; the dicts also carry game state (e.g. 'just_placed'), so they don't compare equal
+    return card['name'], card['set_code'], card['card_number']
+
+
+def one_card_swap(old_deck, new_deck):
+    """
+    If `new_deck` is `old_deck` with one card replaced, returns (slot, card): the index in `old_deck` of
+    the copy that goes and the card that takes its place. Returns None for any other change.
+    """
+    key = _card_key
+    if len(old_deck) != len(new_deck):
+        return None
+    removed = Counter(map(key, old_deck)) - Counter(map(key, new_deck))
+    added = Counter(map(key, new_deck)) - Counter(map(key, old_deck))
+    if sum(removed.values()) != 1 or sum(added.values()) != 1:
+        return None
+    gone, = removed
+    new_card, = added
+    slot = max(i for i, card in enumerate(old_deck) if key(card) == gone)
+    return slot, dict(next(card for card in new_deck if key(card) == new_card))
+
+
+class TrialRecords:
+    """
+    Per-trial records of one analysis (a seeded run of a deck), compact enough to keep for the last
+    analysis of a session, so that a what-if edit of the deck only re-simulates the trials it can change.
+
+        records = TrialRecords.simulate(parsed_deck, main_attackers, trials=5000, max_turns=5)
+        edited, resimulated = records.edit(edited_deck, edited_attackers)
+        edited.result()       # SimulationResult of the edited deck, over the same 5000 trials
+
+    `full_deck` is the deck the trials were played with; after an edit it is the old decklist with the
+    swapped card in the old card's slot, so every other card keeps its position in every game.
+    """
+
+    def __init__(self, full_deck, precomputed_attackers, max_turns, seed, records):
+        self.full_deck = full_deck
+        self.precomputed_attackers = list(precomputed_attackers)
+        self.max_turns = max_turns
+        self.seed = seed
+        self.records = records
+
+    @classmethod
+    def simulate(cls, full_deck, precomputed_attackers, trials=1000, max_turns=7, seed=None, first_trial=0):
+        """Simulates trials first_trial.. of a seeded run and records them."""
+        if len(full_deck) > 32:
+            raise ValueError("Trial records support decks of at most 32 cards.")
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        records = np.zeros(trials, dtype=trial_dtype(max_turns))
+        _simulate_records(full_deck, precomputed_attackers, max_turns, seed, range(first_trial, first_trial + trials),
+                          records, slice(None), compile_deck_effects(full_deck))
+        return cls(full_deck, precomputed_attackers, max_turns, seed, records)
+
+    @classmethod
+    def concat(cls, parts):
+        """Joins records of chunks of the same run (in any order) into one, ordered by trial index."""
+        first = parts[0]
+        records = np.concatenate([part.records for part in parts])
+        records = records[np.argsort(records['trial'], kind='stable')]
+        return cls(first.full_deck, first.precomputed_attackers, first.max_turns, first.seed, records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def chunk(self, start, stop):
+        """Records of rows start..stop-1 (a block of trials for one worker)."""
+        return TrialRecords(self.full_deck, self.precomputed_attackers, self.max_turns, self.seed,
+                            self.records[start:stop])
+
+    def result(self, max_examples=5):
+        """The analysis as a SimulationResult; the examples are trial seeds, as from the seeded runner."""
+        result = SimulationResult(self.max_turns, max_examples=max_examples, seed=self.seed)
+        for trial, flags, attackers in zip(self.records['trial'].tolist(), self.records['flags'].tolist(),
+                                           self.records['attackers'].tolist()):
+            result.add_trial(flags & BRICK, flags & NO_ATTACKER, flags & KEY_STUCK,
+                             example=trial_seed(self.seed, trial), attackers_by_turn=attackers)
+        return result
+
+    def affected(self, new_deck, new_attackers):
+        """
+        For a one-card swap that cannot change the untouched games, returns (deck, mask): the deck to play
+        (the swap applied in place) and which trials to re-simulate. Returns None if every trial may change.
+
+        A trial is unaffected if the swapped slot never left the deck and, when the new card is a basic
+        (or a Pokémon) and the old one is not, no search of the game looked for one: shuffles permute
+        positions whatever the cards, so such a game plays out move for move the same.
+        Changes to the main attackers, to the key cards of brick_key_stuck or to the deck-wide effects
+        affect every trial.
+        """
+        swap = one_card_swap(self.full_deck, new_deck)
+        if swap is None:
+            return None
+        slot, new_card = swap
+        old_card = self.full_deck[slot]
+        deck = self.full_deck[:]
+        deck[slot] = new_card
+        old_context = DeckContext(self.full_deck, self.precomputed_attackers)
+        new_context = DeckContext(deck, new_attackers)
+        if (old_context.main_attackers != new_context.main_attackers
+                or old_context.total_main_attackers != new_context.total_main_attackers
+                or _key_names(self.full_deck) != _key_names(deck)
+                or _shared_effects(compile_deck_effects(self.full_deck)) != _shared_effects(compile_deck_effects(deck))):
+            return None
+        scans = np.zeros(len(self.records), dtype=bool)
+        # A search takes the first card of its kind, so a new card of the kind may be found first; an old
+        # card of the kind was either taken (so it left the deck) or lay past the one taken
+        if is_basic(new_card) and not is_basic(old_card):
+            scans |= (self.records['flags'] & BASIC_SCAN) != 0
+        if _is_searchable_pokemon(new_card) and not _is_searchable_pokemon(old_card):
+            scans |= (self.records['flags'] & POKEMON_SCAN) != 0
+        changed = [i for i, (old, new) in enumerate(zip(self.full_deck, new_deck)) if _card_key(old) != _card_key(new)]
+        if len(changed) == 1:
+            # Already in the played order (e.g. the deck of a previous edit)
+            copies = changed
+        else:
+            # Copies of the old card are interchangeable: swap out the one that left the deck in the fewest games
+            copies = [i for i, card in enumerate(self.full_deck) if _card_key(card) == _card_key(old_card)]
+        best = None
+        for copy in copies:
+            mask = scans | ((self.records['touched'] & np.uint32(1 << copy)) != 0)
+            if best is None or mask.sum() < best[1].sum():
+                best = copy, mask
+        copy, mask = best
+        deck = self.full_deck[:]
+        deck[copy] = new_card
+        return deck, mask
+
+    def edit(self, new_deck, new_attackers):
+        """
+        Records of the same trials played with `new_deck`, re-simulating only the affected trials (all of
+        them if the change is not a one-card swap). Returns (TrialRecords, number of trials re-simulated).
+        """
+        affected = self.affected(new_deck, new_attackers)
+        if affected is None:
+            deck, mask = new_deck, np.ones(len(self.records), dtype=bool)
+        else:
+            deck, mask = affected
+        records = self.records.copy()
+        rows = np.flatnonzero(mask)
+        _simulate_records(deck, new_attackers, self.max_turns, self.seed, records['trial'][rows].tolist(), records,
+                          rows, compile_deck_effects(deck))
+        return TrialRecords(deck, new_attackers, self.max_turns, self.seed, records), len(rows)
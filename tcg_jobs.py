@@ -0,0 +1,375 @@
+import asyncio
+import itertools
+import os
+import random
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from tcg_utils import *
+from tcg_incremental import TrialRecords
+
+# =============================================================================
+# Simulation Job Service
+# =============================================================================
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+# resimulated: for an edit job (JobService.submit_edit), how many of its trials had to be played again
+JobStatus = namedtuple('JobStatus', ['job_id', 'state', 'trials_done', 'trials_total', 'result', 'error',
+                                     'resimulated'], defaults=(None,))
+
+
+def _simulate_chunk(full_deck, main_attackers, max_turns, seed, first_trial, trials, max_examples):
+    """
+    Worker: simulates one contiguous block of trial indices of a job's run. It keeps the seeds of up to
+    `max_examples` bricked trials but renders no logs; the job replays its final sample once.
+    """
+    result = SimulationResult(max_turns, max_examples=max_examples, seed=seed)
+    return simulate_brick_rate_with_examples(
+        full_deck, main_attackers, trials=trials, show_examples=0, maxturns=max_turns, result=result,
+        seed=seed, first_trial=first_trial
+    )
+
+
+def _record_chunk(full_deck, main_attackers, max_turns, seed, first_trial, trials, max_examples):
+    """Worker: like _simulate_chunk, also returning the block's per-trial records."""
+    records = TrialRecords.simulate(full_deck, main_attackers, trials, max_turns, seed, first_trial)
+    return records.result(max_examples), records, 0
+
+
+def _edit_chunk(records, full_deck, main_attackers, max_examples):
+    """Worker: one block of a kept run, played with an edited deck (only the trials the edit can change)."""
+    edited, resimulated = records.edit(full_deck, main_attackers)
+    return edited.result(max_examples), edited, resimulated
+
+
+class SimulationJob:
+    """
+    State of one submitted analysis. The service's event loop is the only writer; readers get
+    consistent snapshots through status().
+    """
+
+    def __init__(self, job_id, fingerprint, full_deck, main_attackers, trials, show_examples, max_turns,
+                 keep_trials=False):
+        self.job_id = job_id
+        self.fingerprint = fingerprint
+        self.full_deck = full_deck
+        self.main_attackers = main_attackers
+        self.trials = trials
+        self.show_examples = show_examples
+        self.max_turns = max_turns
+        self.state = QUEUED
+        self.result = None       # latest (partial) SimulationResult; replaced, never mutated
+        self.error = None
+        self.keep_trials = keep_trials
+        self.trial_records = None  # TrialRecords of every trial of the result, once done (keep_trials jobs)
+        self.records_ready = threading.Event()  # set once trial_records is final
+        self.resimulated = None
+        self._parts = []
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def attach(self, trials, show_examples):
+        """Another request for the same analysis: simulate at least `trials` and render `show_examples` logs."""
+        with self._lock:
+            self.trials = max(self.trials, trials)
+            self.show_examples = max(self.show_examples, show_examples)
+
+    def publish(self, result, state=RUNNING):
+        with self._lock:
+            self.result = result
+            self.state = state
+
+    def keep(self, records, resimulated):
+        """Per-trial records of one finished chunk (keep_trials jobs)."""
+        with self._lock:
+            self._parts.append(records)
+            if self.resimulated is not None:
+                self.resimulated += resimulated
+
+    def keep_records(self, trials):
+        """Joins the chunks' records; they are kept only if they cover all `trials` of the result."""
+        if self._parts and sum(len(part) for part in self._parts) == trials:
+            self.trial_records = TrialRecords.concat(self._parts)
+        self._parts = []
+
+    def fail(self, error):
+        with self._lock:
+            self.error = error
+            self.state = FAILED
+
+    def status(self):
+        with self._lock:
+            trials_done = self.result.trials if self.result is not None else 0
+            return JobStatus(self.job_id, self.state, trials_done, self.trials, self.result, self.error,
+                             self.resimulated)
+
+
+class JobService:
+    """
+    Runs deck analyses in the background so a front end never blocks on a simulation.
+
+    An asyncio event loop on a daemon thread schedules each job's trials in chunks on a process pool
+    and publishes the merged partial result after every chunk; submit() returns a job id at once and
+    poll() reports progress.
+
+    Jobs are single-flight per deck fingerprint (canonical deck, max_turns, simulator version and
+    ruleset): a request for a deck that is already being analysed attaches to the running job and
+    shares its result, which then has at least the trials of every attached request. A larger trial
+    count extends the running job with further trial indices of the same seeded run. Trials already
+    in the ResultStore at `store_path` are reused, so a finished deck is extended, not restarted; every
+    job plays the deck in canonical_deck() order, which the stored example seeds replay with.
+
+    A job submitted with keep_trials=True also keeps the per-trial records of the trials it plays, so
+    that submit_edit() can analyse a one-card edit of the deck by re-simulating only the trials the
+    edit can change (see tcg_incremental). It reuses the store like any job; if it did not play every
+    trial of its result (the deck was in the store), it plays a fresh seeded run for the records after
+    the job is done. Edit results are stored for decks the store does not have yet.
+
+        service = JobService()
+        job_id = service.submit(parsed_deck, main_attackers, trials=5000, maxturns=5)
+        status = service.poll(job_id)     # JobStatus(..., state='running', trials_done=1500, ...)
+    """
+
+    def __init__(self, workers=None, chunk_size=500, store_path="results.db", ruleset='default', max_examples=10,
+                 max_finished=100):
+        self.chunk_size = chunk_size
+        self.max_examples = max_examples
+        self.store_path = store_path
+        self.ruleset = ruleset
+        self.max_finished = max_finished
+        self._window = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=self._window, initializer=load_card_data,
+                                         initargs=(share_card_data(),))
+        self._jobs = {}          # job id -> SimulationJob, in submission order
+        self._in_flight = {}     # (deck fingerprint, keep_trials) -> id of the job still accepting requests for it
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._store = None       # opened on the loop thread (SQLite connections stay on one thread)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="tcg-job-service", daemon=True)
+        self._thread.start()
+
+    def submit(self, full_deck, main_attackers, trials=1000, show_examples=5, maxturns=7, keep_trials=False):
+        """
+        Schedules an analysis and returns its job id. If the same deck and settings are already being
+        analysed, the request attaches to that job instead (raising its trial target and example count
+        if this request asks for more) and its id is returned.
+        """
+        fingerprint = deck_fingerprint(full_deck, maxturns, SIMULATOR_VERSION, self.ruleset)
+        show_examples = min(show_examples, self.max_examples)
+        key = (fingerprint, keep_trials)
+        with self._lock:
+            if key in self._in_flight:
+                job = self._jobs[self._in_flight[key]]
+                job.attach(trials, show_examples)
+                return job.job_id
+            job_id = f"{fingerprint[:12]}-{next(self._ids)}"
+            # Played and replayed in the store's order, so stored example seeds replay the games they came from
+            job = SimulationJob(job_id, fingerprint, canonical_deck(full_deck), main_attackers, trials, show_examples,
+                                maxturns, keep_trials)
+            self._jobs[job_id] = job
+            self._in_flight[key] = job_id
+            self._forget_finished()
+        asyncio.run_coroutine_threadsafe(self._run(job), self._loop)
+        return job_id
+
+    def submit_edit(self, base_job_id, full_deck, main_attackers, show_examples=5):
+        """
+        Analyses an edited deck over the trials of a keep_trials job. For a one-card swap only the trials
+        the swap can change are played again (JobStatus.resimulated counts them); any other edit, or a
+        base job without records, is simulated like submit(keep_trials=True) with the base job's trial
+        count and turns. The edit starts once the base job's records are ready.
+        Returns the job id; KeyError for unknown base job ids.
+        """
+        with self._lock:
+            base = self._jobs[base_job_id]
+        if not base.keep_trials:
+            return self.submit(full_deck, main_attackers, trials=base.trials, show_examples=show_examples,
+                               maxturns=base.max_turns, keep_trials=True)
+        fingerprint = deck_fingerprint(full_deck, base.max_turns, SIMULATOR_VERSION, self.ruleset)
+        show_examples = min(show_examples, self.max_examples)
+        with self._lock:
+            job_id = f"{fingerprint[:12]}-{next(self._ids)}"
+            job = SimulationJob(job_id, fingerprint, canonical_deck(full_deck), main_attackers, base.trials,
+                                show_examples, base.max_turns, keep_trials=True)
+            self._jobs[job_id] = job
+            self._forget_finished()
+        asyncio.run_coroutine_threadsafe(self._run_edit(job, base), self._loop)
+        return job_id
+
+    def poll(self, job_id):
+        """Current JobStatus of a job; KeyError for unknown (or long forgotten) job ids."""
+        with self._lock:
+            job = self._jobs[job_id]
+        return job.status()
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until the job has finished (or `timeout` seconds passed) and returns its JobStatus."""
+        with self._lock:
+            job = self._jobs[job_id]
+        job.done.wait(timeout)
+        return job.status()
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._close_store)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._pool.shutdown(cancel_futures=True)
+
+    def _close_store(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _get_store(self):
+        if self._store is None and self.store_path is not None:
+            self._store = ResultStore(self.store_path, max_examples=self.max_examples)
+        return self._store
+
+    async def _run(self, job):
+        loop = asyncio.get_running_loop()
+        try:
+            store = self._get_store()
+            stored = store.get(job.fingerprint) if store is not None else None
+            result = stored if stored is not None else SimulationResult(job.max_turns, max_examples=self.max_examples)
+            job.publish(result)
+            seed = random.randrange(2 ** 32)
+            next_trial = 0
+            while True:
+                # Requests that attach meanwhile may raise the target; the job stops accepting them
+                # (and a later request starts from the store) only once the target is reached
+                with self._lock:
+                    missing = job.trials - result.trials
+                    if missing <= 0:
+                        if self._in_flight.get((job.fingerprint, job.keep_trials)) == job.job_id:
+                            del self._in_flight[(job.fingerprint, job.keep_trials)]
+                        break
+                new_result = await self._simulate(job, result, seed, next_trial, missing)
+                next_trial += missing
+                if store is not None:
+                    result = store.add(job.fingerprint, new_result)
+                else:
+                    result = SimulationResult.from_state(result.get_state()).merge(new_result)
+            if job.keep_trials:
+                job.keep_records(result.trials)
+            result.example_logs = await loop.run_in_executor(
+                self._pool, replay_trials, job.full_deck, job.main_attackers,
+                result.examples[:job.show_examples], job.max_turns
+            )
+            job.publish(result, DONE)
+        except Exception as e:
+            job.fail(e)
+        finally:
+            key = (job.fingerprint, job.keep_trials)
+            with self._lock:
+                if self._in_flight.get(key) == job.job_id:
+                    del self._in_flight[key]
+            job.done.set()
+        try:
+            if job.keep_trials and job.state == DONE and job.trial_records is None:
+                await self._rebuild_records(job)
+        finally:
+            job.records_ready.set()
+
+    async def _rebuild_records(self, job):
+        """
+        Plays a fresh seeded run of the job's deck only for its trial records (the deck's result came from
+        the store), so that edits of it can be incremental. If this fails, edits simulate in full.
+        """
+        seed = random.randrange(2 ** 32)
+        chunks = [(_record_chunk, job.full_deck, job.main_attackers, job.max_turns, seed, start,
+                   min(self.chunk_size, job.trials - start), self.max_examples)
+                  for start in range(0, job.trials, self.chunk_size)]
+        try:
+            await self._run_chunks(job, None, chunks)
+        except Exception:
+            pass  # keep_records drops the records of an incomplete run
+        job.keep_records(job.trials)
+
+    async def _run_edit(self, job, base):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, base.records_ready.wait)
+        records = base.trial_records
+        try:
+            affected = records.affected(job.full_deck, job.main_attackers) if records is not None else None
+        except Exception as e:
+            job.fail(e)
+            job.done.set()
+            job.records_ready.set()
+            return
+        if affected is None:
+            await self._run(job)
+            return
+        # The deck in played order (the new card in the old one's slot), which the example replays need
+        job.full_deck, _ = affected
+        job.trials = len(records)
+        try:
+            result = SimulationResult(job.max_turns, max_examples=self.max_examples)
+            job.resimulated = 0
+            job.publish(result)
+            chunks = [(_edit_chunk, records.chunk(start, start + self.chunk_size), job.full_deck, job.main_attackers,
+                       self.max_examples) for start in range(0, len(records), self.chunk_size)]
+            result = await self._run_chunks(job, result, chunks)
+            job.keep_records(len(records))
+            self._store_edit(job, result)
+            result.example_logs = await loop.run_in_executor(
+                self._pool, replay_trials, job.full_deck, job.main_attackers,
+                result.examples[:job.show_examples], job.max_turns
+            )
+            job.publish(result, DONE)
+        except Exception as e:
+            job.fail(e)
+        finally:
+            job.done.set()
+            job.records_ready.set()
+
+    def _store_edit(self, job, result):
+        """
+        Stores an edit's result if the store has no entry for the edited deck yet (an entry may already
+        hold these very games, e.g. after an edit back to the base deck). Its example seeds replay only
+        in the played order, so they are dropped unless that is the store's canonical order.
+        """
+        store = self._get_store()
+        if store is None or store.get(job.fingerprint) is not None:
+            return
+        stored = SimulationResult.from_state(result.get_state())
+        if not all(a is b for a, b in zip(canonical_deck(job.full_deck), job.full_deck)):
+            stored.examples = []
+        store.add(job.fingerprint, stored)
+
+    async def _simulate(self, job, base, seed, first_trial, trials):
+        """Simulates trial indices [first_trial, first_trial + trials) of the job's run, publishing base + progress."""
+        worker = _record_chunk if job.keep_trials else _simulate_chunk
+        chunks = [(worker, job.full_deck, job.main_attackers, job.max_turns, seed, start,
+                   min(self.chunk_size, first_trial + trials - start), self.max_examples)
+                  for start in range(first_trial, first_trial + trials, self.chunk_size)]
+        return await self._run_chunks(job, base, chunks)
+
+    async def _run_chunks(self, job, base, chunks):
+        """
+        Runs (worker, *args) chunks on the pool and returns their merged result, publishing base + progress
+        (nothing if `base` is None).
+        """
+        loop = asyncio.get_running_loop()
+        new_result = SimulationResult(job.max_turns, max_examples=self.max_examples)
+        pending = set()
+        while chunks or pending:
+            # A bounded window per job keeps concurrent jobs interleaved on the pool
+            while chunks and len(pending) < self._window:
+                pending.add(loop.run_in_executor(self._pool, *chunks.pop(0)))
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in finished:
+                chunk_result = future.result()
+                if isinstance(chunk_result, tuple):
+                    chunk_result, records, resimulated = chunk_result
+                    job.keep(records, resimulated)
+                new_result.merge(chunk_result)
+            if base is not None:
+                job.publish(SimulationResult.from_state(base.get_state()).merge(new_result))
+        return new_result
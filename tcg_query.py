@@ -0,0 +1,102 @@
+import os
+import tempfile
+from collections import namedtuple
+import numpy as np
+from tcg_utils import *
+
+# =============================================================================
+# Conditional Brick-Rate Queries
+# =============================================================================
+
+QueryResult = namedtuple('QueryResult', ['query', 'games', 'bricks', 'brick_rate', 'ci_low', 'ci_high'])
+
+
+class Condition:
+    """
+    A filter over the games of a GameArchive. `mask(archive)` returns a boolean array with one entry
+    per game. Conditions combine with & (and), | (or) and ~ (not), e.g.
+
+        in_opener("poké ball") & ~seen("professor's research", by_turn=2)
+    """
+
+    def __init__(self, description, mask):
+        self.description = description
+        self.mask = mask
+
+    def __and__(self, other):
+        return Condition(f"({self.description} and {other.description})",
+                         lambda archive: self.mask(archive) & other.mask(archive))
+
+    def __or__(self, other):
+        return Condition(f"({self.description} or {other.description})",
+                         lambda archive: self.mask(archive) | other.mask(archive))
+
+    def __invert__(self):
+        return Condition(f"not {self.description}", lambda archive: ~self.mask(archive))
+
+    def __repr__(self):
+        return f"Condition({self.description})"
+
+
+def seen(card_name, by_turn):
+    """A copy of `card_name` was seen (drawn, searched or in the opening hand) by the end of `by_turn`."""
+    return Condition(f"{card_name} seen by turn {by_turn}", lambda archive: archive.seen_by(card_name, by_turn))
+
+
+def in_opener(card_name):
+    """A copy of `card_name` was in the opening hand."""
+    return Condition(f"{card_name} in opener", lambda archive: archive.seen_by(card_name, 0))
+
+
+def played(card_name):
+    """A copy of `card_name` was played (e.g. a supporter was used)."""
+    return Condition(f"{card_name} played", lambda archive: archive.played_mask(card_name))
+
+
+def attackers_at_least(n, turn):
+    """At least `n` main attackers were in play at the end of `turn`."""
+    return Condition(f"{n}+ attackers by turn {turn}", lambda archive: archive.attackers[:, turn - 1] >= n)
+
+
+ALL_GAMES = Condition("all games", lambda archive: np.ones(len(archive), dtype=bool))
+
+
+class BrickQueryEngine:
+    """Answers conditional brick-rate queries from the per-game records of one simulation run."""
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.is_brick = archive.is_brick
+
+    def query(self, condition=ALL_GAMES, z=1.96):
+        """Brick rate (with Wilson interval) among the games matching `condition`."""
+        mask = condition.mask(self.archive)
+        games = int(mask.sum())
+        bricks = int((self.is_brick & mask).sum())
+        low, high = wilson_interval(bricks, games, z)
+        return QueryResult(condition.description, games, bricks, bricks / games if games else 0.0, low, high)
+
+    def query_many(self, conditions, z=1.96):
+        """Runs several queries against the same games; returns a DataFrame with one row per query."""
+        import pandas as pd
+        return pd.DataFrame([self.query(condition, z)._asdict() for condition in conditions])
+
+
+def simulate_for_queries(full_deck, precomputed_attackers, trials=10000, maxturns=7, seed=None, archive_path=None):
+    """
+    Simulates `trials` games of a deck into a game archive and returns a BrickQueryEngine over them.
+    With `archive_path` the archive is kept there; otherwise it is written to a temporary directory,
+    loaded into memory and deleted.
+    """
+    if archive_path is not None:
+        simulate_brick_rate_with_examples(full_deck, precomputed_attackers, trials=trials, show_examples=0,
+                                          maxturns=maxturns, seed=seed, archive_path=archive_path)
+        return BrickQueryEngine(GameArchive(archive_path))
+    with tempfile.TemporaryDirectory() as directory:
+        archive_path = os.path.join(directory, 'run.games')
+        simulate_brick_rate_with_examples(full_deck, precomputed_attackers, trials=trials, show_examples=0,
+                                          maxturns=maxturns, seed=seed, archive_path=archive_path)
+        archive = GameArchive(archive_path)
+        # Copy the records out of the memmap, so the files can go
+        archive.records = np.array(archive.records)
+    return BrickQueryEngine(archive)
@@ -0,0 +1,449 @@
+import math
+import random
+from collections import Counter, namedtuple
+import numpy as np
+from tcg_utils import *
+
+# =============================================================================
+# Opener Strata
+# =============================================================================
+
+# Card classes the strata are built from; every other card is 'other'
+OPENER_CLASSES = (
+    ('basic', is_basic),
+    ('poke_ball', is_pokeball),
+    ('research', is_professors_research),
+)
+
+OPENING_HAND = 5
+
+# key: (basics dealt, Poké Ball dealt, Professor's Research dealt); compositions: [(counts, probability)]
+# with counts per class of OPENER_CLASSES + 'other', probabilities conditional on the stratum
+OpenerStratum = namedtuple('OpenerStratum', ['key', 'probability', 'compositions'])
+
+
+def opener_classes(full_deck):
+    """Indices of the deck's cards by opener class: one list per OPENER_CLASSES entry, then the others."""
+    classes = [[] for _ in range(len(OPENER_CLASSES) + 1)]
+    for i, card in enumerate(full_deck):
+        k = next((k for k, (_, matches) in enumerate(OPENER_CLASSES) if matches(card)), len(OPENER_CLASSES))
+        classes[k].append(i)
+    return classes
+
+
+def opener_strata(full_deck, cards=OPENING_HAND):
+    """
+    Exact distribution of the first `cards` cards of a shuffled deck (the opening hand by default),
+    grouped into strata by the number of basics and whether a Poké Ball and a Professor's Research are
+    among them.
+
+    The strata describe the cards as dealt, before ensure_guaranteed_basic_top5 swaps a basic in, so
+    every stratum is a plain condition on the shuffle (stratum 0 basics = the games that get the swap).
+    """
+    sizes = [len(indices) for indices in opener_classes(full_deck)]
+    total = math.comb(len(full_deck), cards)
+    strata = {}
+    for basics in range(min(sizes[0], cards) + 1):
+        for balls in range(min(sizes[1], cards - basics) + 1):
+            for research in range(min(sizes[2], cards - basics - balls) + 1):
+                others = cards - basics - balls - research
+                if others > sizes[3]:
+                    continue
+                counts = (basics, balls, research, others)
+                ways = 1
+                for size, count in zip(sizes, counts):
+                    ways *= math.comb(size, count)
+                strata.setdefault((basics, balls > 0, research > 0), []).append((counts, ways / total))
+    result = []
+    for key, compositions in sorted(strata.items()):
+        probability = sum(p for _, p in compositions)
+        if probability > 0:
+            result.append(OpenerStratum(key, probability, [(c, p / probability) for c, p in compositions]))
+    return result
+
+
+def sample_deck_order(full_deck, classes, stratum, rng):
+    """
+    A shuffle of `full_deck` drawn from its exact distribution given that the dealt opener falls in
+    `stratum`: the class counts are drawn with their conditional probabilities, then the cards of each
+    class, then the order of the opener and of the rest of the deck.
+    """
+    weights = [p for _, p in stratum.compositions]
+    counts = rng.choices(stratum.compositions, weights)[0][0]
+    opener = []
+    rest = []
+    for indices, count in zip(classes, counts):
+        chosen = rng.sample(indices, count)
+        opener.extend(chosen)
+        chosen = set(chosen)
+        rest.extend(i for i in indices if i not in chosen)
+    rng.shuffle(opener)
+    rng.shuffle(rest)
+    return [full_deck[i] for i in opener + rest]
+
+
+# =============================================================================
+# Stratified Simulation
+# =============================================================================
+
+# Per stratum: its key, weight (exact probability), trials simulated and bricks among them
+StratumResult = namedtuple('StratumResult', ['key', 'weight', 'trials', 'bricks'])
+
+StratifiedEstimate = namedtuple('StratifiedEstimate', ['brick_rate', 'std_error', 'ci_low', 'ci_high', 'trials',
+                                                       'strata'])
+
+
+def _smoothed_rate(bricks, trials):
+    # Keeps strata with no bricks (yet) from claiming zero variance
+    return (bricks + 0.5) / (trials + 1)
+
+
+def neyman_allocation(trials, weights, deviations):
+    """Splits `trials` over strata in proportion to weight x standard deviation (largest remainder rounding)."""
+    shares = [w * sd for w, sd in zip(weights, deviations)]
+    total = sum(shares)
+    if total == 0:
+        shares, total = list(weights), sum(weights)
+    exact = [trials * share / total for share in shares]
+    allocation = [int(x) for x in exact]
+    by_remainder = sorted(range(len(exact)), key=lambda h: allocation[h] - exact[h])
+    for h in by_remainder[:trials - sum(allocation)]:
+        allocation[h] += 1
+    return allocation
+
+
+def stratified_estimate(results, z=1.96):
+    """Combines per-stratum results with their weights into a StratifiedEstimate."""
+    rate = sum(r.weight * r.bricks / r.trials for r in results if r.trials)
+    variance = 0.0
+    for r in results:
+        if r.trials:
+            p = _smoothed_rate(r.bricks, r.trials)
+            variance += r.weight ** 2 * p * (1 - p) / r.trials
+    std_error = math.sqrt(variance)
+    return StratifiedEstimate(rate, std_error, max(0.0, rate - z * std_error), min(1.0, rate + z * std_error),
+                              sum(r.trials for r in results), results)
+
+
+def simulate_stratified(full_deck, precomputed_attackers, trials=1000, maxturns=7, seed=None, pilot_fraction=0.2,
+                        min_pilot=20, cards=OPENING_HAND, z=1.96):
+    """
+    Stratified version of simulate_brick_rate_with_examples' brick-rate estimate.
+
+    Trials are split over the strata of the first `cards` cards (see opener_strata), whose probabilities
+    are exact: a pilot of `pilot_fraction` of the trials (at least `min_pilot` per stratum) estimates each
+    stratum's brick rate, and the remaining trials go to the strata by Neyman allocation. If the pilot
+    would exceed `trials` it is scaled down to them, keeping one trial per stratum; ValueError if
+    `trials` is less than the number of strata. The strata's
+    brick rates are combined with their exact weights, so the estimate is unbiased for any allocation;
+    its interval is narrower than plain Monte Carlo's by the share of the variance the strata explain.
+
+    Trial i is seeded like the plain runner's (trial_seed(seed, i)); the seeded stream draws the
+    conditional shuffle and then plays the game. Returns a StratifiedEstimate.
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    effects = compile_deck_effects(full_deck)
+    classes = opener_classes(full_deck)
+    strata = opener_strata(full_deck, cards)
+    weights = [stratum.probability for stratum in strata]
+    counts = [[0, 0] for _ in strata]     # [trials, bricks] per stratum
+    next_trial = [0]
+
+    def run(h, n):
+        for _ in range(n):
+            rng = random.Random(trial_seed(seed, next_trial[0]))
+            next_trial[0] += 1
+            deck_order = sample_deck_order(full_deck, classes, strata[h], rng)
+            is_brick, _, _, _ = simulate_one_trial_with_logging(
+                full_deck, precomputed_attackers, max_turns=maxturns, rng=rng, effects=effects, deck_order=deck_order
+            )
+            counts[h][0] += 1
+            counts[h][1] += is_brick
+
+    if trials < len(strata):
+        raise ValueError(f"Stratified sampling needs at least one trial per stratum ({len(strata)} strata, "
+                         f"{trials} trials).")
+    pilot = [max(1, min_pilot, round(pilot_fraction * trials * w)) for w in weights]
+    if sum(pilot) > trials:
+        # Many rare strata: scale the pilot down to the whole run, keeping one trial per stratum
+        extra = neyman_allocation(trials - len(strata), [n - 1 for n in pilot], [1] * len(strata))
+        pilot = [1 + n for n in extra]
+    for h, n in enumerate(pilot):
+        run(h, n)
+    remaining = trials - sum(pilot)
+    if remaining > 0:
+        deviations = []
+        for n, bricks in counts:
+            p = _smoothed_rate(bricks, n)
+            deviations.append(math.sqrt(p * (1 - p)))
+        # Top every stratum up towards its Neyman share of the whole run
+        targets = neyman_allocation(trials, weights, deviations)
+        top_ups = [max(0, t - n) for t, n in zip(targets, pilot)]
+        extra = neyman_allocation(remaining, top_ups if any(top_ups) else targets, [1] * len(strata))
+        for h, n in enumerate(extra):
+            run(h, n)
+    results = [StratumResult(stratum.key, w, n, bricks) for stratum, w, (n, bricks) in zip(strata, weights, counts)]
+    return stratified_estimate(results, z)
+
+
+# =============================================================================
+# Control Variates
+# =============================================================================
+
+# A control variable of the dealt shuffle: how many of `cards` (indices into the deck) are among its first
+# `depth` cards, or with `indicator` whether any is. `expected` is its exact mean over all shuffles.
+Control = namedtuple('Control', ['name', 'cards', 'depth', 'indicator', 'expected'])
+
+ControlVariateEstimate = namedtuple('ControlVariateEstimate', [
+    'trials', 'raw_rate', 'raw_ci_low', 'raw_ci_high', 'brick_rate', 'std_error', 'ci_low', 'ci_high',
+    'variance_reduction', 'coefficients'
+])
+
+
+def shuffle_control(name, full_deck, cards, depth, indicator=True):
+    """A Control over `cards` with its exact expectation (hypergeometric over the deck)."""
+    n, copies = len(full_deck), len(cards)
+    depth = min(depth, n)
+    if indicator:
+        expected = 1 - math.comb(n - copies, depth) / math.comb(n, depth)
+    else:
+        expected = depth * copies / n
+    return Control(name, tuple(cards), depth, indicator, expected)
+
+
+def deck_controls(full_deck, precomputed_attackers, maxturns=7):
+    """
+    Default control variables of a deck, all functions of the shuffle with exact expectations:
+    - the number of basics in the opening hand
+    - a basic of each main attacker's line among the first 6 cards (seen by turn 2 without any search)
+    - each main attacker, Rare Candy and Professor's Research among the cards drawn by the last turn
+    Controls that are the same for every shuffle are left out.
+    """
+    graph = evolution_graph()
+    horizon = OPENING_HAND + maxturns - 1
+    indices = {}
+    for i, card in enumerate(full_deck):
+        indices.setdefault(card['name'], []).append(i)
+    controls = [shuffle_control("basics in opener", full_deck, [i for i, c in enumerate(full_deck) if is_basic(c)],
+                                OPENING_HAND, indicator=False)]
+    line_basics = sorted(set(graph.card_basic(c) for c in full_deck if c['name'] in precomputed_attackers))
+    for basic in line_basics:
+        if basic in indices:
+            controls.append(shuffle_control(f"{basic} by turn 2", full_deck, indices[basic], OPENING_HAND + 1))
+    key_cards = sorted(set(precomputed_attackers) | {c['name'] for c in full_deck
+                                                     if is_rare_candy(c) or is_professors_research(c)})
+    for name in key_cards:
+        if name in indices:
+            controls.append(shuffle_control(f"{name} by turn {maxturns}", full_deck, indices[name], horizon))
+    return [c for c in controls if 0 < c.expected < (1 if c.indicator else len(c.cards))]
+
+
+class ControlVariates:
+    """
+    Streaming control-variate estimate of the brick rate.
+
+    Each trial adds its brick outcome and the values of the controls on its shuffle; the estimate
+    regresses the outcome on the controls and corrects the raw rate by how far the controls' sample
+    means are from their exact expectations:
+
+        rate_cv = raw_rate - beta . (mean(controls) - expected)
+
+    The correction removes the part of the variance the controls explain. Trials are tallied per
+    distinct control vector, so memory stays bounded and accumulators from chunks or workers can be
+    merged.
+    """
+
+    def __init__(self, full_deck, controls):
+        self.controls = controls
+        self._specs = [(tuple(id(full_deck[i]) for i in c.cards), c.depth, c.indicator) for c in controls]
+        self.tally = Counter()      # control values -> [trials, bricks]
+
+    def values(self, deck_order):
+        """The controls' values on one shuffle (the cards of the deck in draw order)."""
+        position = {id(card): i for i, card in enumerate(deck_order)}
+        values = []
+        for card_ids, depth, indicator in self._specs:
+            dealt = 0
+            for card_id in card_ids:
+                if position[card_id] < depth:
+                    dealt += 1
+            values.append(min(dealt, 1) if indicator else dealt)
+        return tuple(values)
+
+    def add_trial(self, deck_order, is_brick):
+        values = self.values(deck_order)
+        counts = self.tally.get(values)
+        if counts is None:
+            counts = self.tally[values] = [0, 0]
+        counts[0] += 1
+        counts[1] += bool(is_brick)
+
+    def get_state(self):
+        """The tally, for checkpointing. Restore with set_state()."""
+        return {
+            'controls': [c.name for c in self.controls],
+            'tally': [[list(values), trials, bricks] for values, (trials, bricks) in self.tally.items()],
+        }
+
+    def set_state(self, state):
+        if state['controls'] != [c.name for c in self.controls]:
+            raise ValueError("Control variate state was collected with different controls.")
+        self.tally = Counter({tuple(values): [trials, bricks] for values, trials, bricks in state['tally']})
+
+    def merge(self, other):
+        for values, (trials, bricks) in other.tally.items():
+            counts = self.tally.setdefault(values, [0, 0])
+            counts[0] += trials
+            counts[1] += bricks
+        return self
+
+    @property
+    def trials(self):
+        return sum(trials for trials, _ in self.tally.values())
+
+    @property
+    def bricks(self):
+        return sum(bricks for _, bricks in self.tally.values())
+
+    def estimate(self, z=1.96):
+        """Raw and control-variate brick rates with their intervals, as a ControlVariateEstimate."""
+        n, bricks = self.trials, self.bricks
+        raw_rate = bricks / n if n else 0.0
+        raw_low, raw_high = wilson_interval(bricks, n, z)
+        q = len(self.controls)
+        if n <= q + 1:
+            return ControlVariateEstimate(n, raw_rate, raw_low, raw_high, raw_rate, float('nan'), raw_low, raw_high,
+                                          1.0, {})
+        x = np.array(list(self.tally), dtype=float).reshape(len(self.tally), q)
+        counts = np.array(list(self.tally.values()), dtype=float)
+        weights, hits = counts[:, 0], counts[:, 1]
+        mean_x = weights @ x / n
+        centered = x - mean_x
+        cov_xx = centered.T @ (centered * weights[:, None])
+        cov_xy = centered.T @ (hits - weights * raw_rate)
+        beta, _, rank, _ = np.linalg.lstsq(cov_xx, cov_xy, rcond=None)
+        expected = np.array([c.expected for c in self.controls])
+        rate = raw_rate - float(beta @ (mean_x - expected))
+        total_ss = bricks - n * raw_rate ** 2
+        residual_ss = max(0.0, total_ss - float(beta @ cov_xy))
+        std_error = math.sqrt(residual_ss / (n - rank - 1) / n)
+        raw_variance = total_ss / (n - 1) / n
+        reduction = raw_variance / std_error ** 2 if std_error else float('inf')
+        return ControlVariateEstimate(n, raw_rate, raw_low, raw_high, rate, std_error, max(0.0, rate - z * std_error),
+                                      min(1.0, rate + z * std_error), reduction,
+                                      {c.name: float(b) for c, b in zip(self.controls, beta)})
+
+
+def simulate_with_control_variates(full_deck, precomputed_attackers, trials=1000, show_examples=5, maxturns=7,
+                                   seed=None, controls=None, z=1.96):
+    """
+    Runs simulate_brick_rate_with_examples with a ControlVariates accumulator over `controls` (by default
+    deck_controls). Returns the usual SimulationResult and the ControlVariateEstimate of the same trials.
+    """
+    if controls is None:
+        controls = deck_controls(full_deck, precomputed_attackers, maxturns)
+    accumulator = ControlVariates(full_deck, controls)
+    result = simulate_brick_rate_with_examples(full_deck, precomputed_attackers, trials=trials,
+                                               show_examples=show_examples, maxturns=maxturns, seed=seed,
+                                               controls=accumulator)
+    return result, accumulator.estimate(z)
+
+
+# =============================================================================
+# Importance Sampling
+# =============================================================================
+
+ImportanceEstimate = namedtuple('ImportanceEstimate', [
+    'brick_rate', 'std_error', 'ci_low', 'ci_high', 'trials', 'bricks', 'mean_weight', 'ess', 'brick_ess', 'tilt'
+])
+
+
+def key_card_indices(full_deck, precomputed_attackers):
+    """Deck indices of the main attackers' evolution lines, Rare Candy, Professor's Research and Poké Ball."""
+    graph = evolution_graph()
+    lines = set(precomputed_attackers)
+    for name in precomputed_attackers:
+        lines |= graph.ancestors(name)
+    return [i for i, c in enumerate(full_deck)
+            if c['name'] in lines or is_rare_candy(c) or is_professors_research(c) or is_pokeball(c)]
+
+
+class TiltedShuffle:
+    """
+    Biased shuffle for importance sampling. The first `depth` cards are dealt one at a time, each card
+    being picked with probability proportional to its weight among the cards left (weights below 1
+    push a card deeper into the deck); the rest are shuffled uniformly.
+
+    sample() returns the deck order and its likelihood ratio against a uniform shuffle,
+    prod over the first `depth` picks of (weight left) / (cards left x weight of the picked card).
+    """
+
+    def __init__(self, full_deck, weights, depth):
+        self.full_deck = full_deck
+        self.weights = list(weights)
+        self.depth = min(depth, len(full_deck))
+
+    def sample(self, rng):
+        left = list(range(len(self.full_deck)))
+        total = sum(self.weights)
+        order = []
+        ratio = 1.0
+        for t in range(self.depth):
+            x = rng.random() * total
+            for j, i in enumerate(left):
+                x -= self.weights[i]
+                if x < 0:
+                    break
+            # j stays on the last card if rounding leaves x >= 0
+            i = left.pop(j)
+            ratio *= total / ((len(left) + 1) * self.weights[i])
+            total -= self.weights[i]
+            order.append(i)
+        rng.shuffle(left)
+        return [self.full_deck[i] for i in order + left], ratio
+
+
+def simulate_importance(full_deck, precomputed_attackers, trials=1000, maxturns=7, seed=None, tilt=0.75, depth=None,
+                        z=1.96):
+    """
+    Importance-sampled brick rate for decks that rarely brick.
+
+    Shuffles are dealt by a TiltedShuffle that gives the key cards (see key_card_indices) weight
+    `tilt`, so they arrive late and openers lack them more often than in real games; the first `depth`
+    cards are tilted (by default the cards drawn by the last turn without help). Every trial is
+    weighted by its exact likelihood ratio, so the mean of weight x brick is an unbiased estimate.
+
+    Returns an ImportanceEstimate with the Kish effective sample size of the weights (`ess`) and of the
+    bricked trials' weights (`brick_ess`); a mean weight far from 1 or a brick_ess of a handful
+    means the tilt is too strong for the trial count.
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    if depth is None:
+        depth = OPENING_HAND + maxturns - 1
+    effects = compile_deck_effects(full_deck)
+    key_cards = set(key_card_indices(full_deck, precomputed_attackers))
+    sampler = TiltedShuffle(full_deck, [tilt if i in key_cards else 1.0 for i in range(len(full_deck))], depth)
+    bricks = 0
+    sum_w = sum_w2 = sum_wy = sum_wy2 = 0.0
+    for i in range(trials):
+        rng = random.Random(trial_seed(seed, i))
+        deck_order, weight = sampler.sample(rng)
+        is_brick, _, _, _ = simulate_one_trial_with_logging(
+            full_deck, precomputed_attackers, max_turns=maxturns, rng=rng, effects=effects, deck_order=deck_order
+        )
+        sum_w += weight
+        sum_w2 += weight * weight
+        if is_brick:
+            bricks += 1
+            sum_wy += weight
+            sum_wy2 += weight * weight
+    rate = sum_wy / trials if trials else 0.0
+    variance = (sum_wy2 - trials * rate * rate) / (trials - 1) / trials if trials > 1 else 0.0
+    std_error = math.sqrt(max(0.0, variance))
+    return ImportanceEstimate(
+        rate, std_error, max(0.0, rate - z * std_error), min(1.0, rate + z * std_error), trials, bricks,
+        sum_w / trials if trials else 0.0, sum_w * sum_w / sum_w2 if sum_w2 else 0.0,
+        sum_wy * sum_wy / sum_wy2 if sum_wy2 else 0.0, tilt
+    )
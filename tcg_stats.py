@@ -0,0 +1,394 @@
+import math
+import random
+
+# =============================================================================
+# Simulation Statistics
+# =============================================================================
+
+
+class CardStatsCollector:
+    """
+    Accumulates per-card attribution counters across simulated trials.
+
+    Every distinct card name in the deck gets a small integer ID and all
+    counters live in lists preallocated to that size, so recording a trial
+    only touches a handful of list slots. Counters are "number of trials in
+    which at least one copy of the card ..." so dividing by `trials` gives a
+    rate.
+
+    - seen: first turn a copy left the deck (turn 0 = opening hand)
+    - played: a copy left the hand (placed, evolved, or used as a trainer)
+    - stuck: a copy was still in hand at the end of the game
+    - bricked / not_bricked: a copy was seen in a bricked / non-bricked game
+    """
+
+    def __init__(self, full_deck, max_turns):
+        self.max_turns = max_turns
+        self.card_names = sorted(set(c['name'] for c in full_deck))
+        self.card_ids = {name: i for i, name in enumerate(self.card_names)}
+        n = len(self.card_names)
+
+        self.trials = 0
+        self.bricks = 0
+        self.first_seen = [[0] * n for _ in range(max_turns + 1)]
+        self.played = [0] * n
+        self.stuck = [0] * n
+        self.seen_bricked = [0] * n
+        self.seen_not_bricked = [0] * n
+        self.bench_full = [0] * (max_turns + 1)
+
+        # Per-trial scratch space, reset by begin_trial()
+        self._slots = [(id(c), self.card_ids[c['name']]) for c in full_deck]
+        self._unseen = [-1] * n
+        self._cleared = [False] * n
+        self._trial_first_seen = [-1] * n
+        self._trial_played = [False] * n
+        self._trial_stuck = [False] * n
+
+    def begin_trial(self):
+        self._trial_first_seen[:] = self._unseen
+
+    def end_turn(self, turn, deck, bench, max_bench=3):
+        """Marks every card that is no longer in the deck as seen by `turn`."""
+        first_seen = self._trial_first_seen
+        in_deck = set(map(id, deck))
+        for card_id, slot in self._slots:
+            if first_seen[slot] < 0 and card_id not in in_deck:
+                first_seen[slot] = turn
+        if len(bench) >= max_bench:
+            self.bench_full[turn] += 1
+
+    def end_trial(self, is_brick, hand, deck, pending=()):
+        """Folds the finished trial into the running counters."""
+        self.trials += 1
+        if is_brick:
+            self.bricks += 1
+        present = self.seen_bricked if is_brick else self.seen_not_bricked
+        first_seen = self._trial_first_seen
+        for slot, turn in enumerate(first_seen):
+            if turn >= 0:
+                self.first_seen[turn][slot] += 1
+                present[slot] += 1
+
+        in_hand = set(map(id, hand))
+        not_played = in_hand.union(map(id, deck), map(id, pending))
+        played = self._trial_played
+        stuck = self._trial_stuck
+        played[:] = self._cleared
+        stuck[:] = self._cleared
+        for card_id, slot in self._slots:
+            if card_id in in_hand:
+                stuck[slot] = True
+            elif card_id not in not_played:
+                played[slot] = True
+        for slot in range(len(first_seen)):
+            if played[slot]:
+                self.played[slot] += 1
+            if stuck[slot]:
+                self.stuck[slot] += 1
+
+    def seen_by_turn(self, turn):
+        """Number of trials in which each card was seen on or before `turn`."""
+        totals = [0] * len(self.card_names)
+        for t in range(min(turn, self.max_turns) + 1):
+            for slot, count in enumerate(self.first_seen[t]):
+                totals[slot] += count
+        return totals
+
+    def merge(self, other):
+        """Adds the counters of another collector built for the same deck."""
+        if other.card_names != self.card_names or other.max_turns != self.max_turns:
+            raise ValueError("Cannot merge card stats collected for different decks or turn limits.")
+        self.trials += other.trials
+        self.bricks += other.bricks
+        for mine, theirs in zip(self.first_seen, other.first_seen):
+            for slot, count in enumerate(theirs):
+                mine[slot] += count
+        for name in ('played', 'stuck', 'seen_bricked', 'seen_not_bricked', 'bench_full'):
+            mine = getattr(self, name)
+            for i, count in enumerate(getattr(other, name)):
+                mine[i] += count
+        return self
+
+    def summary(self):
+        """Returns one row of rates per card, cards that bricked games most often lacked first."""
+        trials = self.trials or 1
+        bricks = self.bricks or 1
+        not_bricks = (self.trials - self.bricks) or 1
+        seen_final = self.seen_by_turn(self.max_turns)
+        rows = []
+        for slot, name in enumerate(self.card_names):
+            row = {
+                'card': name,
+                'seen_rate': seen_final[slot] / trials,
+                'played_rate': self.played[slot] / trials,
+                'stuck_rate': self.stuck[slot] / trials,
+                'seen_in_bricks_rate': self.seen_bricked[slot] / bricks,
+                'seen_in_non_bricks_rate': self.seen_not_bricked[slot] / not_bricks,
+            }
+            row['brick_lift'] = row['seen_in_non_bricks_rate'] - row['seen_in_bricks_rate']
+            rows.append(row)
+        rows.sort(key=lambda r: r['brick_lift'], reverse=True)
+        return rows
+
+    def get_state(self):
+        """Raw counters, for checkpointing. Restore with set_state()."""
+        return {
+            'card_names': list(self.card_names),
+            'max_turns': self.max_turns,
+            'trials': self.trials,
+            'bricks': self.bricks,
+            'first_seen': [list(counts) for counts in self.first_seen],
+            'played': list(self.played),
+            'stuck': list(self.stuck),
+            'seen_bricked': list(self.seen_bricked),
+            'seen_not_bricked': list(self.seen_not_bricked),
+            'bench_full': list(self.bench_full),
+        }
+
+    def set_state(self, state):
+        if state['card_names'] != self.card_names or state['max_turns'] != self.max_turns:
+            raise ValueError("Card stats state was collected for a different deck or turn limit.")
+        self.trials = state['trials']
+        self.bricks = state['bricks']
+        self.first_seen = [list(counts) for counts in state['first_seen']]
+        for name in ('played', 'stuck', 'seen_bricked', 'seen_not_bricked', 'bench_full'):
+            setattr(self, name, list(state[name]))
+
+    def to_dict(self):
+        return {
+            'card_names': list(self.card_names),
+            'max_turns': self.max_turns,
+            'trials': self.trials,
+            'bricks': self.bricks,
+            'seen_by_turn': [self.seen_by_turn(t) for t in range(self.max_turns + 1)],
+            'played': list(self.played),
+            'stuck': list(self.stuck),
+            'seen_bricked': list(self.seen_bricked),
+            'seen_not_bricked': list(self.seen_not_bricked),
+            'bench_full': list(self.bench_full),
+        }
+
+
+class CollectorGroup:
+    """Forwards the per-trial collector calls to several collectors (e.g. card stats and a game archive)."""
+
+    def __init__(self, *collectors):
+        self.collectors = collectors
+
+    def begin_trial(self):
+        for collector in self.collectors:
+            collector.begin_trial()
+
+    def end_turn(self, turn, deck, bench, max_bench=3):
+        for collector in self.collectors:
+            collector.end_turn(turn, deck, bench, max_bench)
+
+    def end_trial(self, is_brick, hand, deck, pending=()):
+        for collector in self.collectors:
+            collector.end_trial(is_brick, hand, deck, pending)
+
+
+# Largest number of Pokémon that can be in play at once (1 active + 3 bench)
+MAX_IN_PLAY = 4
+
+
+def wilson_interval(successes, trials, z=1.96):
+    """Wilson score interval for a binomial proportion. Returns (low, high)."""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denom = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denom
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class SimulationResult:
+    """
+    Streaming, mergeable aggregate of simulated trials.
+
+    Holds the brick counters, a per-turn histogram of main attackers in play
+    and a uniform reservoir sample of bricked-game examples. Memory does not
+    grow with the number of trials, so results from chunks, workers or resumed
+    runs can be combined with merge().
+
+    `examples` holds whatever the runner offers for bricked trials (the tcg_utils
+    runner offers trial seeds); `example_logs` holds the rendered logs for them
+    and is filled in by the runner once the run is done.
+
+    Unpacks like the old 5-tuple (with the rendered example logs):
+        total_bricks, attacker_bricks, key_card_bricks, trials, example_logs = result
+    """
+
+    def __init__(self, max_turns, max_examples=5, seed=None):
+        self.max_turns = max_turns
+        self.max_examples = max_examples
+        self.trials = 0
+        self.bricks = 0
+        self.attacker_bricks = 0
+        self.key_card_bricks = 0
+        # attackers_by_turn[t][k] = trials with k main attackers in play at the end of turn t + 1
+        self.attackers_by_turn = [[0] * (MAX_IN_PLAY + 1) for _ in range(max_turns)]
+        # criteria_bricks[name] = trials counted as bricks by an extra brick criterion
+        self.criteria_bricks = {}
+        self.examples = []
+        self.example_logs = []
+        self._rng = random.Random(seed)
+
+    def add_trial(self, is_brick, brick_no_attacker, brick_key_stuck, example=None, attackers_by_turn=None,
+                  criteria_results=None):
+        """
+        Records one trial. `example` is offered to the reservoir if the trial bricked.
+        `criteria_results` maps extra criterion names to whether they judged the trial a brick.
+        """
+        self.trials += 1
+        if criteria_results:
+            for name, bricked in criteria_results.items():
+                self.criteria_bricks[name] = self.criteria_bricks.get(name, 0) + bool(bricked)
+        if attackers_by_turn:
+            for turn_counts, in_play in zip(self.attackers_by_turn, attackers_by_turn):
+                turn_counts[min(in_play, MAX_IN_PLAY)] += 1
+        if not is_brick:
+            return
+        self.bricks += 1
+        if brick_no_attacker:
+            self.attacker_bricks += 1
+        if brick_key_stuck:
+            self.key_card_bricks += 1
+        if example is not None and self.max_examples > 0:
+            # Reservoir sampling (Algorithm R) over all bricked trials
+            if len(self.examples) < self.max_examples:
+                self.examples.append(example)
+            else:
+                j = self._rng.randrange(self.bricks)
+                if j < self.max_examples:
+                    self.examples[j] = example
+
+    def merge(self, other):
+        """Adds another result in place, keeping the example reservoir uniform over both runs."""
+        if other.max_turns != self.max_turns:
+            raise ValueError("Cannot merge results simulated with different turn limits.")
+        self.examples = self._merge_reservoirs(self.examples, self.bricks, other.examples, other.bricks)
+        self.example_logs = []  # stale now; the caller re-renders logs for the merged sample
+        self.trials += other.trials
+        self.bricks += other.bricks
+        self.attacker_bricks += other.attacker_bricks
+        self.key_card_bricks += other.key_card_bricks
+        for name, count in other.criteria_bricks.items():
+            self.criteria_bricks[name] = self.criteria_bricks.get(name, 0) + count
+        for mine, theirs in zip(self.attackers_by_turn, other.attackers_by_turn):
+            for k, count in enumerate(theirs):
+                mine[k] += count
+        return self
+
+    def _merge_reservoirs(self, ours, our_population, theirs, their_population):
+        """
+        Samples up to max_examples from both reservoirs: how many come from each side is drawn like
+        taking that many of all bricked trials without replacement (hypergeometric in the two brick
+        counts), and a side that kept too few examples (e.g. a run without any) is topped up from the other.
+        """
+        wanted = min(self.max_examples, len(ours) + len(theirs))
+        from_ours = 0
+        for _ in range(min(wanted, our_population + their_population)):
+            if self._rng.randrange(our_population + their_population) < our_population:
+                from_ours += 1
+                our_population -= 1
+            else:
+                their_population -= 1
+        from_theirs = min(wanted - min(from_ours, len(ours)), len(theirs))
+        from_ours = wanted - from_theirs
+        merged = self._rng.sample(ours, from_ours) + self._rng.sample(theirs, from_theirs)
+        self._rng.shuffle(merged)
+        return merged
+
+    def get_state(self):
+        """Everything needed to continue accumulating exactly where this result left off."""
+        version, internal, gauss_next = self._rng.getstate()
+        return {
+            'max_turns': self.max_turns,
+            'max_examples': self.max_examples,
+            'trials': self.trials,
+            'bricks': self.bricks,
+            'attacker_bricks': self.attacker_bricks,
+            'key_card_bricks': self.key_card_bricks,
+            'attackers_by_turn': [list(counts) for counts in self.attackers_by_turn],
+            'criteria_bricks': dict(self.criteria_bricks),
+            'examples': list(self.examples),
+            'rng_state': [version, list(internal), gauss_next],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        result = cls(state['max_turns'], max_examples=state['max_examples'])
+        result.trials = state['trials']
+        result.bricks = state['bricks']
+        result.attacker_bricks = state['attacker_bricks']
+        result.key_card_bricks = state['key_card_bricks']
+        result.attackers_by_turn = [list(counts) for counts in state['attackers_by_turn']]
+        result.criteria_bricks = dict(state.get('criteria_bricks', {}))
+        result.examples = list(state['examples'])
+        if state.get('rng_state'):
+            version, internal, gauss_next = state['rng_state']
+            result._rng.setstate((version, tuple(internal), gauss_next))
+        return result
+
+    # ----- derived statistics -----
+
+    @property
+    def brick_rate(self):
+        return self.bricks / self.trials if self.trials else 0.0
+
+    @property
+    def attacker_rate(self):
+        return self.attacker_bricks / self.trials if self.trials else 0.0
+
+    @property
+    def key_card_rate(self):
+        return self.key_card_bricks / self.trials if self.trials else 0.0
+
+    def brick_rate_interval(self, z=1.96):
+        return wilson_interval(self.bricks, self.trials, z)
+
+    def mean_attackers_by_turn(self):
+        """Average number of main attackers in play at the end of each turn."""
+        means = []
+        for counts in self.attackers_by_turn:
+            total = sum(counts)
+            means.append(sum(k * c for k, c in enumerate(counts)) / total if total else 0.0)
+        return means
+
+    def ready_rate_by_turn(self, required_in_play):
+        """Fraction of trials with at least `required_in_play` main attackers in play after each turn."""
+        rates = []
+        for counts in self.attackers_by_turn:
+            total = sum(counts)
+            rates.append(sum(counts[required_in_play:]) / total if total else 0.0)
+        return rates
+
+    def to_dict(self, z=1.96):
+        return {
+            'trials': self.trials,
+            'max_turns': self.max_turns,
+            'bricks': self.bricks,
+            'attacker_bricks': self.attacker_bricks,
+            'key_card_bricks': self.key_card_bricks,
+            'brick_rate': self.brick_rate,
+            'brick_rate_ci': wilson_interval(self.bricks, self.trials, z),
+            'attacker_rate': self.attacker_rate,
+            'attacker_rate_ci': wilson_interval(self.attacker_bricks, self.trials, z),
+            'key_card_rate': self.key_card_rate,
+            'key_card_rate_ci': wilson_interval(self.key_card_bricks, self.trials, z),
+            'attackers_by_turn': [list(counts) for counts in self.attackers_by_turn],
+            'mean_attackers_by_turn': self.mean_attackers_by_turn(),
+            'criteria': {
+                name: {'bricks': count, 'rate': count / self.trials if self.trials else 0.0,
+                       'ci': wilson_interval(count, self.trials, z)}
+                for name, count in self.criteria_bricks.items()
+            },
+            'examples': list(self.examples),
+            'example_logs': [list(log) for log in self.example_logs],
+        }
+
+    def __iter__(self):
+        return iter((self.bricks, self.attacker_bricks, self.key_card_bricks, self.trials, self.example_logs))
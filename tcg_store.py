@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from tcg_stats import SimulationResult
+
+# =============================================================================
+# Checkpoints
+# =============================================================================
+
+CHECKPOINT_VERSION = 2
+
+
+def deck_signature(full_deck):
+    """Order-independent description of a parsed deck: sorted (name, count) pairs."""
+    return sorted([name, count] for name, count in Counter(c['name'] for c in full_deck).items())
+
+
+def write_bytes_atomic(path, data):
+    """
+    Writes `data` to a uniquely named temp file next to `path` and renames it over, so readers never
+    see a partial file and concurrent writers of the same path never share a temp file.
+    """
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix=f"{os.path.basename(path)}.", suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data):
+    """Writes JSON to `path` atomically (see write_bytes_atomic)."""
+    write_bytes_atomic(path, json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+
+def save_checkpoint(path, full_deck, seed, next_trial, result, stats=None, first_trial=0, criteria=(),
+                    controls=None):
+    """
+    Persists the state of a running simulation so it can be resumed with load_checkpoint().
+    `criteria` are the names of the run's extra brick criteria; `controls` its ControlVariates, if any.
+    """
+    write_json_atomic(path, {
+        'version': CHECKPOINT_VERSION,
+        'deck': deck_signature(full_deck),
+        'seed': seed,
+        'first_trial': first_trial,
+        'criteria': list(criteria),
+        'next_trial': next_trial,
+        'result': result.get_state(),
+        'stats': stats.get_state() if stats is not None else None,
+        'controls': controls.get_state() if controls is not None else None,
+    })
+
+
+def load_checkpoint(path, full_deck, max_turns, first_trial=0, criteria=()):
+    """
+    Reads a checkpoint written by save_checkpoint().
+    Returns None if there is no checkpoint yet; raises ValueError if it belongs to another run
+    (another deck, max_turns, first trial or set of brick criteria).
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint {path} has unsupported version {checkpoint.get('version')}.")
+    if checkpoint['deck'] != deck_signature(full_deck):
+        raise ValueError(f"Checkpoint {path} was written for a different deck.")
+    if checkpoint['result']['max_turns'] != max_turns:
+        raise ValueError(f"Checkpoint {path} was written for max_turns={checkpoint['result']['max_turns']}.")
+    if checkpoint['first_trial'] != first_trial:
+        raise ValueError(f"Checkpoint {path} was written for first_trial={checkpoint['first_trial']}.")
+    if checkpoint['criteria'] != list(criteria):
+        raise ValueError(f"Checkpoint {path} was written for the criteria {checkpoint['criteria']}.")
+    return checkpoint
+
+
+# =============================================================================
+# Result Store
+# =============================================================================
+
+def _card_identity(card):
+    return card['name'], card.get('set_code', ''), card.get('card_number', '')
+
+
+def canonical_deck(full_deck):
+    """
+    The deck in the order stored results are simulated in: sorted by (name, set, number).
+    A trial seed only reproduces its game with the same card order, so stored example seeds
+    must be replayed with this order too, whatever order the decklist was written in.
+    """
+    return sorted(full_deck, key=_card_identity)
+
+
+def deck_fingerprint(full_deck, max_turns, simulator_version, ruleset='default'):
+    """
+    Canonical key for a deck analysis: the sorted (name, set, number, count) tuples of the
+    parsed deck plus everything else that changes the outcome of a simulation. The key is
+    order-independent; the stored trials are played with canonical_deck(full_deck).
+    """
+    cards = Counter(map(_card_identity, full_deck))
+    canonical = {
+        'cards': sorted([name, set_code, number, count] for (name, set_code, number), count in cards.items()),
+        'deck_order': 'canonical',
+        'simulator_version': simulator_version,
+        'max_turns': max_turns,
+        'ruleset': ruleset,
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    """
+    SQLite-backed store of aggregate SimulationResults keyed by deck fingerprint.
+
+    Lookups go through the primary key. add() merges new trials into the stored result inside
+    a write transaction, so several processes can extend the same entry concurrently. The
+    least recently used entries are evicted once the store holds more than `max_entries`.
+    Every entry keeps a reservoir of at least `max_examples` bricked-game examples, whatever
+    reservoir size the runs that wrote it used (batch runs keep none).
+    """
+
+    def __init__(self, path="results.db", max_entries=5000, max_examples=10):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_examples = max_examples
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " fingerprint TEXT PRIMARY KEY,"
+            " trials INTEGER NOT NULL,"
+            " state TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+
+    def get(self, fingerprint):
+        """Returns the stored SimulationResult for `fingerprint`, or None."""
+        row = self.conn.execute("SELECT state FROM results WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        self.conn.execute("UPDATE results SET last_used = ? WHERE fingerprint = ?", (time.time(), fingerprint))
+        return SimulationResult.from_state(json.loads(row[0]))
+
+    def add(self, fingerprint, result):
+        """Merges `result` into the stored entry (the trials must be new ones) and returns the merged result."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT state FROM results WHERE fingerprint = ?", (fingerprint,)).fetchone()
+            merged = SimulationResult.from_state(json.loads(row[0])) if row else SimulationResult(
+                result.max_turns, max_examples=self.max_examples)
+            merged.max_examples = max(merged.max_examples, self.max_examples, result.max_examples)
+            merged.merge(result)
+            state = merged.get_state()
+            del state['rng_state']
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (fingerprint, trials, state, last_used) VALUES (?, ?, ?, ?)",
+                (fingerprint, merged.trials, json.dumps(state, separators=(',', ':')), time.time())
+            )
+            self._evict()
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return merged
+
+    def _evict(self):
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM results WHERE fingerprint IN "
+                "(SELECT fingerprint FROM results ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,90 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+from tcg_utils import *
+
+# =============================================================================
+# Parameter Sweeps
+# =============================================================================
+
+def _simulate_chunk(full_deck, main_attackers, max_turns, seed, first_trial, trials):
+    """Worker: simulates one contiguous block of trial indices of a deck's run."""
+    return simulate_brick_rate_with_examples(
+        full_deck, main_attackers, trials=trials, show_examples=0, maxturns=max_turns,
+        seed=seed, first_trial=first_trial
+    )
+
+
+def _chunk_bounds(budgets, chunk_size):
+    """Splits [0, max budget) into chunks that never straddle a trial budget."""
+    top = max(budgets)
+    points = set(budgets)
+    points.update(range(chunk_size, top, chunk_size))
+    ends = sorted(points)
+    return list(zip([0] + ends[:-1], ends))
+
+
+def _grid_rows(deck_name, result, trials, max_turns_grid, required_grid, total_attackers):
+    """Evaluates every (max_turns, required_in_play) cell against one cumulative result."""
+    rows = []
+    for max_turns in max_turns_grid:
+        counts = result.attackers_by_turn[max_turns - 1]
+        for required in required_grid:
+            required_n = required_attackers_in_play(total_attackers) if required == 'default' else int(required)
+            bricks = sum(counts[:required_n])
+            low, high = wilson_interval(bricks, trials)
+            rows.append({
+                'deck': deck_name,
+                'max_turns': max_turns,
+                'trials': trials,
+                'required_in_play': required,
+                'required_n': required_n,
+                'bricks': bricks,
+                'brick_rate': bricks / trials,
+                'ci_low': low,
+                'ci_high': high,
+            })
+    return rows
+
+
+def sweep(decks, max_turns=(4, 5, 6, 7, 8, 9, 10), trials=(1000,), required_in_play=('default',),
+          seed=None, workers=None, chunk_size=2000):
+    """
+    Brick rates for every deck over the max_turns x trials x required_in_play grid.
+
+    `decks` maps a deck name to a decklist text (or an already parsed deck). Each deck is simulated
+    once, to the largest max_turns and the largest trial budget, and every grid cell is evaluated
+    against those same games: a game's board after turn T is the same whatever the turn limit, and a
+    smaller budget is a prefix of the larger run. The work is split into chunks of trial indices and
+    scheduled on a process pool. Returns a tidy DataFrame with one row per deck and grid cell.
+    """
+    if not ALL_CARD_DATA:
+        load_card_data()
+    max_turns_grid = sorted(set(max_turns))
+    budgets = sorted(set(trials))
+    horizon = max_turns_grid[-1]
+    seed_rng = random.Random(seed)
+
+    jobs = {}
+    for name, deck in decks.items():
+        parsed_deck = parse_decklist(deck) if isinstance(deck, str) else deck
+        main_attackers, _ = get_main_attackers_and_evolution_methods(parsed_deck)
+        total_attackers = len(set(c['name'] for c in parsed_deck if is_main_attacker(c, main_attackers)))
+        jobs[name] = (parsed_deck, main_attackers, total_attackers, seed_rng.randrange(2 ** 32))
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=load_card_data, initargs=(share_card_data(),)) as pool:
+        futures = {}
+        for name, (parsed_deck, main_attackers, _, deck_seed) in jobs.items():
+            futures[name] = [
+                (end, pool.submit(_simulate_chunk, parsed_deck, main_attackers, horizon, deck_seed, start, end - start))
+                for start, end in _chunk_bounds(budgets, chunk_size)
+            ]
+        for name, chunks in futures.items():
+            total_attackers = jobs[name][2]
+            cumulative = SimulationResult(horizon, max_examples=0)
+            for end, future in chunks:
+                cumulative.merge(future.result())
+                if end in budgets:
+                    rows.extend(_grid_rows(name, cumulative, end, max_turns_grid, required_in_play, total_attackers))
+    import pandas as pd  # only for the returned DataFrame; workers never import it
+    return pd.DataFrame(rows)
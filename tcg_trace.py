@@ -0,0 +1,253 @@
+from array import array
+import numpy as np
+from tcg_criteria import BoardSnapshot, DeckContext, DEFAULT_BRICK_CRITERION
+
+# =============================================================================
+# Game Trace Format
+# =============================================================================
+
+# Every event is one fixed-width record of int16 fields. CARD is the card's index in the
+# parsed deck (so identical copies stay distinct), or -1 for events without a card.
+# SRC/DST are zones; a card moves from SRC to DST, and SRC == DST means it only took part.
+TURN, ACTION, CARD, SRC, DST = range(5)
+RECORD_SIZE = 5
+
+# Zones
+DECK, HAND, ACTIVE, BENCH, DISCARD, PENDING, UNDER, NO_ZONE = range(8)
+ZONE_NAMES = ['deck', 'hand', 'active', 'bench', 'discard', 'pending', 'under', '-']
+
+# Action codes
+(GAME_START, OPEN, PLACE, ADD_PENDING, TURN_START, DRAW, ONGOING_DRAW, ONGOING_NO_DRAW,
+ RESEARCH, IONO, IONO_RETURN, SUPPORTER, SUPPORTER_DRAW, POKEBALL, POKEBALL_SEARCH, POKEBALL_HAND_FULL,
+ POKEBALL_NO_BASIC, RARE_CANDY, EVOLVE_TARGET, EVOLVE, CANDY_EVOLVE, BLOCKED, BLOCKED_CANDY, BLOCKED_FIRST,
+ BLOCKED_EVOLVE, ABILITY_DRAW, ABILITY_END, SEARCH, SEARCH_HAND_FULL, SEARCH_NO_DRAW, EVOLVE_END,
+ SWITCH, SWITCH_OUT, ACTIONS_DONE, BEAST_DRAW, FINAL, REMAINING) = range(37)
+
+ACTION_NAMES = [
+    'game_start', 'open', 'place', 'add_pending', 'turn_start', 'draw', 'ongoing_draw', 'ongoing_no_draw',
+    'research', 'iono', 'iono_return', 'supporter', 'supporter_draw', 'pokeball', 'pokeball_search',
+    'pokeball_hand_full', 'pokeball_no_basic', 'rare_candy', 'evolve_target', 'evolve', 'candy_evolve',
+    'blocked', 'blocked_candy', 'blocked_first', 'blocked_evolve', 'ability_draw', 'ability_end', 'search',
+    'search_hand_full', 'search_no_draw', 'evolve_end', 'switch', 'switch_out', 'actions_done', 'beast_draw',
+    'final', 'remaining',
+]
+
+
+class GameTrace:
+    """
+    Event trace of one game, written into a preallocated int16 buffer (grown if a game runs long).
+    Pass one to simulate_one_trial_with_logging as `trace`; it is reset at the start of every trial,
+    so the same buffer can be reused across trials. records() is a zero-copy NumPy view.
+    """
+
+    def __init__(self, full_deck, capacity=256):
+        self.full_deck = full_deck
+        self.card_ids = {id(card): i for i, card in enumerate(full_deck)}
+        self.buffer = array('h', bytes(2 * RECORD_SIZE * capacity))
+        self.length = 0
+        self.turn = 0
+
+    def reset(self):
+        self.length = 0
+        self.turn = 0
+
+    def record(self, action, card=None, src=NO_ZONE, dst=NO_ZONE):
+        i = self.length * RECORD_SIZE
+        buffer = self.buffer
+        if i == len(buffer):
+            buffer.extend(array('h', bytes(2 * len(buffer))))
+        buffer[i] = self.turn
+        buffer[i + 1] = action
+        buffer[i + 2] = -1 if card is None else self.card_ids[id(card)]
+        buffer[i + 3] = src
+        buffer[i + 4] = dst
+        self.length += 1
+
+    def record_all(self, action, cards, src, dst):
+        for card in cards:
+            self.record(action, card, src, dst)
+
+    def rollback(self, length):
+        """Drops the records written after `length` (events of an attempt that did nothing)."""
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def records(self):
+        """The trace as an (events, 5) int16 array; columns are TURN, ACTION, CARD, SRC, DST."""
+        return np.frombuffer(self.buffer, dtype=np.int16).reshape(-1, RECORD_SIZE)[:self.length]
+
+    def copy(self):
+        """A trimmed copy, for keeping a trace while the original buffer is reused."""
+        trace = GameTrace.__new__(GameTrace)
+        trace.full_deck = self.full_deck
+        trace.card_ids = self.card_ids
+        trace.buffer = self.buffer[:self.length * RECORD_SIZE]
+        trace.length = self.length
+        trace.turn = self.turn
+        return trace
+
+
+def stack_traces(traces):
+    """
+    Concatenates many traces into one (events, 6) int16 array whose first column is the game index,
+    e.g. `events[events[:, 1 + ACTION] == EVOLVE]` selects every evolution of every game.
+    """
+    parts = []
+    for game, trace in enumerate(traces):
+        records = trace.records()
+        parts.append(np.column_stack([np.full(len(records), game, dtype=np.int16), records]))
+    if not parts:
+        return np.empty((0, RECORD_SIZE + 1), dtype=np.int16)
+    return np.concatenate(parts)
+
+
+# =============================================================================
+# Text Rendering
+# =============================================================================
+
+def _names(cards, names):
+    return [names[c] for c in cards]
+
+
+def render_trace(trace, precomputed_attackers):
+    """Rebuilds the board from the events and returns the same log lines as log_details=True."""
+    full_deck = trace.full_deck
+    names = [c['name'] for c in full_deck]
+    records = [tuple(trace.buffer[i:i + RECORD_SIZE]) for i in range(0, trace.length * RECORD_SIZE, RECORD_SIZE)]
+    zones = {HAND: [], ACTIVE: [], BENCH: [], PENDING: []}
+    hand, active, bench = zones[HAND], zones[ACTIVE], zones[BENCH]
+    log = []
+    evolution_msgs = []
+    ability_draws = 0
+    target = location = None
+
+    def move(card, src, dst):
+        if src == dst:
+            return
+        if src in zones:
+            zones[src].remove(card)
+        if dst in zones:
+            zones[dst].append(card)
+
+    def group(i, action):
+        """Applies and returns the cards of consecutive `action` records from index i."""
+        cards = []
+        while i < len(records) and records[i][ACTION] == action:
+            _, _, card, src, dst = records[i]
+            move(card, src, dst)
+            cards.append(card)
+            i += 1
+        return cards, i
+
+    i = 0
+    while i < len(records):
+        turn, action, card, src, dst = records[i]
+        i += 1
+        move(card, src, dst)
+        name = names[card] if card >= 0 else None
+        if action == GAME_START:
+            log.append("=== GAME START ===")
+            log.append(f"Opening hand: {_names(hand, names)}")
+        elif action == PLACE:
+            log.append(f"Placed {name} in {ZONE_NAMES[dst]}")
+        elif action == ADD_PENDING:
+            cards, i = group(i, ADD_PENDING)
+            log.append(f"Added end-of-turn cards: {[name] + _names(cards, names)}")
+            log.append(f"Hand after adding end-of-turn cards: {_names(hand, names)}")
+        elif action == TURN_START:
+            log.append(f"\n--- TURN {turn} ---")
+            log.append(f"Hand: {_names(hand, names)}")
+            log.append(f"Active: {_names(active, names)}")
+            log.append(f"Bench: {_names(bench, names)}")
+        elif action == DRAW:
+            log.append(f"Drew card: {name}")
+        elif action == ONGOING_DRAW:
+            log.append(f"Shiinotic ability: drew {name} from deck and shuffled deck.")
+        elif action == ONGOING_NO_DRAW:
+            log.append("Shiinotic ability: shuffled deck (no card drawn).")
+        elif action == RESEARCH:
+            cards, i = group(i, SUPPORTER_DRAW)
+            log.append(f"Played supporter: Professor's Research (drew {len(cards)} cards: {', '.join(_names(cards, names))})")
+        elif action == IONO:
+            returned, i = group(i, IONO_RETURN)
+            cards, i = group(i, SUPPORTER_DRAW)
+            log.append(f"Played supporter: Iono (shuffled {len(returned)} cards back, drew {len(cards)}: {', '.join(_names(cards, names))})")
+        elif action == SUPPORTER:
+            log.append(f"Played supporter: {name}")
+        elif action == POKEBALL_SEARCH:
+            log.append(f"Played Poké Ball: {name}")
+        elif action == POKEBALL_HAND_FULL:
+            log.append("Played Poké Ball: hand full")
+        elif action == POKEBALL_NO_BASIC:
+            log.append("Played Poké Ball: no basics found")
+        elif action == EVOLVE_TARGET:
+            target = card
+            ability_draws = 0
+        elif action in (EVOLVE, CANDY_EVOLVE):
+            candy = " with Rare Candy" if action == CANDY_EVOLVE else ""
+            evolution_msgs.append(f"{names[target]} -> {name}{candy} in {ZONE_NAMES[dst]}")
+        elif action == BLOCKED:
+            target, location = card, ZONE_NAMES[src]
+        elif action in (BLOCKED_CANDY, BLOCKED_FIRST, BLOCKED_EVOLVE):
+            with_card = {BLOCKED_CANDY: "with Rare Candy", BLOCKED_FIRST: f"to {name.capitalize()}",
+                         BLOCKED_EVOLVE: f"to {name}"}[action]
+            evolution_msgs.append(f"Attempted to evolve {names[target]} {with_card} in {location} "
+                                  f"but failed (just placed or already evolved this turn)")
+        elif action == ABILITY_DRAW:
+            ability_draws += 1
+        elif action == ABILITY_END:
+            evolution_msgs.append(f"{name.capitalize()} drew {ability_draws} cards")
+            evolution_msgs.append(f"Hand after drawing:[{', '.join(_names(hand, names))}]")
+        elif action == SEARCH:
+            evolution_msgs.append(f"Shiinotic ability: drew {name} from deck on evolution")
+            evolution_msgs.append(f"Shiinotic ability: drew {name} from deck and shuffled deck.")
+        elif action == SEARCH_HAND_FULL:
+            evolution_msgs.append("Shiinotic ability: hand full, could not draw Pokémon card on evolution")
+        elif action == SEARCH_NO_DRAW:
+            evolution_msgs.append("Shiinotic ability: shuffled deck (no card drawn).")
+        elif action == EVOLVE_END:
+            log.append(f"Evolution: {evolution_msgs}")
+            evolution_msgs = []
+        elif action == SWITCH:
+            switch_msg = f"switched {name} to active"
+            if i < len(records) and records[i][ACTION] == SWITCH_OUT:
+                moved, i = group(i, SWITCH_OUT)
+                switch_msg += f" (moved {names[moved[0]]} to bench)"
+            log.append(f"Switch: {switch_msg}")
+        elif action == ACTIONS_DONE:
+            evos_in_hand = [names[c] for c in hand if full_deck[c].get('stage', '') in ('stage1', 'stage2')]
+            if turn < 2 and evos_in_hand:
+                log.append(f"Evolution cards in hand (can't use until turn 2): {evos_in_hand}")
+        elif action == BEAST_DRAW:
+            log.append(f"Legendary beast end-turn draw: {name} (available next turn)")
+        elif action == FINAL:
+            remaining, i = group(i, REMAINING)
+            log.extend(_final_state_lines(full_deck, names, precomputed_attackers, turn, active, bench, hand, remaining))
+    return log
+
+
+def _final_state_lines(full_deck, names, precomputed_attackers, turn, active, bench, hand, remaining):
+    context = DeckContext(full_deck, precomputed_attackers)
+    board = BoardSnapshot(turn, tuple(full_deck[c] for c in active), tuple(full_deck[c] for c in bench),
+                          tuple(full_deck[c] for c in hand))
+    is_brick = DEFAULT_BRICK_CRITERION.is_brick([board], context)
+    developed = [names[c] for c in active + bench if names[c] in context.main_attackers]
+    lines = [
+        f"\n--- FINAL STATE ---",
+        f"Active: {_names(active, names)}",
+        f"Bench: {_names(bench, names)}",
+        f"Hand: {_names(hand, names)}",
+        f"Main attackers in play: {developed}",
+        f"Total main attackers in deck: {context.total_main_attackers}",
+        f"RESULT: {'BRICK' if is_brick else 'OK'}",
+    ]
+    if is_brick:
+        lines.append("  - Bricking condition met:")
+        if context.total_main_attackers > 3:
+            lines.append(f"    - Less than 3 attackers ({len(developed)}) developed when deck has >3 attackers.")
+        else:
+            lines.append(f"    - Not all attackers ({len(developed)} of {context.total_main_attackers}) developed.")
+    lines.append(f"Remaining deck: {_names(remaining, names)}")
+    return lines
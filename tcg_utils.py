@@ -1,50 +1,54 @@
+import os
 import random
 import csv
 from collections import Counter
 import re
-import pandas as pd
+from tcg_stats import CardStatsCollector, CollectorGroup, SimulationResult, wilson_interval
+from tcg_criteria import (BoardSnapshot, DeckContext, DEFAULT_BRICK_CRITERION, required_attackers_in_play,
+                          resolve_criteria)
+from tcg_effects import CARD_EFFECTS, DeckEffects, card_effects
+from tcg_carddb import CARD_TYPE_MAPPING, IMAGE_SUFFIX, CardStore, read_card_db, read_set_export
+from tcg_trace import (GameTrace, render_trace, DECK, HAND, ACTIVE, BENCH, DISCARD, PENDING, UNDER, GAME_START, OPEN,
+                       PLACE, ADD_PENDING, TURN_START, DRAW, ONGOING_DRAW, ONGOING_NO_DRAW, RESEARCH, IONO, IONO_RETURN,
+                       SUPPORTER, SUPPORTER_DRAW, POKEBALL, POKEBALL_SEARCH, POKEBALL_HAND_FULL, POKEBALL_NO_BASIC,
+                       RARE_CANDY, EVOLVE_TARGET, EVOLVE, CANDY_EVOLVE, BLOCKED, BLOCKED_CANDY, BLOCKED_FIRST,
+                       BLOCKED_EVOLVE, ABILITY_DRAW, ABILITY_END, SEARCH, SEARCH_HAND_FULL, SEARCH_NO_DRAW, EVOLVE_END,
+                       SWITCH, SWITCH_OUT, ACTIONS_DONE, BEAST_DRAW, FINAL, REMAINING)
+from tcg_archive import GameArchive, GameArchiveWriter
+from tcg_evolution import EvolutionGraph, evolution_sources
+from tcg_store import ResultStore, canonical_deck, deck_fingerprint, load_checkpoint, save_checkpoint
 
 # =============================================================================
 # Card Data and Deck Parsing
 # =============================================================================
 
-# Global dictionary to store card data from the CSV
-ALL_CARD_DATA = {}
-
-# Map CSV types to internal types
-CARD_TYPE_MAPPING = {
-    'Metal': 'pokemon',
-    'Dragon': 'pokemon',
-    'Fire': 'pokemon',
-    'Trainer': 'pokemon',
-    'Lightning': 'pokemon',
-    'Darkness': 'pokemon',
-    'Water': 'pokemon',
-    'Grass': 'pokemon',
-    'Psychic': 'pokemon',
-    'Colorless': 'pokemon',
-    'Fighting': 'pokemon'
-}
+# Global card table: (card_name, set_code, card_number) -> card fields, stored in columns
+ALL_CARD_DATA = CardStore()
+
+# Bump whenever a change to the simulation rules can change results, so stored results are not reused
+SIMULATOR_VERSION = 4
 
-def load_card_data(filename="ALL_SETS.csv"):
-    """Loads card data from the provided CSV file into a global dictionary."""
-    global ALL_CARD_DATA
+# Card database written by tcg_carddb.build_card_db(); load_card_data() prefers it to the raw CSV
+CARD_DB_PATH = "cards.json"
+
+def load_card_data(filename=None):
+    """
+    Loads card data into the global card store, from a card database built by tcg_carddb (.json),
+    a card image written by share_card_data() (.cards, attached without parsing) or a CSV export.
+    By default the built database is used if there is one, else ALL_SETS.csv.
+    Parsed with the csv module, so importing tcg_utils (e.g. in worker processes) does not pull in pandas.
+    """
+    if filename is None:
+        filename = CARD_DB_PATH if os.path.exists(CARD_DB_PATH) else "ALL_SETS.csv"
     try:
-        df = pd.read_csv(filename)
-        for _, row in df.iterrows():
-            card_key = (
-                str(row['card_name']).lower().strip(),
-                str(row.get('set_code','')).lower().strip(),
-                str(row['card_number']).strip()
-            )
-            ALL_CARD_DATA[card_key] = {
-                'card_type': CARD_TYPE_MAPPING.get(str(row['card_type']).strip(), str(row['card_type']).lower().strip()),
-                'pokemon_stage': str(row['pokemon_stage']).strip().lower(),
-                'ex': str(row['ex']).strip().lower() == 'yes',
-                'card_name': str(row['card_name']).strip().lower(),
-                'evolve_from': str(row.get('evolves_from', '')).strip().lower() if pd.notna(row.get('evolves_from', '')) else '',
-                'rarity': str(row.get('rarity', '')).strip().lower()
-            }
+        if filename.endswith(IMAGE_SUFFIX):
+            ALL_CARD_DATA.attach(filename)
+            return True
+        if filename.endswith('.json'):
+            records = read_card_db(filename)
+        else:
+            records = read_set_export(filename)
+        ALL_CARD_DATA.extend(records)
     except FileNotFoundError:
         print(f"Error: The file {filename} was not found.")
         return False
@@ -53,6 +57,17 @@ def load_card_data(filename="ALL_SETS.csv"):
         return False
     return True
 
+def share_card_data():
+    """
+    Writes the loaded card data (loading it first if needed) to a memory-mapped card image and returns
+    its path. Pass it to worker processes, e.g. ProcessPoolExecutor(initializer=load_card_data,
+    initargs=(share_card_data(),)): every worker then maps the same pages instead of parsing the
+    card data and building its own tables.
+    """
+    if not ALL_CARD_DATA:
+        load_card_data()
+    return ALL_CARD_DATA.save_image()
+
 def get_card_info(card_string: str):
     """
     Parses a single card string and returns its properties from the dataset.
@@ -132,10 +147,14 @@ def parse_decklist(decklist_text: str):
             parsed_deck.append({
                 'name': card_info.get('card_name', ''),
                 'type': card_info['card_type'],
+                'category': card_info['category'],
                 'stage': card_info['pokemon_stage'],
                 'ex': card_info['ex'],
                 'evolve_from': card_info.get('evolve_from', ''),
-                'rarity': card_info.get('rarity', '')
+                'rarity': card_info.get('rarity', ''),
+                'set_code': card_info.get('set_code', ''),
+                'card_number': card_info.get('card_number', ''),
+                'effects': card_info.get('effects', ())
             })
     if invalid_cards:
         error_messages.append(f"Error: The following cards were not found in the database: {invalid_cards}")
@@ -172,20 +191,7 @@ def is_stage2(card):
     return card.get('stage','').strip().lower() == 'stage2'
 
 def is_supporter(card):
-    supporter_names = ["erika","misty","blain","koga","giovanni","brock","sabrina","lt. surge",
-                       "budding expeditioner","blue","leaf",
-                       "cyrus","team galactic grunt","cynthia","volkner","dawn","mars",
-                       "irida","celestic town elder","barry","adaman",
-                       "iono","pokemon center lady","red","team rocket grunt",
-                       "acerola","illima","kiawe","guzma","lana","sophocles","mallow","lillie",
-                       "gladion","looker","lusamine",
-                       "hau","penny",
-                       "will","lyra","silver","fisher","jasmine","hiker",
-                       "whitney","travelling merchant","morty",
-                       "professor's research"
-                       ]
-    return (card.get('type','').strip().lower() == 'trainer' and
-            any(s in card.get('name','').lower() for s in supporter_names))
+    return card.get('category') == 'supporter'
 
 def is_professors_research(card):
     return 'professor\'s research' in card.get('name','').lower()
@@ -221,7 +227,7 @@ def draw_from_deck(deck, hand, n):
             break
     return drawn
 
-def place_basic_pokemon(hand, active_pokemon, bench, max_bench=3):
+def place_basic_pokemon(hand, active_pokemon, bench, max_bench=3, trace=None):
     """Places basic Pokemon from hand onto the board. Sets 'just_placed' flag for new placements."""
     placed = []
     # Place one basic in active if empty
@@ -232,6 +238,8 @@ def place_basic_pokemon(hand, active_pokemon, bench, max_bench=3):
                 card['just_placed'] = True
                 active_pokemon.append(card)
                 placed.append(("active", card['name']))
+                if trace is not None:
+                    trace.record(PLACE, card, HAND, ACTIVE)
                 break
     
     # Place remaining basics on bench
@@ -242,13 +250,18 @@ def place_basic_pokemon(hand, active_pokemon, bench, max_bench=3):
             card['just_placed'] = True
             bench.append(card)
             placed.append(("bench", card['name']))
+            if trace is not None:
+                trace.record(PLACE, card, HAND, BENCH)
         else:
             i += 1
     
     return placed
 
-def try_play_supporter(hand, deck, supporter_used):
-    """Attempts to play a supporter card, prioritizing Professor's Research."""
+def try_play_supporter(hand, deck, supporter_used, rng=random, effects=None, trace=None):
+    """
+    Attempts to play a supporter card, prioritizing Professor's Research, then supporters with
+    an effect bound in `effects` (a DeckEffects; default: every known effect).
+    """
     if supporter_used[0]:
         return False, None
     
@@ -261,44 +274,67 @@ def try_play_supporter(hand, deck, supporter_used):
             cards_drawn = draw_from_deck(deck, hand, 2)
             drawn_cards = hand[hand_size_before:hand_size_before + cards_drawn]
             drawn_names = [c['name'] for c in drawn_cards]
+            if trace is not None:
+                trace.record(RESEARCH, card, HAND, DISCARD)
+                trace.record_all(SUPPORTER_DRAW, drawn_cards, DECK, HAND)
             return True, f"Professor's Research (drew {cards_drawn} cards: {', '.join(drawn_names)})"
     
-    # Priority 2: Iono
-    for i, card in enumerate(hand):
-        if is_iono(card):
-            hand.pop(i)
-            supporter_used[0] = True
-            # Shuffle hand back into deck and draw 5
-            hand_size = len(hand)
-            deck.extend(hand)
-            random.shuffle(deck)
-            hand.clear()
-            cards_drawn = draw_from_deck(deck, hand, 5)
-            drawn_names = [c['name'] for c in hand[:cards_drawn]]
-            return True, f"Iono (shuffled {hand_size} cards back, drew {cards_drawn}: {', '.join(drawn_names)})"
+    # Priority 2: Supporters with their own effect (Iono)
+    supporters = (effects or DEFAULT_EFFECTS).supporters
+    if supporters:
+        for i, card in enumerate(hand):
+            if card['name'] in supporters:
+                hand.pop(i)
+                supporter_used[0] = True
+                return True, supporters[card['name']](card, hand, deck, rng, trace)
     
     # Priority 3: Any other supporter
     for i, card in enumerate(hand):
         if is_supporter(card):
             hand.pop(i)
             supporter_used[0] = True
+            if trace is not None:
+                trace.record(SUPPORTER, card, HAND, DISCARD)
             return True, card['name']
     
     return False, None
 
-def try_play_pokeball(hand, deck):
+def play_iono(iono, hand, deck, rng=random, trace=None):
+    """Iono: shuffle the hand back into the deck and draw 5."""
+    hand_size = len(hand)
+    if trace is not None:
+        trace.record(IONO, iono, HAND, DISCARD)
+        trace.record_all(IONO_RETURN, hand, HAND, DECK)
+    deck.extend(hand)
+    rng.shuffle(deck)
+    hand.clear()
+    cards_drawn = draw_from_deck(deck, hand, 5)
+    drawn_names = [c['name'] for c in hand[:cards_drawn]]
+    if trace is not None:
+        trace.record_all(SUPPORTER_DRAW, hand[:cards_drawn], DECK, HAND)
+    return f"Iono (shuffled {hand_size} cards back, drew {cards_drawn}: {', '.join(drawn_names)})"
+
+def try_play_pokeball(hand, deck, trace=None):
     """Attempts to play Poké Ball to search for a basic Pokemon."""
     for i, card in enumerate(hand):
         if is_pokeball(card):
             hand.pop(i)
+            if trace is not None:
+                trace.record(POKEBALL, card, HAND, DISCARD)
             # Search for basic in deck
             for j, deck_card in enumerate(deck):
                 if is_basic(deck_card):
                     if len(hand) < 10:
                         found_card = deck.pop(j)
                         hand.append(found_card)
+                        if trace is not None:
+                            trace.record(POKEBALL_SEARCH, found_card, DECK, HAND)
                         return True, found_card['name']
+                    if trace is not None:
+                        trace.record(POKEBALL_HAND_FULL)
                     return True, "hand full"
+            if trace is not None:
+                trace.record(POKEBALL_NO_BASIC)
             return True, "no basics found"
     return False, None
 
@@ -308,16 +344,13 @@ def can_evolve(evo_card, pokemon_in_play):
     if not evolve_from:
         return False
     
-    # Special case for Eevee evolutions
-    if evolve_from == 'eevee':
-        valid_names = ['eevee', 'eevee ex']
-    else:
-        valid_names = [evolve_from]
-    
+    # Eevee evolutions also evolve from Eevee ex
+    valid_names = evolution_sources(evolve_from)
     return any(p.get('name', '') in valid_names for p in pokemon_in_play)
 
-def try_evolve(hand, active_pokemon, bench, deck, supporter_used, turn, evolved_this_turn):
-    """Attempts to evolve Pokemon on the board, prioritizing Rare Candy then Sylveon ex. Prevents evolving the same board space twice in one turn using evolved_this_turn set."""
+def try_evolve(hand, active_pokemon, bench, deck, supporter_used, turn, evolved_this_turn, rng=random, effects=None,
+               trace=None):
+    """Attempts to evolve Pokemon on the board, prioritizing Rare Candy then 'evolve_first' cards (Sylveon ex). Prevents evolving the same board space twice in one turn using evolved_this_turn set."""
     # Evolution restriction: can only evolve after turn 2
     if turn < 2:
         return False, "Cannot evolve on turn 1"
@@ -325,6 +358,7 @@ def try_evolve(hand, active_pokemon, bench, deck, supporter_used, turn, evolved_
     evolved = False
     pokemon_in_play = active_pokemon + bench
     evolution_msgs = []
+    trace_length = len(trace) if trace is not None else 0
     # evolved_this_turn is now always passed in from the simulation loop
 
     # Do NOT clear 'just_placed' flag here; it is handled once per turn in the simulation loop
@@ -345,6 +379,11 @@ def try_evolve(hand, active_pokemon, bench, deck, supporter_used, turn, evolved_
                     hand.remove(stage2_card)
 
                     location = "active" if target in active_pokemon else "bench"
+                    if trace is not None:
+                        zone = ACTIVE if target in active_pokemon else BENCH
+                        trace.record(RARE_CANDY, rare_candy, HAND, DISCARD)
+                        trace.record(EVOLVE_TARGET, target, zone, UNDER)
+                        trace.record(CANDY_EVOLVE, stage2_card, HAND, zone)
                     if target in active_pokemon:
                         active_pokemon.remove(target)
                         active_pokemon.append(stage2_card)
@@ -360,51 +399,40 @@ def try_evolve(hand, active_pokemon, bench, deck, supporter_used, turn, evolved_
                     break
                 else:
                     location = "active" if target in active_pokemon else "bench"
+                    if trace is not None:
+                        zone = ACTIVE if target in active_pokemon else BENCH
+                        trace.record(BLOCKED, target, zone, zone)
+                        trace.record(BLOCKED_CANDY, rare_candy_cards[0], HAND, HAND)
                     evolution_msgs.append(f"Attempted to evolve {target['name']} with Rare Candy in {location} but failed (just placed or already evolved this turn)")
 
-    # Priority 2: Sylveon ex evolution
-    sylveon_ex_card = next((c for c in hand if c['name'] == 'sylveon ex'), None)
-    if sylveon_ex_card:
-        eevee_target = next((p for p in pokemon_in_play if (p['name'] == 'eevee' or p['name'] == 'eevee ex')), None)
-        if eevee_target:
-            if not eevee_target.get('just_placed', False) and id(eevee_target) not in evolved_this_turn:
-                hand.remove(sylveon_ex_card)
-                location = "active" if eevee_target in active_pokemon else "bench"
-                if eevee_target in active_pokemon:
-                    active_pokemon.remove(eevee_target)
-                    active_pokemon.append(sylveon_ex_card)
-                    evolved_this_turn.add(id(active_pokemon[-1]))
-                else:
-                    bench.remove(eevee_target)
-                    bench.append(sylveon_ex_card)
-                    evolved_this_turn.add(id(bench[-1]))
-
-                evolution_msgs.append(f"{eevee_target['name']} -> {sylveon_ex_card['name']} in {location}")
-                cards_drawn = draw_from_deck(deck, hand, 2)
-                evolution_msgs.append(f"Sylveon ex drew {cards_drawn} cards")
-                evolution_msgs.append(f"Hand after drawing:[{', '.join(c['name'] for c in hand)}]")
-                evolved = True
-                pokemon_in_play = active_pokemon + bench
-            else:
-                location = "active" if eevee_target in active_pokemon else "bench"
-                evolution_msgs.append(f"Attempted to evolve {eevee_target['name']} to Sylveon ex in {location} but failed (just placed or already evolved this turn)")
+    # Priority 2: Cards that evolve before the regular evolutions (Sylveon ex)
+    effects = effects or DEFAULT_EFFECTS
+    for name, evolve_first in effects.evolve_first.items():
+        evo_card = next((c for c in hand if c['name'] == name), None)
+        if evo_card and evolve_first(evo_card, hand, active_pokemon, bench, deck, evolved_this_turn, evolution_msgs, trace):
+            evolved = True
+            pokemon_in_play = active_pokemon + bench
 
     # Priority 3: Any other regular evolutions
     while True:
         found_evolution = False
         for i, card in enumerate(hand):
-            # Skip Sylveon ex since it was handled
-            if card['name'] == 'sylveon ex':
+            # Skip cards handled by their 'evolve_first' effect
+            if card['name'] in effects.evolve_first:
                 continue
 
             if (is_stage1(card) or is_stage2(card)) and can_evolve(card, pokemon_in_play):
                 evolve_from = card.get('evolve_from', '')
-                valid_names = ['eevee', 'eevee ex'] if evolve_from == 'eevee' else [evolve_from]
+                valid_names = evolution_sources(evolve_from)
                 for target in pokemon_in_play:
                     # Prevent evolving if just placed or already evolved this turn
                     if target.get('name', '') in valid_names and not target.get('just_placed', False) and id(target) not in evolved_this_turn:
                         evo_card = hand.pop(i)
                         location = "active" if target in active_pokemon else "bench"
+                        if trace is not None:
+                            zone = ACTIVE if target in active_pokemon else BENCH
+                            trace.record(EVOLVE_TARGET, target, zone, UNDER)
+                            trace.record(EVOLVE, evo_card, HAND, zone)
                         if target in active_pokemon:
                             active_pokemon.remove(target)
                             active_pokemon.append(evo_card)
@@ -418,55 +446,103 @@ def try_evolve(hand, active_pokemon, bench, deck, supporter_used, turn, evolved_
                         evolved = True
                         pokemon_in_play = active_pokemon + bench
                         found_evolution = True
-                        # Shiinotic special evolution rule
-                        if evolved and evo_card['name'] == 'shiinotic' and target['name'] == 'morelull':
-                            # Only log the card drawn and that deck was shuffled
-                            # Search deck for first true Pokémon card
-                            for j, deck_card in enumerate(deck):
-                                if deck_card.get('type', '') == 'pokemon' and deck_card.get('stage', '') in ['basic', 'stage1', 'stage2']:
-                                    if len(hand) < 10:
-                                        found_poke = deck.pop(j)
-                                        hand.append(found_poke)
-                                        evolution_msgs.append(f"Shiinotic ability: drew {found_poke['name']} from deck on evolution")
-                                        evolution_msgs.append(f"Shiinotic ability: drew {found_poke['name']} from deck and shuffled deck.")
-                                    else:
-                                        evolution_msgs.append("Shiinotic ability: hand full, could not draw Pokémon card on evolution")
-                                    break
-                            random.shuffle(deck)
-                            # Only log that deck was shuffled if no card drawn
-                            if not any([msg for msg in evolution_msgs if msg.startswith('Shiinotic ability: drew')]):
-                                evolution_msgs.append("Shiinotic ability: shuffled deck (no card drawn).")
+                        on_evolve = effects.on_evolve.get(evo_card['name'])
+                        if on_evolve:
+                            on_evolve(evo_card, target, hand, deck, evolution_msgs, rng, trace)
                         break
                     elif target.get('name', '') in valid_names:
                         location = "active" if target in active_pokemon else "bench"
+                        if trace is not None:
+                            zone = ACTIVE if target in active_pokemon else BENCH
+                            trace.record(BLOCKED, target, zone, zone)
+                            trace.record(BLOCKED_EVOLVE, card, HAND, HAND)
                         evolution_msgs.append(f"Attempted to evolve {target['name']} to {card['name']} in {location} but failed (just placed or already evolved this turn)")
                 if found_evolution:
                     break
         if not found_evolution:
             break
+    if trace is not None:
+        if evolved:
+            trace.record(EVOLVE_END)
+        else:
+            trace.rollback(trace_length)
     return evolved, evolution_msgs
 
+def sylveon_ex_evolve(sylveon_ex_card, hand, active_pokemon, bench, deck, evolved_this_turn, evolution_msgs, trace=None):
+    """Sylveon ex evolves onto the first Eevee in play and draws 2 cards. Returns True if it evolved."""
+    eevee_target = next((p for p in active_pokemon + bench if (p['name'] == 'eevee' or p['name'] == 'eevee ex')), None)
+    if not eevee_target:
+        return False
+    location = "active" if eevee_target in active_pokemon else "bench"
+    zone = ACTIVE if eevee_target in active_pokemon else BENCH
+    if eevee_target.get('just_placed', False) or id(eevee_target) in evolved_this_turn:
+        if trace is not None:
+            trace.record(BLOCKED, eevee_target, zone, zone)
+            trace.record(BLOCKED_FIRST, sylveon_ex_card, HAND, HAND)
+        evolution_msgs.append(f"Attempted to evolve {eevee_target['name']} to Sylveon ex in {location} but failed (just placed or already evolved this turn)")
+        return False
+    hand.remove(sylveon_ex_card)
+    if trace is not None:
+        trace.record(EVOLVE_TARGET, eevee_target, zone, UNDER)
+        trace.record(EVOLVE, sylveon_ex_card, HAND, zone)
+    if eevee_target in active_pokemon:
+        active_pokemon.remove(eevee_target)
+        active_pokemon.append(sylveon_ex_card)
+        evolved_this_turn.add(id(active_pokemon[-1]))
+    else:
+        bench.remove(eevee_target)
+        bench.append(sylveon_ex_card)
+        evolved_this_turn.add(id(bench[-1]))
+
+    evolution_msgs.append(f"{eevee_target['name']} -> {sylveon_ex_card['name']} in {location}")
+    cards_drawn = draw_from_deck(deck, hand, 2)
+    if trace is not None:
+        trace.record_all(ABILITY_DRAW, hand[len(hand) - cards_drawn:], DECK, HAND)
+        trace.record(ABILITY_END, sylveon_ex_card)
+    evolution_msgs.append(f"Sylveon ex drew {cards_drawn} cards")
+    evolution_msgs.append(f"Hand after drawing:[{', '.join(c['name'] for c in hand)}]")
+    return True
+
+def shiinotic_evolve_search(evo_card, target, hand, deck, evolution_msgs, rng=random, trace=None):
+    """Shiinotic evolving from Morelull puts the first Pokémon card of the deck into the hand, then the deck is shuffled."""
+    if target['name'] != 'morelull':
+        return
+    # Search deck for first true Pokémon card
+    for j, deck_card in enumerate(deck):
+        if deck_card.get('type', '') == 'pokemon' and deck_card.get('stage', '') in ['basic', 'stage1', 'stage2']:
+            if len(hand) < 10:
+                found_poke = deck.pop(j)
+                hand.append(found_poke)
+                if trace is not None:
+                    trace.record(SEARCH, found_poke, DECK, HAND)
+                evolution_msgs.append(f"Shiinotic ability: drew {found_poke['name']} from deck on evolution")
+                evolution_msgs.append(f"Shiinotic ability: drew {found_poke['name']} from deck and shuffled deck.")
+            else:
+                if trace is not None:
+                    trace.record(SEARCH_HAND_FULL)
+                evolution_msgs.append("Shiinotic ability: hand full, could not draw Pokémon card on evolution")
+            break
+    rng.shuffle(deck)
+    # Only log that deck was shuffled if no card drawn
+    if not any([msg for msg in evolution_msgs if msg.startswith('Shiinotic ability: drew')]):
+        if trace is not None:
+            trace.record(SEARCH_NO_DRAW)
+        evolution_msgs.append("Shiinotic ability: shuffled deck (no card drawn).")
+
 def get_evolves_from_chain(card_name):
     """Find the ultimate basic Pokemon for a given card name."""
-    current_name = card_name.lower().strip()
-    visited = set()
-    
-    while current_name and current_name not in visited:
-        visited.add(current_name)
-        card_info = next((info for key, info in ALL_CARD_DATA.items() if info['card_name'] == current_name), None)
-        
-        if not card_info:
-            break
-            
-        evolve_from = card_info.get('evolve_from', '').strip()
-        if not evolve_from or evolve_from == 'nan':
-            return current_name
-        
-        current_name = evolve_from.lower()
-    
-    return current_name
+    return ALL_CARD_DATA.ancestor(card_name.lower().strip())
+
+_EVOLUTION_GRAPH = None
 
-def try_switch_legendary_beast(hand, active_pokemon, bench, turn):
+def evolution_graph():
+    """The EvolutionGraph of the loaded card pool, rebuilt only when the card data changes."""
+    global _EVOLUTION_GRAPH
+    if _EVOLUTION_GRAPH is None or _EVOLUTION_GRAPH.version != ALL_CARD_DATA.version:
+        _EVOLUTION_GRAPH = EvolutionGraph(ALL_CARD_DATA)
+    return _EVOLUTION_GRAPH
+
+def try_switch_legendary_beast(hand, active_pokemon, bench, turn, trace=None):
     """Try to get a legendary beast into the active position."""
     if any(is_legendary_beast_ex(p) for p in active_pokemon):
         return False, None
@@ -481,6 +557,10 @@ def try_switch_legendary_beast(hand, active_pokemon, bench, turn):
             bench.remove(beast_on_bench)
             if current_active:
                 bench.append(current_active)
+            if trace is not None:
+                trace.record(SWITCH, beast_on_bench, BENCH, ACTIVE)
+                if current_active:
+                    trace.record(SWITCH_OUT, current_active, ACTIVE, BENCH)
             switch_msg = f"switched {beast_on_bench['name']} to active"
             if current_active:
                 switch_msg += f" (moved {current_active['name']} to bench)"
@@ -488,6 +568,30 @@ def try_switch_legendary_beast(hand, active_pokemon, bench, turn):
     
     return False, None
 
+def shiinotic_ongoing_draw(deck, hand, active_pokemon, bench, rng=random, trace=None):
+    """Each Shiinotic in play draws the first Pokémon card from the deck, then the deck is shuffled."""
+    msgs = []
+    shiinotics_in_play = [p for p in active_pokemon + bench if p.get('name', '') == 'shiinotic']
+    # Each Shiinotic draws independently
+    for shiinotic in shiinotics_in_play:
+        drew_card = False
+        for j, deck_card in enumerate(deck):
+            if deck_card.get('type', '') == 'pokemon' and deck_card.get('stage', '') in ['basic', 'stage1', 'stage2']:
+                if len(hand) < 10:
+                    found_poke = deck.pop(j)
+                    hand.append(found_poke)
+                    drew_card = True
+                    if trace is not None:
+                        trace.record(ONGOING_DRAW, found_poke, DECK, HAND)
+                    msgs.append(f"Shiinotic ability: drew {found_poke['name']} from deck and shuffled deck.")
+                break
+        rng.shuffle(deck)
+        if not drew_card:
+            if trace is not None:
+                trace.record(ONGOING_NO_DRAW)
+            msgs.append("Shiinotic ability: shuffled deck (no card drawn).")
+    return msgs
+
 def legendary_beast_end_turn_draw(deck, active_pokemon):
     """Draw 1 card if legendary beast is active.""";
     if active_pokemon and is_legendary_beast_ex(active_pokemon[0]):
@@ -495,11 +599,28 @@ def legendary_beast_end_turn_draw(deck, active_pokemon):
             return [deck.pop(0)]
     return []
 
+# Effect names used in tcg_effects.CARD_EFFECTS -> the functions implementing them
+EFFECT_HANDLERS = {
+    'iono': play_iono,
+    'sylveon_ex_evolve': sylveon_ex_evolve,
+    'shiinotic_search': shiinotic_evolve_search,
+    'shiinotic_ongoing': shiinotic_ongoing_draw,
+    'beast_switch': try_switch_legendary_beast,
+    'beast_draw': legendary_beast_end_turn_draw,
+}
+
+def compile_deck_effects(full_deck):
+    """Binds the effect handlers of the cards in `full_deck`; pass the result to the simulation as `effects`."""
+    return DeckEffects(full_deck, EFFECT_HANDLERS)
+
+# Every known effect bound, for callers that don't compile a deck (e.g. single action calls)
+DEFAULT_EFFECTS = DeckEffects([{'name': name} for name in CARD_EFFECTS], EFFECT_HANDLERS)
+
 # =============================================================================
 # Simulation
 # =============================================================================
 
-def ensure_guaranteed_basic_top5(deck):
+def ensure_guaranteed_basic_top5(deck, rng=random):
     """Ensures at least one basic Pokemon is in the top 5 cards."""
     opener = deck[:5]
     if any(is_basic(c) for c in opener):
@@ -507,17 +628,58 @@ def ensure_guaranteed_basic_top5(deck):
     
     for i in range(5, len(deck)):
         if is_basic(deck[i]):
-            j = random.randrange(5)
+            j = rng.randrange(5)
             deck[i], deck[j] = deck[j], deck[i]
             return deck
     
     return deck
 
-def simulate_one_trial_with_logging(full_deck, precomputed_attackers, max_turns=6, log_details=False):
-    """Simulate one game with detailed logging."""
-    deck = full_deck[:]
-    random.shuffle(deck)
-    deck = ensure_guaranteed_basic_top5(deck)
+# Worklist of a turn's action loop. Each action is a bit; an action that finds nothing to do (or
+# cannot do more) leaves the worklist until a change it depends on puts it back, so the loop skips
+# only calls that would change nothing and every game plays out exactly as with full passes.
+PLAY_SUPPORTER, PLACE_BASICS, PLAY_POKEBALL, EVOLVE_POKEMON = 1, 2, 4, 8
+FIRST_EFFECT_ACTION = 16     # effects.actions[i] is FIRST_EFFECT_ACTION << i
+
+# The actions each action can enable when it does something. Changes to the Pokémon in play
+# (placing, evolving, switching) also enable the deck's effect actions: a beast may switch in.
+# - a supporter drew cards (one supporter per turn)
+SUPPORTER_PLAYED = PLACE_BASICS | PLAY_POKEBALL | EVOLVE_POKEMON
+# - Poké Ball put a basic into the hand (another Poké Ball may follow)
+BASIC_SEARCHED = PLACE_BASICS | PLAY_POKEBALL
+# - basics were placed: as many as fit, and nothing can evolve onto them this turn
+POKEMON_PLACED = 0
+# - Pokémon evolved: evolve effects may draw or search cards, and the first target of Rare Candy
+#   and Sylveon ex may change
+POKEMON_EVOLVED = PLAY_SUPPORTER | PLACE_BASICS | PLAY_POKEBALL | EVOLVE_POKEMON
+# - a Pokémon was switched in: the first targets may change as well
+POKEMON_SWITCHED = EVOLVE_POKEMON
+
+def simulate_one_trial_with_logging(full_deck, precomputed_attackers, max_turns=6, log_details=False, stats=None,
+                                    attackers_by_turn=None, rng=random, snapshots=None, effects=None, trace=None,
+                                    deck_order=None, action_counts=None):
+    """
+    Simulate one game with detailed logging.
+    If `stats` (a CardStatsCollector) is given, per-card counters are recorded for this trial.
+    If `attackers_by_turn` is a list, the number of main attackers in play is appended after each turn.
+    If `snapshots` is a list, a BoardSnapshot is appended after each turn for evaluating brick criteria.
+    All shuffles use `rng`, so a trial run with random.Random(seed) can be replayed exactly.
+    `effects` is the deck's compiled DeckEffects; pass it when running many trials of one deck.
+    If `trace` is a GameTrace for `full_deck`, every event is recorded into it (see tcg_trace).
+    `deck_order` (the cards of `full_deck` in draw order, e.g. from a tcg_sampling sampler) replaces the
+    initial shuffle.
+    If `action_counts` is a Counter, the action loop counts its 'turns', 'passes' and 'attempts' in it.
+    """
+    if effects is None:
+        effects = compile_deck_effects(full_deck)
+    effect_actions = [(FIRST_EFFECT_ACTION << i, action) for i, action in enumerate(effects.actions)]
+    all_effect_actions = (FIRST_EFFECT_ACTION << len(effect_actions)) - FIRST_EFFECT_ACTION
+    all_actions = PLAY_SUPPORTER | PLACE_BASICS | PLAY_POKEBALL | EVOLVE_POKEMON | all_effect_actions
+    if deck_order is not None:
+        deck = list(deck_order)
+    else:
+        deck = full_deck[:]
+        rng.shuffle(deck)
+    deck = ensure_guaranteed_basic_top5(deck, rng)
     
     hand = deck[:5]
     deck = deck[5:]
@@ -525,24 +687,35 @@ def simulate_one_trial_with_logging(full_deck, precomputed_attackers, max_turns=
     active_pokemon = []
     bench = []
     log = []
+    if trace is not None:
+        trace.reset()
+        trace.record_all(OPEN, hand, DECK, HAND)
+        trace.record(GAME_START)
     
     if log_details:
         log.append("=== GAME START ===")
         log.append(f"Opening hand: {[c['name'] for c in hand]}")
     
     # Place initial basics
-    placed = place_basic_pokemon(hand, active_pokemon, bench)
+    placed = place_basic_pokemon(hand, active_pokemon, bench, trace=trace)
     if log_details and placed:
         for location, name in placed:
             log.append(f"Placed {name} in {location}")
     
     # Track cards for bricking analysis
     cards_seen = set(c['name'] for c in hand + active_pokemon + bench)
+    if stats is not None:
+        stats.begin_trial()
+        stats.end_turn(0, deck, bench)
     
     # Cards drawn at end of turn (can't be used until next turn)
     cards_drawn_at_end = []
     for turn in range(1, max_turns + 1):
+        if trace is not None:
+            trace.turn = turn
         if cards_drawn_at_end:
+            if trace is not None:
+                trace.record_all(ADD_PENDING, cards_drawn_at_end, PENDING, HAND)
             hand.extend(cards_drawn_at_end)
             if log_details:
                 log.append(f"Added end-of-turn cards: {[c['name'] for c in cards_drawn_at_end]}")
@@ -554,6 +727,8 @@ def simulate_one_trial_with_logging(full_deck, precomputed_attackers, max_turns=
             log.append(f"Hand: {[c['name'] for c in hand]}")
             log.append(f"Active: {[c['name'] for c in active_pokemon]}")
             log.append(f"Bench: {[c['name'] for c in bench]}")
+        if trace is not None:
+            trace.record(TURN_START)
             
         supporter_used = [False]
 
@@ -561,27 +736,17 @@ def simulate_one_trial_with_logging(full_deck, precomputed_attackers, max_turns=
         if turn > 1:
             hand_size_before = len(hand)
             drawn = draw_from_deck(deck, hand, 1)
+            if trace is not None and drawn > 0:
+                trace.record(DRAW, hand[hand_size_before], DECK, HAND)
             if log_details and drawn > 0:
                 drawn_card = hand[hand_size_before]
                 log.append(f"Drew card: {drawn_card['name']}")
 
-            # Shiinotic ongoing ability: after normal draw, for each Shiinotic in play, draw 1 Pokémon card
-            shiinotics_in_play = [p for p in active_pokemon + bench if p.get('name', '') == 'shiinotic']
-            # Each Shiinotic draws independently
-            for shiinotic in shiinotics_in_play:
-                drew_card = False
-                for j, deck_card in enumerate(deck):
-                    if deck_card.get('type', '') == 'pokemon' and deck_card.get('stage', '') in ['basic', 'stage1', 'stage2']:
-                        if len(hand) < 10:
-                            found_poke = deck.pop(j)
-                            hand.append(found_poke)
-                            drew_card = True
-                            if log_details:
-                                log.append(f"Shiinotic ability: drew {found_poke['name']} from deck and shuffled deck.")
-                        break
-                random.shuffle(deck)
-                if not drew_card and log_details:
-                    log.append("Shiinotic ability: shuffled deck (no card drawn).")
+            # Start-of-turn abilities (Shiinotic draws 1 Pokémon card after the normal draw)
+            for turn_start in effects.turn_start:
+                msgs = turn_start(deck, hand, active_pokemon, bench, rng, trace)
+                if log_details:
+                    log.extend(msgs)
 
         # At the start of each turn, clear 'just_placed' flag for Pokémon placed in previous turns
         for p in bench:
@@ -593,58 +758,90 @@ def simulate_one_trial_with_logging(full_deck, precomputed_attackers, max_turns=
 
         # Play basics, supporters, etc.
         evolved_this_turn = set()
-        while True:
-            action_taken = False
+        pending = all_actions
+        passes = attempts = 0
+        while pending:
+            passes += 1
             # Play supporter (prioritizes Professor's Research)
-            played_supporter, supporter_msg = try_play_supporter(hand, deck, supporter_used)
-            if played_supporter:
-                action_taken = True
-                if log_details:
-                    log.append(f"Played supporter: {supporter_msg}")
+            if pending & PLAY_SUPPORTER:
+                attempts += 1
+                played_supporter, supporter_msg = try_play_supporter(hand, deck, supporter_used, rng, effects, trace)
+                pending &= ~PLAY_SUPPORTER
+                if played_supporter:
+                    pending |= SUPPORTER_PLAYED
+                    if log_details:
+                        log.append(f"Played supporter: {supporter_msg}")
             # Place any new basics
-            placed = place_basic_pokemon(hand, active_pokemon, bench)
-            if placed:
-                action_taken = True
-                if log_details:
-                    for location, name in placed:
-                        log.append(f"Placed {name} in {location}")
-                cards_seen.update(c['name'] for c in active_pokemon + bench)
+            if pending & PLACE_BASICS:
+                attempts += 1
+                placed = place_basic_pokemon(hand, active_pokemon, bench, trace=trace)
+                pending &= ~PLACE_BASICS
+                if placed:
+                    pending |= POKEMON_PLACED | all_effect_actions
+                    if log_details:
+                        for location, name in placed:
+                            log.append(f"Placed {name} in {location}")
+                    cards_seen.update(c['name'] for c in active_pokemon + bench)
             # Track actual object references for Pokémon just placed this turn
             # Only clear 'just_placed' flag at the start of a new turn, not after placing basics
             # This ensures Pokémon placed this turn retain their flag and cannot evolve until next turn
             # Play Poke Balls
-            played_pokeball, pokeball_msg = try_play_pokeball(hand, deck)
-            if played_pokeball:
-                action_taken = True
-                if log_details:
-                    log.append(f"Played Poké Ball: {pokeball_msg}")
-                cards_seen.update(c['name'] for c in hand)
+            if pending & PLAY_POKEBALL:
+                attempts += 1
+                played_pokeball, pokeball_msg = try_play_pokeball(hand, deck, trace)
+                pending &= ~PLAY_POKEBALL
+                if played_pokeball:
+                    pending |= BASIC_SEARCHED
+                    if log_details:
+                        log.append(f"Played Poké Ball: {pokeball_msg}")
+                    cards_seen.update(c['name'] for c in hand)
             # Try evolutions (evolution restricted to turn 2+)
-            evolved, evolution_msg = try_evolve(hand, active_pokemon, bench, deck, supporter_used, turn, evolved_this_turn)
-            if evolved:
-                action_taken = True
-                if log_details:
-                    log.append(f"Evolution: {evolution_msg}")
-                cards_seen.update(c['name'] for c in active_pokemon + bench)
-            # Try to switch legendary beast to active
-            switched, switch_msg = try_switch_legendary_beast(hand, active_pokemon, bench, turn)
-            if switched:
-                action_taken = True
-                if log_details:
-                    log.append(f"Switch: {switch_msg}")
-            if not action_taken:
-                break
+            if pending & EVOLVE_POKEMON:
+                attempts += 1
+                evolved, evolution_msg = try_evolve(hand, active_pokemon, bench, deck, supporter_used, turn, evolved_this_turn, rng, effects,
+                                                    trace)
+                pending &= ~EVOLVE_POKEMON
+                if evolved:
+                    pending |= POKEMON_EVOLVED | all_effect_actions
+                    if log_details:
+                        log.append(f"Evolution: {evolution_msg}")
+                    cards_seen.update(c['name'] for c in active_pokemon + bench)
+            # Extra board actions (switch a legendary beast to active)
+            for bit, action in effect_actions:
+                if pending & bit:
+                    attempts += 1
+                    switched, switch_msg = action(hand, active_pokemon, bench, turn, trace)
+                    pending &= ~bit
+                    if switched:
+                        # The switched-in Pokémon is active now; other effect actions may still apply
+                        pending |= POKEMON_SWITCHED | (all_effect_actions & ~bit)
+                        if log_details:
+                            log.append(f"Switch: {switch_msg}")
         
+        if action_counts is not None:
+            action_counts.update(turns=1, passes=passes, attempts=attempts)
+        if trace is not None:
+            trace.record(ACTIONS_DONE)
         if log_details and turn < 2 and any(is_stage1(c) or is_stage2(c) for c in hand):
             evos_in_hand = [c['name'] for c in hand if is_stage1(c) or is_stage2(c)]
             log.append(f"Evolution cards in hand (can't use until turn 2): {evos_in_hand}")
         
         # End of turn: Legendary beast draw (can't use until next turn)
-        beast_draw = legendary_beast_end_turn_draw(deck, active_pokemon)
-        if beast_draw:
-            cards_drawn_at_end.extend(beast_draw)
-            if log_details:
-                log.append(f"Legendary beast end-turn draw: {beast_draw[0]['name']} (available next turn)")
+        for end_turn in effects.end_turn:
+            beast_draw = end_turn(deck, active_pokemon)
+            if beast_draw:
+                cards_drawn_at_end.extend(beast_draw)
+                if trace is not None:
+                    trace.record(BEAST_DRAW, beast_draw[0], DECK, PENDING)
+                if log_details:
+                    log.append(f"Legendary beast end-turn draw: {beast_draw[0]['name']} (available next turn)")
+
+        if stats is not None:
+            stats.end_turn(turn, deck, bench)
+        if attackers_by_turn is not None:
+            attackers_by_turn.append(sum(1 for p in active_pokemon + bench if is_main_attacker(p, precomputed_attackers)))
+        if snapshots is not None:
+            snapshots.append(BoardSnapshot(turn, tuple(active_pokemon), tuple(bench), tuple(hand)))
 
     # --- NEW BRICKING LOGIC START ---
     
@@ -652,20 +849,13 @@ def simulate_one_trial_with_logging(full_deck, precomputed_attackers, max_turns=
     developed_attackers = [p for p in all_pokemon_in_play if is_main_attacker(p, precomputed_attackers)]
     
     # Get total count of each main attacker in the deck
-    attacker_names = set(c['name'] for c in full_deck if is_main_attacker(c, precomputed_attackers))
-    total_main_attackers_in_deck = len(attacker_names)
-
-    # Check if a game state is NOT a brick
-    is_not_brick = False
-    
-    required_in_play = 3 if total_main_attackers_in_deck > 3 else max(2, total_main_attackers_in_deck)
-    is_not_brick = len(developed_attackers) >= required_in_play
+    context = DeckContext(full_deck, precomputed_attackers)
+    total_main_attackers_in_deck = context.total_main_attackers
 
-    # Check for the "decking out" condition as a final override
-    # not_brick_deck_small = len(deck) < 5
-
-    # Determine if it's a brick based on the new logic
-    is_brick = not is_not_brick #and not not_brick_deck_small
+    # The headline brick definition lives in tcg_criteria with the other criteria
+    final_board = BoardSnapshot(max_turns, tuple(active_pokemon), tuple(bench), tuple(hand))
+    is_brick = DEFAULT_BRICK_CRITERION.is_brick([final_board], context)
+    is_not_brick = not is_brick
     
     # --- NEW BRICKING LOGIC END ---
     
@@ -676,10 +866,16 @@ def simulate_one_trial_with_logging(full_deck, precomputed_attackers, max_turns=
     seen_counts = Counter(name for name in cards_seen if name in deck_counts)
     key_cards_stuck = [name for name, total in deck_counts.items() if seen_counts.get(name, 0) == 0]
     
-    required_in_play = 3 if total_main_attackers_in_deck > 3 else max(2, total_main_attackers_in_deck)
+    required_in_play = required_attackers_in_play(total_main_attackers_in_deck)
     brick_no_attacker = len(developed_attackers) < required_in_play
     brick_key_stuck = len(key_cards_stuck) > 0
 
+    if stats is not None:
+        stats.end_trial(is_brick, hand, deck, cards_drawn_at_end)
+    if trace is not None:
+        trace.record(FINAL)
+        trace.record_all(REMAINING, deck, DECK, DECK)
+
     if log_details:
         log.append(f"\n--- FINAL STATE ---")
         log.append(f"Active: {[c['name'] for c in active_pokemon]}")
@@ -705,37 +901,146 @@ def simulate_one_trial_with_logging(full_deck, precomputed_attackers, max_turns=
         
     return is_brick, brick_no_attacker, brick_key_stuck, log
 
-def simulate_brick_rate_with_examples(full_deck, precomputed_attackers, trials=1000, show_examples=5, maxturns=7):
-    """
-    Run multiple simulations and show detailed examples of bricked games.
-    This version ensures the same trial is used for both stats and example logging.
-    """
-    total_bricks = 0
-    attacker_bricks = 0
-    key_card_bricks = 0
-    
-    # Store example logs to display later
-    example_logs = []
+def trial_seed(seed, trial_index):
+    """Seed of an individual trial; every trial of a run gets its own independent stream."""
+    return (seed << 32) | trial_index
+
 
-    for i in range(trials):
-        # Run trial once with logging
-        is_brick, brick_attacker, brick_key, log = simulate_one_trial_with_logging(
-            full_deck, precomputed_attackers, log_details=True, max_turns=maxturns
+def replay_traces(full_deck, precomputed_attackers, trial_seeds, maxturns=7):
+    """Re-runs the given trials and returns their event traces (GameTrace objects)."""
+    traces = []
+    effects = compile_deck_effects(full_deck)
+    for s in trial_seeds:
+        trace = GameTrace(full_deck)
+        simulate_one_trial_with_logging(
+            full_deck, precomputed_attackers, max_turns=maxturns, rng=random.Random(s), effects=effects, trace=trace
         )
+        traces.append(trace)
+    return traces
 
-        # Count stats
-        if is_brick:
-            total_bricks += 1
-            if brick_attacker:
-                attacker_bricks += 1
-            if brick_key:
-                key_card_bricks += 1
 
-            # Store example logs up to show_examples
-            if len(example_logs) < show_examples:
-                example_logs.append(log)
+def replay_trials(full_deck, precomputed_attackers, trial_seeds, maxturns=7):
+    """Re-runs the given trials and returns their logs, rendered from the event traces."""
+    return [render_trace(trace, precomputed_attackers)
+            for trace in replay_traces(full_deck, precomputed_attackers, trial_seeds, maxturns)]
 
-    return total_bricks, attacker_bricks, key_card_bricks, trials, example_logs
+
+def simulate_brick_rate_with_examples(full_deck, precomputed_attackers, trials=1000, show_examples=5, maxturns=7, stats=None,
+                                      result=None, seed=None, checkpoint_path=None, checkpoint_every=10000, first_trial=0,
+                                      criteria=None, archive_path=None, controls=None):
+    """
+    Run multiple simulations and show detailed examples of bricked games.
+    Trials run without logging; each is seeded from (`seed`, trial index) and the reservoir keeps only
+    the seeds of a uniform sample of bricked trials. Their logs are regenerated by replay at the end,
+    so the examples represent the whole run.
+    Pass a CardStatsCollector as `stats` to gather per-card attribution counters.
+    Returns a SimulationResult; pass an existing one as `result` to keep accumulating into it.
+    Only the first `show_examples` seeds of the reservoir are replayed, so a `result` with a larger
+    reservoir and show_examples=0 keeps example seeds without rendering any logs.
+
+    With `checkpoint_path`, the counters, example reservoir, control-variate tally and next trial index
+    are saved there every `checkpoint_every` trials. Calling again with the same path resumes from the
+    last checkpoint and gives the same result as an uninterrupted run (the seed is taken from the
+    checkpoint); resuming with another first_trial, other criteria or with/without controls raises ValueError.
+
+    `first_trial` offsets the trial indices, so a run can be split into chunks (e.g. across processes)
+    whose merged results equal a single run with the same seed.
+
+    `criteria` is a list of extra brick criteria (objects or registered names, see tcg_criteria). Every
+    one is evaluated against the same simulated games; counts end up in result.criteria_bricks.
+
+    With `archive_path`, a summary record of every game (seed, brick flags, attackers per turn, cards
+    seen per turn) is appended to that file; open it with GameArchive for queries over all games.
+
+    `controls` is a ControlVariates accumulator (see tcg_sampling): every trial's shuffle and outcome
+    are added to it for a control-variate estimate of the brick rate. The games are the same as without it.
+    """
+    criteria = resolve_criteria(criteria)
+    context = DeckContext(full_deck, precomputed_attackers)
+    effects = compile_deck_effects(full_deck)
+    start = 0
+    criteria_names = [c.name for c in criteria]
+    checkpoint = load_checkpoint(checkpoint_path, full_deck, maxturns, first_trial,
+                                 criteria_names) if checkpoint_path else None
+    if checkpoint:
+        if (controls is None) != (checkpoint['controls'] is None):
+            raise ValueError(f"Checkpoint {checkpoint_path} was written "
+                             f"{'without' if controls is not None else 'with'} control variates.")
+        seed = checkpoint['seed']
+        start = checkpoint['next_trial']
+        result = SimulationResult.from_state(checkpoint['result'])
+        if stats is not None and checkpoint['stats']:
+            stats.set_state(checkpoint['stats'])
+        if controls is not None:
+            controls.set_state(checkpoint['controls'])
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    if result is None:
+        result = SimulationResult(maxturns, max_examples=show_examples, seed=seed)
+    archive = None
+    collector = stats
+    if archive_path:
+        # The seed column holds trial_seed(seed, index) = seed << 32 | index
+        if not 0 <= seed < 2 ** 32 or first_trial + trials > 2 ** 32:
+            raise ValueError("Archived runs need a seed and trial indices below 2**32.")
+        archive = GameArchiveWriter(archive_path, full_deck, maxturns)
+        if checkpoint:
+            archive.discard_from(seed, first_trial + start)
+        collector = archive if stats is None else CollectorGroup(stats, archive)
+
+    for i in range(start, trials):
+        s = trial_seed(seed, first_trial + i)
+        attackers_by_turn = []
+        snapshots = [] if criteria else None
+        rng = random.Random(s)
+        deck_order = None
+        if controls is not None:
+            # The same shuffle simulate_one_trial_with_logging would deal, kept for the control variables
+            deck_order = full_deck[:]
+            rng.shuffle(deck_order)
+        is_brick, brick_attacker, brick_key, _ = simulate_one_trial_with_logging(
+            full_deck, precomputed_attackers, max_turns=maxturns, stats=collector,
+            attackers_by_turn=attackers_by_turn, rng=rng, snapshots=snapshots, effects=effects, deck_order=deck_order
+        )
+        if controls is not None:
+            controls.add_trial(deck_order, is_brick)
+        criteria_results = {c.name: c.is_brick(snapshots, context) for c in criteria} if criteria else None
+        result.add_trial(is_brick, brick_attacker, brick_key, example=s, attackers_by_turn=attackers_by_turn,
+                         criteria_results=criteria_results)
+        if archive is not None:
+            archive.add(s, is_brick, brick_attacker, brick_key, attackers_by_turn)
+        if checkpoint_path and (i + 1) % checkpoint_every == 0:
+            if archive is not None:
+                archive.flush()
+            save_checkpoint(checkpoint_path, full_deck, seed, i + 1, result, stats, first_trial, criteria_names,
+                            controls)
+
+    if archive is not None:
+        archive.close()
+    if checkpoint_path:
+        save_checkpoint(checkpoint_path, full_deck, seed, max(start, trials), result, stats, first_trial,
+                        criteria_names, controls)
+    result.example_logs = replay_trials(full_deck, precomputed_attackers, result.examples[:show_examples], maxturns)
+    return result
+
+
+def simulate_with_store(store, full_deck, precomputed_attackers, trials=1000, show_examples=5, maxturns=7, ruleset='default'):
+    """
+    Like simulate_brick_rate_with_examples, but reuses trials already in `store` (a ResultStore)
+    for the same deck and settings, and only simulates the trials that are missing.
+    Trials are played (and their examples replayed) with the deck in canonical_deck() order.
+    """
+    fingerprint = deck_fingerprint(full_deck, maxturns, SIMULATOR_VERSION, ruleset)
+    full_deck = canonical_deck(full_deck)
+    result = store.get(fingerprint)
+    missing = trials - (result.trials if result else 0)
+    if missing > 0:
+        new_result = simulate_brick_rate_with_examples(
+            full_deck, precomputed_attackers, trials=missing, show_examples=show_examples, maxturns=maxturns
+        )
+        result = store.add(fingerprint, new_result)
+    result.example_logs = replay_trials(full_deck, precomputed_attackers, result.examples[:show_examples], maxturns)
+    return result
 
 
 # =============================================================================
@@ -750,81 +1055,78 @@ def get_main_attackers_and_evolution_methods(full_deck):
       - All Stage 1 EX Pokémon
       - All Basic EX Pokémon
       - Standalone basics (no evolutions OR no stage2 with rare candy)
+      - Stage 1 Pokémon with no evolution in the deck
+    Evolution lines are resolved with the card pool's EvolutionGraph: a card "has an evolution in
+    the deck" if one of its children in the graph is in the deck.
     """
+    graph = evolution_graph()
     main_attackers = set()
     evolution_methods = {}
     has_rare_candy = any(is_rare_candy(c) for c in full_deck)
-    
-    # Group Pokémon by their basic ancestor
-    evolution_lines = {}
-    #for eevee ex
-    
-    for card in full_deck:
-        if card['type'] != 'pokemon':
-            continue
-        basic_name = get_evolves_from_chain(card.get('evolve_from', '')) if card.get('evolve_from', '') else card['name']
-        evolution_lines.setdefault(basic_name, []).append(card)
+    pokemon = [c for c in full_deck if c['type'] == 'pokemon']
 
     # Add all Stage 2, Stage 1 EX, Basic EX
-    for cards in evolution_lines.values():
-        for card in cards:
-            name = card['name']
-            if is_stage2(card):
-                evolution_methods[name] = 'Stage 2 (via Rare Candy)' if has_rare_candy else 'Stage 2'
-                main_attackers.add(name)
-            elif is_stage1(card) and card.get('ex', False):
-                evolution_methods[name] = 'Stage 1 ex'
-                main_attackers.add(name)
-            elif is_basic(card) and card.get('ex', False):
-                evolution_methods[name] = 'Basic ex'
-                main_attackers.add(name)
-    
+    for card in pokemon:
+        name = card['name']
+        if is_stage2(card):
+            evolution_methods[name] = 'Stage 2 (via Rare Candy)' if has_rare_candy else 'Stage 2'
+            main_attackers.add(name)
+        elif is_stage1(card) and card.get('ex', False):
+            evolution_methods[name] = 'Stage 1 ex'
+            main_attackers.add(name)
+        elif is_basic(card) and card.get('ex', False):
+            evolution_methods[name] = 'Basic ex'
+            main_attackers.add(name)
 
     # Add standalone basics not part of any evolution line (no evolutions in deck)
-    # Exclude basics if any card in deck evolves from them
-    evolved_from_names = set(c.get('evolve_from','') for c in full_deck if c.get('evolve_from',''))
-    # Find all basics that have a stage2 in deck that ultimately evolves from them
-    basics_with_stage2_rare_candy = set()
-    if has_rare_candy:
-        for basic_card in full_deck:
-            if is_basic(basic_card):
-                basic_name = basic_card['name']
-                # Look for any stage2 in deck that ultimately evolves from this basic
-                for evo_card in full_deck:
-                    if is_stage2(evo_card):
-                        ancestor = get_evolves_from_chain(evo_card.get('evolve_from','')) if evo_card.get('evolve_from','') else evo_card['name']
-                        if ancestor == basic_name:
-                            basics_with_stage2_rare_candy.add(basic_name)
-                            break
-
+    # Exclude basics if any card in deck evolves from them, or (with Rare Candy) if a Stage 2
+    # in the deck ultimately evolves from them
+    deck_names = set(c['name'] for c in full_deck)
+    stage2_basics = set(graph.card_basic(c) for c in full_deck if is_stage2(c)) if has_rare_candy else set()
     for card in full_deck:
         if is_basic(card):
             basic_name = card['name']
-            # Only add if no card in deck evolves from this basic and not covered by rare candy + stage2
-            if basic_name not in evolved_from_names and basic_name not in basics_with_stage2_rare_candy:
+            if not graph.children.get(basic_name, set()) & deck_names and basic_name not in stage2_basics:
                 evolution_methods[basic_name] = 'Basic (standalone)'
                 main_attackers.add(basic_name)
-    
-        
-    #stage 1 evos that doesnt have any further evos 
-    for cards in evolution_lines.values():
-        for card in cards:
-            if is_stage1(card) and card["name"] not in card.get('evolve_from', []):
-                evolution_methods[card['name']] = 'Stage 1 (standalone)'
-                main_attackers.add(card['name'])
-    
+
+    # Stage 1 Pokémon that don't evolve into anything in the deck
+    for card in pokemon:
+        if is_stage1(card) and not graph.children.get(card['name'], set()) & deck_names:
+            evolution_methods[card['name']] = 'Stage 1 (standalone)'
+            main_attackers.add(card['name'])
+
     if 'eevee ex' in main_attackers:
         main_attackers.discard('eevee ex')
 
-    #remove any basic that have a evolution in the deck even if its stage 1
+    # Remove any basic that evolves into something in the deck, even a Stage 1
     for card in full_deck:
-        if is_basic(card) and card["name"] in card.get('evolve_from', []):
+        if is_basic(card) and graph.children.get(card['name'], set()) & deck_names:
             evolution_methods[card['name']] = 'Basic (with evolution)'
             main_attackers.discard(card['name'])
 
     return list(main_attackers), evolution_methods
 
 
+def print_simulation_result(result):
+    """Prints example logs and the summary of a SimulationResult."""
+    if not result.example_logs:
+        print("No bricked game examples to show.")
+    for i, example in enumerate(result.example_logs, 1):
+        print(f"\n--- BRICKED GAME EXAMPLE #{i} ---")
+        for line in example:
+            print(line)
+
+    trials = result.trials
+    low, high = result.brick_rate_interval()
+    print(f"\n--- SIMULATION RESULTS ({trials} trials) ---")
+    print(f"Total strict bricks (unplayable hands): {result.bricks} ({result.brick_rate*100:.2f}%, 95% CI {low*100:.2f}-{high*100:.2f}%)")
+    print(f"Sub-optimal games due to not enough main attackers in play: {result.attacker_bricks} ({result.attacker_rate*100:.2f}%)")
+    if result.attacker_bricks > 0:
+        print(f"   - Of these, caused by key cards not drawn in time: {result.key_card_bricks} ({result.key_card_bricks/result.attacker_bricks*100:.2f}% of sub-optimal games) and ({result.key_card_rate*100:.2f}% of all games)")
+    print("Main attackers in play by turn: " + ", ".join(f"T{t}: {m:.2f}" for t, m in enumerate(result.mean_attackers_by_turn(), 1)))
+    print(f"Note: Some sub-optimal situations are temporary and may resolve in later turns.")
+
 
 def test():
     deck_text = """
@@ -863,8 +1165,11 @@ def test():
 
 
 
-def main():
-    """Main function to load data, parse deck, and run analysis."""
+def main(trials=1000, seed=None, checkpoint_path=None):
+    """
+    Main function to load data, parse deck, and run analysis.
+    For long runs pass `checkpoint_path`; rerunning after an interruption resumes from it.
+    """
     deck_text = """
 2 Cosmog A3 85
 1 Cosmoem A3 86
@@ -914,21 +1219,18 @@ def main():
     for attacker in main_attackers:
         print(f"   - {attacker}: {evolution_methods.get(attacker, 'N/A')}")
 
-    total_bricks, attacker_bricks, key_card_bricks, trials, example_logs = simulate_brick_rate_with_examples(
-        parsed_deck, main_attackers, trials=1000, show_examples=5, maxturns=7
+    card_stats = CardStatsCollector(parsed_deck, max_turns=7)
+    result = simulate_brick_rate_with_examples(
+        parsed_deck, main_attackers, trials=trials, show_examples=5, maxturns=7, stats=card_stats,
+        seed=seed, checkpoint_path=checkpoint_path
     )
-    if not example_logs:
-        print("No bricked game examples to show.")
-    for i, example in enumerate(example_logs, 1):
-        print(f"\n--- BRICKED GAME EXAMPLE #{i} ---")
-        for line in example:
-            print(line)
-            
-    print(f"\n--- SIMULATION RESULTS ({trials} trials) ---")
-    print(f"Total strict bricks (unplayable hands): {total_bricks} ({total_bricks/trials*100:.2f}%)")
-    print(f"Sub-optimal games due to not enough main attackers in play: {attacker_bricks} ({attacker_bricks/trials*100:.2f}%)")
-    print(f"   - Of these, caused by key cards not drawn in time: {key_card_bricks} ({key_card_bricks/attacker_bricks*100:.2f}% of sub-optimal games) and ({key_card_bricks/trials*100:.2f}% of all games)")
-    print(f"Note: Some sub-optimal situations are temporary and may resolve in later turns.")
+    print_simulation_result(result)
+
+    print("\n--- CARD ATTRIBUTION ---")
+    for row in card_stats.summary():
+        print(f"   - {row['card']}: seen {row['seen_rate']*100:.1f}%, played {row['played_rate']*100:.1f}%, "
+              f"stuck {row['stuck_rate']*100:.1f}%, seen in bricks {row['seen_in_bricks_rate']*100:.1f}% "
+              f"vs non-bricks {row['seen_in_non_bricks_rate']*100:.1f}%")
 
 
 